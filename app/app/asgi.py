@@ -2,6 +2,11 @@
 ASGI config for app project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it on pre-forked uvicorn workers with::
+
+    python manage.py serve --interface asgi
+
+The async recipe views live under /api/async/recipe/.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
@@ -91,6 +91,26 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# Set MEMCACHED_LOCATION (host:port, comma separated) when running more
+# than one process, or responses cached by one process go stale after
+# writes handled by another. `manage.py serve` turns the token and
+# response caches off, with a warning, when its workers would each get
+# their own LocMemCache.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+if os.environ.get('MEMCACHED_LOCATION'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': os.environ['MEMCACHED_LOCATION'].split(','),
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -109,6 +129,23 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing is admission controlled, see core.hashing: it runs on
+# the request thread, but only so many hash at once and so many wait.
+# Only one hasher may claim the pbkdf2_sha256 algorithm.
+PASSWORD_HASHERS = [
+    'core.hashing.PooledPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+# Changing the work factor re-hashes passwords as users sign in;
+# None keeps Django's default.
+PASSWORD_HASH_ITERATIONS = None
+# Concurrent hashes, and requests waiting for one, across serve's workers
+PASSWORD_HASHING_WORKERS = 2
+PASSWORD_HASHING_QUEUE_SIZE = 16
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
@@ -147,3 +184,95 @@ REST_FRAMEWORK = {
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 }
+
+# Serialize recipe reads from values() rows instead of model instances
+RECIPE_FAST_SERIALIZATION = True
+
+# Let PostgreSQL assemble recipe list JSON; ignored on other databases
+RECIPE_DB_JSON_RENDERING = True
+
+# Cache recipe, tag and ingredient GET responses per user and data version
+RECIPE_RESPONSE_CACHE = True
+RECIPE_RESPONSE_CACHE_TIMEOUT = 300
+
+# Bulk recipe writes: rows per statement/transaction and operations per request
+RECIPE_BULK_BATCH_SIZE = 500
+RECIPE_BULK_MAX_OPERATIONS = 10000
+
+# Recipes read per database round trip by the streaming export
+RECIPE_EXPORT_CHUNK_SIZE = 1000
+
+# Token lookups cached in the shared cache and in a per-process LRU
+AUTH_TOKEN_CACHE = True
+AUTH_TOKEN_CACHE_TIMEOUT = 300
+AUTH_TOKEN_LOCAL_CACHE_SIZE = 1024
+# Other processes may accept a revoked token for this long; 0 disables
+AUTH_TOKEN_LOCAL_CACHE_TIMEOUT = 5
+
+# Recipe image uploads: streamed to disk and refused past this size
+RECIPE_IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+RECIPE_IMAGE_MAX_PIXELS = 40_000_000
+RECIPE_IMAGE_FORMATS = ['JPEG', 'PNG', 'GIF', 'WEBP']
+
+# Recipe image variants: longest edge in pixels, rendered on worker processes
+RECIPE_IMAGE_VARIANTS = {'thumbnail': 200, 'small': 480, 'medium': 1024}
+RECIPE_IMAGE_VARIANT_QUALITY = 80
+RECIPE_IMAGE_VARIANT_WORKERS = 2
+RECIPE_IMAGE_VARIANT_QUEUE_SIZE = 32
+RECIPE_IMAGE_VARIANT_RETRIES = 3
+RECIPE_IMAGE_VARIANT_RETRY_DELAY = 1.0
+RECIPE_IMAGE_VARIANTS_INLINE = False
+
+# Seconds an unreferenced recipe image is kept before garbage collection
+RECIPE_IMAGE_GC_GRACE = 3600
+
+# Recipe image responses: cache lifetime, and the front-end server header
+# ('x-accel-redirect' or 'x-sendfile') used to send files instead of Python
+RECIPE_MEDIA_CACHE_MAX_AGE = 365 * 24 * 60 * 60
+RECIPE_MEDIA_SENDFILE = os.environ.get('MEDIA_SENDFILE') or None
+RECIPE_MEDIA_ACCEL_PREFIX = '/protected-media/'
+
+# Recipe images in an S3-compatible object store: written locally, uploaded
+# on background threads, then read through presigned URLs (recipe.storage)
+RECIPE_IMAGE_STORE = None
+if os.environ.get('IMAGE_STORE_BUCKET'):
+    DEFAULT_FILE_STORAGE = 'recipe.storage.OffloadedStorage'
+    RECIPE_IMAGE_STORE = {
+        'BACKEND': 'recipe.storage.S3ObjectStore',
+        'OPTIONS': {
+            'bucket': os.environ['IMAGE_STORE_BUCKET'],
+            'endpoint_url': os.environ.get('IMAGE_STORE_ENDPOINT') or None,
+        },
+    }
+RECIPE_IMAGE_STORE_WORKERS = 4
+RECIPE_IMAGE_STORE_RETRIES = 3
+RECIPE_IMAGE_STORE_RETRY_DELAY = 1.0
+RECIPE_IMAGE_STORE_KEEP_LOCAL = False
+RECIPE_IMAGE_STORE_URL_EXPIRY = 3600
+
+# Database task queue run by `manage.py worker` (core.tasks)
+TASK_CONCURRENCY = 2
+TASK_POLL_INTERVAL = 1.0
+TASK_TIMEOUT = 900
+TASK_RETRY_DELAY = 5
+TASK_MAX_RETRY_DELAY = 3600
+TASK_KEEP_DONE = 24 * 60 * 60
+TASK_STATS_WINDOW = 3600
+# {task name: seconds between runs}
+TASK_PERIODIC = {
+    'recipe.collect_image_garbage': RECIPE_IMAGE_GC_GRACE,
+}
+
+# Production server run by `manage.py serve` (core.server): pre-forked
+# workers, replaced after a number of requests or past a memory limit (MB)
+SERVE_BIND = os.environ.get('SERVE_BIND', '0.0.0.0:9080')
+SERVE_WORKERS = int(os.environ.get('SERVE_WORKERS', 2 * os.cpu_count() + 1))
+SERVE_INTERFACE = 'wsgi'
+SERVE_MAX_REQUESTS = 1000
+SERVE_MAX_REQUESTS_JITTER = 50
+SERVE_MAX_RSS = 512
+SERVE_TIMEOUT = 30
+SERVE_GRACEFUL_TIMEOUT = 30
+
+# Seconds the startup warmup (core.readiness) waits for the database
+READINESS_DATABASE_TIMEOUT = 30
@@ -0,0 +1,164 @@
+"""
+Token authentication with cached token lookups.
+
+Resolved tokens are kept in the shared cache for
+`AUTH_TOKEN_CACHE_TIMEOUT` seconds and in a bounded per-process LRU
+for `AUTH_TOKEN_LOCAL_CACHE_TIMEOUT` seconds, so most requests are
+authenticated without touching the database. Deleting a token or
+saving its user (deactivation, password change, ...) revokes the
+cached entries, see `core.signals`. Shared entries are keyed by a
+per-token generation that revocation bumps, so a lookup racing with a
+revocation cannot store the revoked token again. Other processes keep
+their LRU copy until it expires, so they may accept a revoked token for
+up to `AUTH_TOKEN_LOCAL_CACHE_TIMEOUT` seconds (0 turns the LRU off).
+With `AUTH_TOKEN_CACHE` off only the LRU is used.
+"""
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+TOKEN_KEY = 'auth-token:{digest}:{generation}'
+GENERATION_KEY = 'auth-token:generation:{digest}'
+
+
+class LRUCache:
+    """Thread-safe mapping of at most `maxsize` entries with expiry.
+
+    `generation` counts deletions, so a value read before one can be
+    kept from being set after it.
+    """
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.generation = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the live value for `key`, or None."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, generation=None):
+        """Store `value`, unless deletions happened since `generation`."""
+        if self.maxsize <= 0 or self.timeout <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._data[key] = (value, time.monotonic() + self.timeout)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self.generation += 1
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+
+
+local_tokens = LRUCache(
+    getattr(settings, 'AUTH_TOKEN_LOCAL_CACHE_SIZE', 1024),
+    getattr(settings, 'AUTH_TOKEN_LOCAL_CACHE_TIMEOUT', 5),
+)
+
+
+def _new_generation():
+    """Return a generation that cannot collide with an evicted one."""
+    return time.time_ns()
+
+
+def get_token_digest(key):
+    """Return a digest naming a token without exposing it."""
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def get_token_cache_key(key):
+    """Return the shared cache key for a token's current generation."""
+    digest = get_token_digest(key)
+    generation_key = GENERATION_KEY.format(digest=digest)
+    generation = cache.get(generation_key)
+    if generation is None:
+        cache.add(generation_key, _new_generation(), None)
+        generation = cache.get(generation_key)
+
+    return TOKEN_KEY.format(digest=digest, generation=generation)
+
+
+def _bump_generations(digests):
+    for digest in digests:
+        generation_key = GENERATION_KEY.format(digest=digest)
+        try:
+            cache.incr(generation_key)
+        except ValueError:
+            cache.set(generation_key, _new_generation(), None)
+
+
+def revoke_tokens(keys):
+    """Drop cached lookups of the given token keys.
+
+    Shared entries are orphaned right away and again once the current
+    transaction commits, so lookups reading the database before the
+    commit cannot be served afterwards.
+    """
+    digests = [get_token_digest(key) for key in keys]
+    for digest in digests:
+        local_tokens.delete(digest)
+    if getattr(settings, 'AUTH_TOKEN_CACHE', True):
+        _bump_generations(digests)
+        transaction.on_commit(lambda: _bump_generations(digests))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """`TokenAuthentication` serving token lookups from the caches."""
+
+    def authenticate_credentials(self, key):
+        digest = get_token_digest(key)
+        data = local_tokens.get(digest)
+        if data is None:
+            # Taken before the lookup, so revocations during it win.
+            generation = local_tokens.generation
+            shared = getattr(settings, 'AUTH_TOKEN_CACHE', True)
+            if shared:
+                cache_key = get_token_cache_key(key)
+                data = cache.get(cache_key)
+            if data is None:
+                user, token = super().authenticate_credentials(key)
+                data = pickle.dumps(token)
+                if shared:
+                    cache.set(
+                        cache_key,
+                        data,
+                        getattr(settings, 'AUTH_TOKEN_CACHE_TIMEOUT', 300),
+                    )
+            local_tokens.set(digest, data, generation)
+
+        # Each request gets its own copy of the token and user.
+        token = pickle.loads(data)
+        if not token.user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+
+        return (token.user, token)
@@ -0,0 +1,147 @@
+"""
+Admission control for password hashing.
+
+PBKDF2 costs hundreds of milliseconds of CPU per call. The hash still
+runs on the request's own thread, which stays busy meanwhile; what the
+pool bounds is how many requests hash at once (`workers`) and how many
+may wait for a turn (`queue_size`). Past that a request fails fast with
+503 instead of piling up behind the others and starving other
+endpoints.
+
+The limits are enforced with semaphores shared by every process forked
+after the pool was created: `manage.py serve` creates it while warming
+up (see `core.readiness`), so its workers share one budget. Processes
+started otherwise each get their own.
+"""
+import multiprocessing
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class HashingPoolSaturated(APIException):
+    """Raised when no password hashing slot is free."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Too many sign-ins at once, try again shortly.')
+    default_code = 'hashing_saturated'
+    wait = 1
+
+
+class HashingPool:
+    """Run at most `workers` hashing calls at once, queueing `queue_size`.
+
+    Calls run on the caller's thread. Keeps running totals, for this
+    process, of the time spent queued and hashing.
+    """
+
+    def __init__(self, workers, queue_size):
+        self.workers = workers
+        self.queue_size = queue_size
+        # Shared with forked processes: calls admitted, and calls hashing.
+        self._slots = multiprocessing.BoundedSemaphore(workers + queue_size)
+        self._hashing = multiprocessing.BoundedSemaphore(workers)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._stats = {
+            'completed': 0,
+            'rejected': 0,
+            'hash_seconds_total': 0.0,
+            'hash_seconds_max': 0.0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+        }
+
+    def _record(self, name, seconds):
+        self._stats[f'{name}_seconds_total'] += seconds
+        self._stats[f'{name}_seconds_max'] = max(
+            self._stats[f'{name}_seconds_max'], seconds)
+
+    def _call(self, submitted_at, func, args):
+        with self._hashing:
+            started_at = time.monotonic()
+            with self._lock:
+                self._pending -= 1
+                self._running += 1
+                self._record('wait', started_at - submitted_at)
+            try:
+                return func(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._stats['completed'] += 1
+                    self._record('hash', time.monotonic() - started_at)
+
+    def run(self, func, *args):
+        """Return `func(*args)` once a hashing slot is free.
+
+        Raises `HashingPoolSaturated` at once when the queue is full.
+        """
+        if not self._slots.acquire(False):
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise HashingPoolSaturated()
+        try:
+            with self._lock:
+                self._pending += 1
+            return self._call(time.monotonic(), func, args)
+        finally:
+            self._slots.release()
+
+    def get_stats(self):
+        """Return this process' queue depth, throughput and latency."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(
+                workers=self.workers,
+                queue_size=self.queue_size,
+                queued=self._pending,
+                running=self._running,
+            )
+        completed = stats['completed']
+        for name in ('hash', 'wait'):
+            total = stats.pop(f'{name}_seconds_total')
+            stats[f'{name}_seconds_avg'] = (
+                total / completed if completed else 0.0)
+
+        return stats
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide hashing pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = HashingPool(
+                    getattr(settings, 'PASSWORD_HASHING_WORKERS', 2),
+                    getattr(settings, 'PASSWORD_HASHING_QUEUE_SIZE', 16),
+                )
+
+    return _pool
+
+
+class PooledPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2 hasher admitted through the hashing pool.
+
+    The work factor comes from `PASSWORD_HASH_ITERATIONS`. Stored hashes
+    made with another work factor are re-hashed when their user next
+    signs in, so the cost can change without downtime.
+    """
+
+    @property
+    def iterations(self):
+        configured = getattr(settings, 'PASSWORD_HASH_ITERATIONS', None)
+        return configured or PBKDF2PasswordHasher.iterations
+
+    def encode(self, password, salt, iterations=None):
+        return get_pool().run(super().encode, password, salt, iterations)
@@ -0,0 +1,114 @@
+"""Django command to serve the application with pre-forked workers"""
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+
+from core.server import INTERFACES, Arbiter
+
+
+def parse_bind(value):
+    """Split 'host:port' (or '[host]:port' for IPv6) into its parts."""
+    host, _, port = value.rpartition(':')
+    try:
+        return host.strip('[]') or '0.0.0.0', int(port)
+    except ValueError:
+        raise CommandError(f'Invalid address {value!r}, expected host:port.')
+
+
+def disable_local_caches(workers):
+    """Turn off the token and response caches if workers cannot share them.
+
+    A process-local cache would keep serving revoked tokens and stale
+    responses in every worker but the one handling the change. Returns
+    whether the caches were turned off.
+    """
+    if workers < 2 or not isinstance(caches['default'], LocMemCache):
+        return False
+    settings.AUTH_TOKEN_CACHE = False
+    settings.RECIPE_RESPONSE_CACHE = False
+    return True
+
+
+class Command(BaseCommand):
+    """Serve the WSGI or ASGI application until interrupted."""
+    help = (
+        'Serve the application on pre-forked worker processes. '
+        'Send SIGHUP to reload the code without dropping connections.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--bind', default=settings.SERVE_BIND,
+            help='Address to listen on, as host:port.')
+        parser.add_argument(
+            '--workers', type=int, default=settings.SERVE_WORKERS)
+        parser.add_argument(
+            '--interface', choices=INTERFACES,
+            default=settings.SERVE_INTERFACE,
+            help='Serve app.wsgi or app.asgi (which needs uvicorn).')
+        parser.add_argument(
+            '--max-requests', type=int, default=settings.SERVE_MAX_REQUESTS,
+            help='Requests after which a worker is replaced; 0 never.')
+        parser.add_argument(
+            '--max-requests-jitter', type=int,
+            default=settings.SERVE_MAX_REQUESTS_JITTER,
+            help='Random extra requests, so workers restart at different '
+                 'times.')
+        parser.add_argument(
+            '--max-rss', type=int, default=settings.SERVE_MAX_RSS,
+            help='Resident megabytes after which a worker is replaced; '
+                 '0 never.')
+        parser.add_argument(
+            '--timeout', type=int, default=settings.SERVE_TIMEOUT,
+            help='Seconds to wait on a client socket.')
+        parser.add_argument(
+            '--graceful-timeout', type=int,
+            default=settings.SERVE_GRACEFUL_TIMEOUT,
+            help='Seconds stopping workers get to finish their requests.')
+        parser.add_argument(
+            '--access-log', action='store_true',
+            help='Log every request (WSGI only).')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        host, port = parse_bind(options['bind'])
+        if options['workers'] < 1:
+            raise CommandError('At least one worker is needed.')
+        if options['interface'] == 'asgi':
+            try:
+                import uvicorn  # noqa: F401
+            except ImportError:
+                raise CommandError('The ASGI interface needs uvicorn.')
+        if options['access_log']:
+            from core.server import RequestHandler
+            RequestHandler.access_log = True
+        logger = logging.getLogger('core.server')
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter(
+                '[%(asctime)s] [%(process)d] %(levelname)s %(message)s'))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+
+        if disable_local_caches(options['workers']):
+            logger.warning(
+                'The default cache is local to each process; serving '
+                'without the token and response caches. Set '
+                'MEMCACHED_LOCATION to share a cache between workers.')
+        self.stdout.write(
+            f'Serving on {host}:{port} with {options["workers"]} workers.')
+        Arbiter(
+            host=host,
+            port=port,
+            workers=options['workers'],
+            interface=options['interface'],
+            max_requests=options['max_requests'],
+            max_requests_jitter=options['max_requests_jitter'],
+            max_rss=options['max_rss'],
+            timeout=options['timeout'],
+            graceful_timeout=options['graceful_timeout'],
+        ).run()
+        self.stdout.write(self.style.SUCCESS('Server stopped.'))
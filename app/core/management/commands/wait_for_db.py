@@ -1,24 +1,31 @@
 """Django command to wait for database to be available"""
-import time
-from psycopg2 import OperationalError as Psycopg2OpError
+from django.core.management.base import BaseCommand, CommandError
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+
+from core.readiness import wait_for_database
 
 
 class Command(BaseCommand):
     """Django command to wait for database."""
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--timeout', type=float, default=None,
+            help='Seconds after which to give up; waits forever by default.')
+
     def handle(self, *args, **options):
         """Entrypoint for command"""
-        self.stdout.write('Waiting for datbase...')
-        db_up = False
-
-        while db_up is False:
-            try:
-                self.check(databases=['default'])
-                db_up = True
-            except (Psycopg2OpError, OperationalError):
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
-
-        self.stdout.write(self.style.SUCCESS('Database available!'))
+        self.stdout.write('Waiting for database...')
+
+        def on_retry(error, delay):
+            self.stdout.write(
+                f'Database unavailable, retrying in {delay:.2f}s...')
+
+        try:
+            attempts = wait_for_database(
+                timeout=options['timeout'], on_retry=on_retry)
+        except OperationalError as error:
+            raise CommandError(f'Database unavailable: {error}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Database available after {attempts} attempt(s)!'))
@@ -0,0 +1,46 @@
+"""Django command to run queued background tasks"""
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.tasks import Worker
+
+
+class Command(BaseCommand):
+    """Run tasks from the database queue until interrupted."""
+    help = 'Run queued background tasks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=settings.TASK_CONCURRENCY,
+            help='Worker processes; 0 runs tasks in this process.')
+        parser.add_argument(
+            '--poll-interval', type=float,
+            default=settings.TASK_POLL_INTERVAL,
+            help='Seconds to wait when the queue is empty.')
+        parser.add_argument(
+            '--timeout', type=int, default=settings.TASK_TIMEOUT,
+            help='Seconds after which a running task is interrupted.')
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Exit once the queue is empty.')
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            options['concurrency'],
+            options['poll_interval'],
+            options['timeout'],
+        )
+        handlers = {
+            signum: signal.signal(signum, lambda *args: worker.stop())
+            for signum in (signal.SIGINT, signal.SIGTERM)
+        }
+
+        self.stdout.write('Worker started.')
+        try:
+            worker.run(burst=options['burst'])
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+        self.stdout.write(self.style.SUCCESS('Worker stopped.'))
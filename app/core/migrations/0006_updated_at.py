@@ -0,0 +1,67 @@
+# Generated by Django 3.2.18 on 2026-10-17 09:00
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+import django.utils.timezone
+
+
+def backfill_recipes_updated_at(apps, schema_editor):
+    """Start users' list timestamps at their latest recipe, or now."""
+    User = apps.get_model('core', 'User')
+    Recipe = apps.get_model('core', 'Recipe')
+    db_alias = schema_editor.connection.alias
+    latest = Recipe.objects.using(db_alias).filter(
+        user=OuterRef('pk')
+    ).order_by('-updated_at').values('updated_at')[:1]
+    User.objects.using(db_alias).update(recipes_updated_at=Coalesce(
+        Subquery(latest),
+        Value(django.utils.timezone.now(), models.DateTimeField()),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_recipe_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='recipes_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'updated_at'], name='core_recipe_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'updated_at'], name='core_tag_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'updated_at'], name='core_ingredient_user_upd_idx'),
+        ),
+        migrations.RunPython(
+            backfill_recipes_updated_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 3.2.25 on 2026-10-17 12:00
+import re
+from collections import Counter
+
+import django.contrib.postgres.search
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX core_recipe_search_gin '
+            'ON core_recipe USING gin (search_vector);'
+        )
+
+
+def drop_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX core_recipe_search_gin;')
+
+
+def index_existing_recipes(apps, schema_editor):
+    """Build search data for recipes saved before this migration."""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            "UPDATE core_recipe SET search_vector = "
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), "
+            "'B');"
+        )
+        return
+
+    Recipe = apps.get_model('core', 'Recipe')
+    RecipeSearchTerm = apps.get_model('core', 'RecipeSearchTerm')
+    db_alias = schema_editor.connection.alias
+    for recipe in Recipe.objects.using(db_alias).iterator():
+        weights = Counter()
+        for term in re.findall(r'\w+', recipe.title.lower()):
+            weights[term[:64]] += 2
+        for term in re.findall(r'\w+', recipe.description.lower()):
+            weights[term[:64]] += 1
+        RecipeSearchTerm.objects.using(db_alias).bulk_create(
+            RecipeSearchTerm(recipe=recipe, term=term, weight=weight)
+            for term, weight in weights.items()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_recipe_ordering_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='RecipeSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.PositiveIntegerField()),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='core.recipe')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='recipesearchterm',
+            index=models.Index(fields=['term', 'recipe'], name='core_searchterm_term_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipesearchterm',
+            constraint=models.UniqueConstraint(fields=('recipe', 'term'), name='core_recipesearchterm_unique'),
+        ),
+        migrations.RunPython(create_gin_index, drop_gin_index),
+        migrations.RunPython(
+            index_existing_recipes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.25 on 2026-10-17 13:00
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    """Fold same-named tags and ingredients of a user into the oldest."""
+    Recipe = apps.get_model('core', 'Recipe')
+    db_alias = schema_editor.connection.alias
+    for relation, model_name in (('tags', 'Tag'), ('ingredients', 'Ingredient')):
+        Model = apps.get_model('core', model_name)
+        field = Recipe._meta.get_field(relation)
+        Through = field.remote_field.through
+        target = field.m2m_reverse_field_name()
+        duplicates = Model.objects.using(db_alias).values(
+            'user', 'name'
+        ).annotate(keep=Min('id'), count=Count('id')).filter(count__gt=1)
+        for row in duplicates:
+            others = Model.objects.using(db_alias).filter(
+                user=row['user'], name=row['name']
+            ).exclude(id=row['keep'])
+            for other_id in others.values_list('id', flat=True):
+                linked = Through.objects.using(db_alias).filter(
+                    **{target: row['keep']}).values('recipe_id')
+                Through.objects.using(db_alias).filter(
+                    **{target: other_id}
+                ).exclude(recipe_id__in=linked).update(
+                    **{target: row['keep']})
+            others.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_recipe_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
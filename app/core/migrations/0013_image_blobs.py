@@ -0,0 +1,48 @@
+# Generated by Django 3.2.25 on 2026-10-17 02:56
+
+import core.models
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_references(apps, schema_editor):
+    """Track the images of existing recipes under their current names."""
+    Recipe = apps.get_model('core', 'Recipe')
+    ImageBlob = apps.get_model('core', 'ImageBlob')
+    db_alias = schema_editor.connection.alias
+    references = Recipe.objects.using(db_alias).exclude(
+        image__isnull=True).exclude(image='').values('image').annotate(
+        count=Count('id'))
+    ImageBlob.objects.using(db_alias).bulk_create(
+        ImageBlob(name=row['image'], refcount=row['count'])
+        for row in references.iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('refcount', models.PositiveIntegerField(default=0)),
+                ('released_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=core.models.ContentAddressedImageField(null=True, upload_to=core.models.recipe_image_file_path),
+        ),
+        migrations.AddIndex(
+            model_name='imageblob',
+            index=models.Index(fields=['refcount', 'released_at'], name='core_imageblob_unused_idx'),
+        ),
+        migrations.RunPython(count_references, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-17 03:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_task'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['finished_at'], name='core_task_finished_idx'),
+        ),
+    ]
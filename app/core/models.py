@@ -1,24 +1,177 @@
 """
 Database Models
 """
-import uuid
+import hashlib
 import os
 
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q
+from django.db.models.fields.files import ImageFieldFile
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin
 )
 from django.conf import settings
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+# File extensions of the image formats recipes may store, by the format
+# Pillow detects.
+IMAGE_EXTENSIONS = {
+    'JPEG': '.jpg',
+    'PNG': '.png',
+    'GIF': '.gif',
+    'WEBP': '.webp',
+}
 
 
 def recipe_image_file_path(instance, filename):
-    """Generate file path for a recipe image"""
-    ext = os.path.splitext(filename)[1]
-    filename = f'{uuid.uuid4()}{ext}'
+    """Generate file path for a recipe image.
+
+    `filename` is the content hash given by `ContentAddressedImageField`;
+    files are spread over directories by its first two characters.
+    """
+    name, ext = os.path.splitext(filename)
+
+    return os.path.join('uploads', 'recipe', name[:2], f'{name}{ext.lower()}')
+
+
+def get_content_hash(file):
+    """Return the SHA-256 hex digest of a file's content.
+
+    Uploads hashed while streaming (see `recipe.uploads`) are not read
+    again.
+    """
+    digest = getattr(file, 'sha256', None)
+    if digest is None:
+        hasher = hashlib.sha256()
+        for chunk in file.chunks():
+            hasher.update(chunk)
+        file.seek(0)
+        digest = hasher.hexdigest()
+
+    return digest
+
+
+def get_image_extension(file):
+    """Return the file extension of an image's format.
+
+    The format is the one Pillow detects, not the uploaded name's;
+    uploads checked by `recipe.uploads.validate_image_header` carry it
+    as `image_format`. Raises ValueError for other formats.
+    """
+    image_format = getattr(file, 'image_format', None)
+    if image_format is None:
+        try:
+            with Image.open(file) as image:
+                image_format = image.format
+        except (UnidentifiedImageError, OSError):
+            image_format = None
+        finally:
+            file.seek(0)
+    if image_format not in IMAGE_EXTENSIONS:
+        raise ValueError(f'Unsupported image format {image_format}.')
+
+    return IMAGE_EXTENSIONS[image_format]
+
+
+class ImageBlobQuerySet(models.QuerySet):
+    """Reference counting for stored image files."""
+
+    def acquire(self, name):
+        """Count a new reference to the file stored as `name`."""
+        while True:
+            if self.filter(name=name).update(
+                    refcount=F('refcount') + 1, released_at=None):
+                return
+            try:
+                with transaction.atomic(using=self.db):
+                    self.create(name=name, refcount=1)
+                return
+            except IntegrityError:
+                # Created concurrently; count the reference on that row.
+                continue
+
+    def release(self, name):
+        """Drop a reference to the file stored as `name`."""
+        self.filter(name=name, refcount__gt=0).update(
+            refcount=F('refcount') - 1, released_at=timezone.now())
+
+
+class ImageBlob(models.Model):
+    """Stored image file shared by every recipe using the same content.
+
+    Files with no references left are deleted by `recipe.images`.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    refcount = models.PositiveIntegerField(default=0)
+    released_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ImageBlobQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['refcount', 'released_at'],
+                name='core_imageblob_unused_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class ContentAddressedFieldFile(ImageFieldFile):
+    """Image file named after its content and stored once.
 
-    return os.path.join('uploads', 'recipe', filename)
+    The extension follows the detected format, so identical content gets
+    one name whatever it was uploaded as.
+    """
+
+    def save(self, name, content, save=True):
+        ext = get_image_extension(content)
+        name = self.field.generate_filename(
+            self.instance, f'{get_content_hash(content)}{ext}')
+        ImageBlob.objects.acquire(name)
+        if not self.storage.exists(name):
+            stored = self.storage.save(
+                name, content, max_length=self.field.max_length)
+            if stored != name:
+                # Written concurrently under the same name, so the
+                # content is identical; keep that copy.
+                self.storage.delete(stored)
+        self.name = name
+        setattr(self.instance, self.field.attname, self.name)
+        self._committed = True
+
+        if save:
+            self.instance.save()
+    save.alters_data = True
+
+    def delete(self, save=True):
+        """Drop the reference; the file itself may still be shared."""
+        if not self:
+            return
+        ImageBlob.objects.release(self.name)
+        if hasattr(self, '_dimensions_cache'):
+            del self._dimensions_cache
+        if hasattr(self, '_file'):
+            self.close()
+            del self.file
+        self.name = None
+        setattr(self.instance, self.field.attname, self.name)
+        self._committed = False
+
+        if save:
+            self.instance.save()
+    delete.alters_data = True
+
+
+class ContentAddressedImageField(models.ImageField):
+    """Image field storing identical content once, under its hash."""
+    attr_class = ContentAddressedFieldFile
 
 
 class UserManager(BaseUserManager):
@@ -50,6 +203,7 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    recipes_updated_at = models.DateTimeField(null=True, blank=True)
 
     objects = UserManager()
     USERNAME_FIELD = 'email'
@@ -68,7 +222,37 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
     tags = models.ManyToManyField("Tag")
     ingredients = models.ManyToManyField("Ingredient")
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image = ContentAddressedImageField(
+        null=True, upload_to=recipe_image_file_path)
+    # {variant: {format: storage name}}, filled in by recipe.images.
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by recipe.search on PostgreSQL; GIN-indexed there.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'id'],
+                name='core_recipe_user_id_idx',
+            ),
+            models.Index(
+                fields=['user', 'updated_at'],
+                name='core_recipe_user_updated_idx',
+            ),
+            models.Index(
+                fields=['user', 'price'],
+                name='core_recipe_user_price_idx',
+            ),
+            models.Index(
+                fields=['user', 'time_minutes'],
+                name='core_recipe_user_time_idx',
+            ),
+            models.Index(
+                fields=['user', 'title'],
+                name='core_recipe_user_title_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -81,6 +265,21 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'updated_at'],
+                name='core_tag_user_updated_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='core_tag_user_name_unique',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -93,6 +292,100 @@ class Ingredient(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'updated_at'],
+                name='core_ingredient_user_upd_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='core_ingredient_user_name_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class RecipeSearchTerm(models.Model):
+    """Inverted index entry used for recipe search off PostgreSQL."""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='search_terms',
+    )
+    term = models.CharField(max_length=64)
+    weight = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'term'],
+                name='core_recipesearchterm_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['term', 'recipe'],
+                name='core_searchterm_term_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return self.term
+
+
+class Task(models.Model):
+    """Background work queued in the database, run by `manage.py worker`."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=255)
+    kwargs = models.JSONField(default=dict, blank=True)
+    # Higher priorities run first.
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(
+        max_length=8, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Seconds spent running the latest attempt.
+    duration = models.FloatField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['-priority', 'run_at', 'id'],
+                name='core_task_queued_idx',
+                condition=Q(status='queued'),
+            ),
+            models.Index(
+                fields=['started_at'],
+                name='core_task_running_idx',
+                condition=Q(status='running'),
+            ),
+            models.Index(
+                fields=['finished_at'],
+                name='core_task_finished_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -0,0 +1,164 @@
+"""
+Startup readiness and warmup.
+
+`wait_for_database` probes the database connection directly, retrying
+with exponential backoff from a few milliseconds, so a start is not
+held up longer than the database takes to come up.
+
+`warmup` pays for what each process' first requests would: the first
+database connection (and the per-process type lookups it caches), the
+URL patterns of every router, the serializers of every view and the
+OpenAPI schema. It also creates the password hashing pool, whose
+limits are then shared with forked processes. `manage.py serve` runs
+it once before forking its workers; other servers may call it from a
+startup hook. Importing `app.wsgi` or `app.asgi` does not.
+
+`/readyz` reports whether the database has answered and, in a process
+warming up, whether that is done. Until the database answers, each
+check probes it again.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.db.utils import OperationalError
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils import translation
+
+from core.hashing import get_pool
+
+logger = logging.getLogger(__name__)
+
+_warming_up = threading.Event()
+_warmed_up = threading.Event()
+_ready = threading.Event()
+_schemas = {}
+_schema_lock = threading.Lock()
+
+
+def is_ready():
+    """Return whether the database answered and any warmup is done."""
+    if _warming_up.is_set() and not _warmed_up.is_set():
+        return False
+    if not _ready.is_set():
+        try:
+            probe()
+        except OperationalError:
+            return False
+        _ready.set()
+
+    return True
+
+
+def probe(alias='default'):
+    """Connect to the database `alias` and run a trivial statement.
+
+    Goes through the backend's connection only, not the ORM; raises
+    OperationalError when the database cannot be reached.
+    """
+    connection = connections[alias]
+    try:
+        connection.ensure_connection()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    except OperationalError:
+        # Start from a fresh connection on the next attempt.
+        connection.close()
+        raise
+
+
+def wait_for_database(alias='default', timeout=None, initial_delay=0.01,
+                      max_delay=1.0, on_retry=None):
+    """Probe the database until it answers; return the attempts made.
+
+    Waits `initial_delay` seconds after the first failure, doubling up
+    to `max_delay`. Calls `on_retry(error, delay)` before each wait and
+    raises the last OperationalError after `timeout` seconds.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    delay = initial_delay
+    attempts = 0
+    while True:
+        attempts += 1
+        try:
+            probe(alias)
+            return attempts
+        except OperationalError as error:
+            if deadline is not None and time.monotonic() + delay > deadline:
+                raise
+            if on_retry is not None:
+                on_retry(error, delay)
+        time.sleep(delay)
+        delay = min(delay * 2, max_delay)
+
+
+def iter_views(resolver=None):
+    """Yield every view callback in the URL configuration."""
+    for pattern in (resolver or get_resolver()).url_patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_views(pattern)
+        elif isinstance(pattern, URLPattern):
+            yield pattern.callback
+
+
+def get_serializer_classes():
+    """Return the serializer classes used by the API views."""
+    classes = set()
+    for callback in iter_views():
+        view_class = getattr(callback, 'cls', None)
+        if getattr(view_class, 'serializer_class', None) is None:
+            continue
+        view = view_class(**getattr(callback, 'initkwargs', {}))
+        # Viewsets pick serializers per action.
+        for action in set(getattr(callback, 'actions', {}).values()) or [None]:
+            view.action = action
+            if hasattr(view, 'get_serializer_class'):
+                classes.add(view.get_serializer_class())
+            else:
+                classes.add(view.serializer_class)
+
+    return classes
+
+
+def get_schema():
+    """Return the OpenAPI schema, generating it once per language."""
+    from drf_spectacular.settings import spectacular_settings
+
+    language = translation.get_language()
+    if language not in _schemas:
+        with _schema_lock:
+            if language not in _schemas:
+                generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+                _schemas[language] = generator.get_schema(
+                    request=None, public=spectacular_settings.SERVE_PUBLIC)
+
+    return _schemas[language]
+
+
+def warmup():
+    """Prepare this process to serve requests at full speed."""
+    if _warming_up.is_set():
+        return
+    _warming_up.set()
+    start = time.perf_counter()
+    database = True
+    try:
+        wait_for_database(
+            timeout=getattr(settings, 'READINESS_DATABASE_TIMEOUT', 30))
+    except OperationalError:
+        database = False
+        logger.warning('Database unavailable, warming up without it')
+    # Building the reverse lookups imports every URLconf, and with them
+    # the routers' URL patterns.
+    get_resolver().reverse_dict
+    for serializer_class in get_serializer_classes():
+        serializer_class().fields
+    get_schema()
+    get_pool()
+    _warmed_up.set()
+    if database:
+        _ready.set()
+    logger.info('Warmed up in %.3fs', time.perf_counter() - start)
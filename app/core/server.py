@@ -0,0 +1,362 @@
+"""
+Pre-forking HTTP server for production.
+
+The arbiter imports the WSGI or ASGI application once, warms it up and
+forks `workers` processes that share the listening socket, so they
+start ready and share the preloaded memory copy-on-write. Workers are
+recycled after `max_requests` requests (plus some jitter, so they do
+not all restart at once) or when their resident memory exceeds
+`max_rss` megabytes.
+
+SIGHUP reloads without dropping connections: the arbiter re-executes
+itself with the socket kept open, preloads the new code and forks new
+workers, then stops the old ones once their requests are done. SIGTERM
+and SIGINT stop gracefully, waiting up to `graceful_timeout` seconds.
+
+Before a worker exits it sends `worker_exiting`, so receivers can finish
+background work (e.g. image variants) the process started.
+"""
+import gc
+import logging
+import os
+import random
+import selectors
+import signal
+import socket
+import socketserver
+import sys
+import time
+
+from django.core.servers.basehttp import WSGIRequestHandler
+from django.db import connections
+from django.dispatch import Signal
+
+from core.readiness import warmup
+
+logger = logging.getLogger(__name__)
+
+LISTEN_FD_ENV = 'SERVE_LISTEN_FD'
+OLD_WORKERS_ENV = 'SERVE_OLD_WORKERS'
+INTERFACES = ('wsgi', 'asgi')
+
+# Sent by a worker process once it stopped serving, before it exits.
+worker_exiting = Signal()
+
+
+def preload(interface):
+    """Import and warm up the application (see `core.readiness`)."""
+    if interface == 'asgi':
+        from app.asgi import application
+    else:
+        from app.wsgi import application
+    warmup()
+    # Workers must not share the arbiter's database connections.
+    connections.close_all()
+
+    return application
+
+
+def create_socket(host, port, backlog=2048):
+    """Return a non-blocking socket listening on host:port.
+
+    Reuses the socket passed on by a reloading arbiter, if any.
+    """
+    fd = os.environ.pop(LISTEN_FD_ENV, None)
+    if fd is not None:
+        sock = socket.socket(fileno=int(fd))
+    else:
+        family = socket.AF_INET6 if ':' in host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        sock.listen(backlog)
+    # Idle workers all wait on the socket; those losing the race to
+    # accept go back to waiting instead of blocking.
+    sock.setblocking(False)
+
+    return sock
+
+
+def get_rss(pid):
+    """Return a process' resident memory in bytes, or None if unknown."""
+    try:
+        with open(f'/proc/{pid}/statm') as file:
+            pages = int(file.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+
+    return pages * os.sysconf('SC_PAGE_SIZE')
+
+
+def drain():
+    """Let `worker_exiting` receivers finish this process' work."""
+    for receiver, result in worker_exiting.send_robust(sender=Worker):
+        if isinstance(result, Exception):
+            logger.error('Could not drain %s', receiver, exc_info=result)
+
+
+class RequestHandler(WSGIRequestHandler):
+    """Django's request handler, logging requests only on demand.
+
+    The server is not threaded, so Django closes each connection after
+    its response: idle keep-alive connections cannot hold up a worker.
+    """
+    access_log = False
+
+    def log_message(self, format, *args):
+        if self.access_log:
+            super().log_message(format, *args)
+
+
+class WSGIServer(socketserver.BaseServer):
+    """Serve a WSGI application on an already listening socket."""
+
+    def __init__(self, sock, application, timeout):
+        super().__init__(sock.getsockname(), RequestHandler)
+        self.socket = sock
+        self.application = application
+        self.request_timeout = timeout
+        # How often an idle worker checks whether it should stop.
+        self.timeout = 1.0
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(sock, selectors.EVENT_READ)
+        host, port = sock.getsockname()[:2]
+        self.server_name = socket.getfqdn(host)
+        self.server_port = port
+        self.base_environ = {
+            'SERVER_NAME': self.server_name,
+            'GATEWAY_INTERFACE': 'CGI/1.1',
+            'SERVER_PORT': str(port),
+            'REMOTE_HOST': '',
+            'CONTENT_LENGTH': '',
+            'SCRIPT_NAME': '',
+        }
+        self.served = 0
+
+    def fileno(self):
+        return self.socket.fileno()
+
+    def handle_request(self):
+        """Serve one connection, or return after `timeout` idle seconds."""
+        # The socket is non-blocking, so BaseServer would poll it without
+        # ever sleeping.
+        if not self._selector.select(self.timeout):
+            return
+        try:
+            request, address = self.get_request()
+        except OSError:
+            # Accepted by another worker.
+            return
+        try:
+            self.process_request(request, address)
+        except Exception:
+            self.handle_error(request, address)
+            self.shutdown_request(request)
+
+    def get_request(self):
+        request, address = self.socket.accept()
+        request.settimeout(self.request_timeout)
+        return request, address
+
+    def get_app(self):
+        return self.application
+
+    def shutdown_request(self, request):
+        try:
+            request.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+        request.close()
+        self.served += 1
+
+    def handle_error(self, request, client_address):
+        logger.exception('Error serving %s', client_address)
+
+
+class Worker:
+    """Forked process serving requests until stopped or recycled."""
+
+    def __init__(self, sock, application, interface, max_requests, timeout):
+        self.sock = sock
+        self.application = application
+        self.interface = interface
+        self.max_requests = max_requests
+        self.timeout = timeout
+        self.ppid = os.getppid()
+        self._stopping = False
+
+    def stop(self, *args):
+        self._stopping = True
+
+    def run(self):
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, self.stop)
+        if self.interface == 'asgi':
+            self._run_asgi()
+        else:
+            self._run_wsgi()
+
+    def _run_wsgi(self):
+        server = WSGIServer(self.sock, self.application, self.timeout)
+        while not self._stopping and os.getppid() == self.ppid:
+            server.handle_request()
+            if self.max_requests and server.served >= self.max_requests:
+                break
+
+    def _run_asgi(self):
+        import uvicorn
+
+        config = uvicorn.Config(
+            self.application,
+            lifespan='off',
+            access_log=False,
+            limit_max_requests=self.max_requests or None,
+            timeout_keep_alive=5,
+        )
+        # uvicorn installs its own graceful SIGTERM handling.
+        uvicorn.Server(config).run(sockets=[self.sock])
+
+
+class Arbiter:
+    """Keep `workers` preloaded worker processes serving a socket."""
+
+    tick = 0.5
+
+    def __init__(self, host='0.0.0.0', port=9080, workers=2,
+                 interface='wsgi', max_requests=1000,
+                 max_requests_jitter=50, max_rss=0, timeout=30,
+                 graceful_timeout=30):
+        if interface not in INTERFACES:
+            raise ValueError(f'Unknown interface {interface!r}.')
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.interface = interface
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.max_rss = max_rss * 1024 * 1024
+        self.timeout = timeout
+        self.graceful_timeout = graceful_timeout
+        self.children = set()
+        # {pid: time by which it must have exited}
+        self.retiring = {}
+        self.sock = None
+        self.application = None
+        self._signals = []
+
+    def run(self):
+        """Serve until SIGTERM or SIGINT; re-execute on SIGHUP."""
+        self.sock = create_socket(self.host, self.port)
+        self.application = preload(self.interface)
+        # Keep preloaded objects out of the collector's reach, so it does
+        # not touch (and copy) their pages in every worker.
+        gc.freeze()
+        for signum in (signal.SIGHUP, signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda signum, frame: self._signals.append(
+                signum))
+
+        old_workers = os.environ.pop(OLD_WORKERS_ENV, '')
+        self._spawn_workers()
+        for pid in filter(None, old_workers.split(',')):
+            self._retire(int(pid))
+        logger.info('Serving %s on %s:%s with %s workers (pid %s)',
+                    self.interface, self.host, self.port, self.workers,
+                    os.getpid())
+
+        while True:
+            while self._signals:
+                signum = self._signals.pop(0)
+                if signum == signal.SIGHUP:
+                    self._reload()
+                else:
+                    self._stop()
+                    return
+            self._reap()
+            self._check_memory()
+            self._spawn_workers()
+            time.sleep(self.tick)
+
+    def _spawn_workers(self):
+        while len(self.children) < self.workers:
+            max_requests = self.max_requests
+            if max_requests and self.max_requests_jitter:
+                max_requests += random.randint(0, self.max_requests_jitter)
+            pid = os.fork()
+            if pid == 0:
+                status = 0
+                try:
+                    Worker(self.sock, self.application, self.interface,
+                           max_requests, self.timeout).run()
+                except BaseException:
+                    logger.exception('Worker %s crashed', os.getpid())
+                    status = 1
+                finally:
+                    drain()
+                    # Skip the arbiter's exit handlers.
+                    os._exit(status)
+            self.children.add(pid)
+
+    def _retire(self, pid):
+        self.children.discard(pid)
+        self.retiring[pid] = time.monotonic() + self.graceful_timeout
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if not pid:
+                break
+            if pid in self.children and os.waitstatus_to_exitcode(status):
+                logger.warning('Worker %s exited with %s', pid,
+                               os.waitstatus_to_exitcode(status))
+            self.children.discard(pid)
+            self.retiring.pop(pid, None)
+
+        now = time.monotonic()
+        for pid, deadline in list(self.retiring.items()):
+            if now > deadline:
+                logger.warning('Killing worker %s after the graceful timeout',
+                               pid)
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                self.retiring[pid] = float('inf')
+
+    def _check_memory(self):
+        if not self.max_rss:
+            return
+        for pid in list(self.children):
+            rss = get_rss(pid)
+            if rss is not None and rss > self.max_rss:
+                logger.info('Recycling worker %s using %s MB', pid,
+                            rss // (1024 * 1024))
+                self._retire(pid)
+
+    def _reload(self):
+        logger.info('Reloading')
+        os.set_inheritable(self.sock.fileno(), True)
+        os.environ[LISTEN_FD_ENV] = str(self.sock.fileno())
+        # The pid stays the same, so the old workers remain children of
+        # the new arbiter, which stops them once its own are running.
+        os.environ[OLD_WORKERS_ENV] = ','.join(
+            map(str, self.children | set(self.retiring)))
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+
+    def _stop(self):
+        logger.info('Stopping')
+        for pid in list(self.children):
+            self._retire(pid)
+        while self.retiring:
+            self._reap()
+            time.sleep(0.1)
+        self.sock.close()
@@ -0,0 +1,23 @@
+"""
+Signal handlers for the core models
+"""
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from core.authentication import revoke_tokens
+
+
+@receiver(post_delete, sender=Token)
+def revoke_deleted_token(sender, instance, **kwargs):
+    """Stop accepting a deleted token straight away."""
+    revoke_tokens([instance.key])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def revoke_user_tokens(sender, instance, created, **kwargs):
+    """Drop cached copies of a user, e.g. deactivated or re-passworded."""
+    if not created:
+        revoke_tokens(
+            Token.objects.filter(user=instance).values_list('key', flat=True))
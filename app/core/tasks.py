@@ -0,0 +1,383 @@
+"""
+Background task queue stored in the database.
+
+Functions decorated with `@task` are queued with `.enqueue(**kwargs)`,
+in the caller's transaction, and run by `manage.py worker`. Workers
+claim queued rows with `SELECT ... FOR UPDATE SKIP LOCKED`, so any
+number of them can share the table without a broker; tasks run on a
+pool of worker processes. Failed tasks are retried with exponential
+backoff up to their `max_attempts`, and each attempt records how long
+it waited and ran.
+
+Attempts are interrupted after the worker's timeout; tasks left running
+by a dead worker are queued again, or failed once out of attempts.
+Workers also queue the tasks in `TASK_PERIODIC` at their intervals and
+delete finished tasks after `TASK_KEEP_DONE` seconds.
+"""
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Avg, Count, F, Max, Q
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules, import_string
+
+from core.models import Task
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+class TaskTimeout(Exception):
+    """Raised in a task running past the worker's timeout."""
+
+
+def _raise_timeout(signum, frame):
+    raise TaskTimeout('Task timed out.')
+
+
+class TaskFunction:
+    """A function that can be queued to run on a worker."""
+
+    def __init__(self, func, name, priority, max_attempts):
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+
+    def __call__(self, **kwargs):
+        return self.func(**kwargs)
+
+    def enqueue(self, priority=None, delay=0, **kwargs):
+        """Queue a run with JSON-serializable `kwargs`; return the Task."""
+        return enqueue(
+            self.name,
+            kwargs,
+            priority=self.priority if priority is None else priority,
+            delay=delay,
+            max_attempts=self.max_attempts,
+        )
+
+
+def task(name=None, priority=0, max_attempts=3):
+    """Register the decorated function as a task.
+
+    Tasks are named after their import path unless `name` is given.
+    """
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__qualname__}'
+        registry[task_name] = TaskFunction(
+            func, task_name, priority, max_attempts)
+        return registry[task_name]
+
+    return decorator
+
+
+def enqueue(name, kwargs=None, priority=0, delay=0, max_attempts=3):
+    """Queue a run of the task `name`; return the Task."""
+    return Task.objects.create(
+        name=name,
+        kwargs=kwargs or {},
+        priority=priority,
+        max_attempts=max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def get_task(name):
+    """Return the registered task `name`, importing it if needed."""
+    if name not in registry:
+        autodiscover_modules('tasks')
+    if name not in registry:
+        import_string(name)
+
+    return registry[name]
+
+
+def execute(name, kwargs, timeout=None):
+    """Run a task; return (error traceback or None, seconds taken).
+
+    Runs in a worker process, which keeps its own connections. Tasks
+    running for over `timeout` seconds are interrupted with TaskTimeout
+    (through SIGALRM, so only on the main thread).
+    """
+    alarm = bool(timeout) and (
+        threading.current_thread() is threading.main_thread())
+    if alarm:
+        handler = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    start = time.perf_counter()
+    try:
+        try:
+            get_task(name)(**kwargs)
+        finally:
+            if alarm:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+    finally:
+        if alarm:
+            signal.signal(signal.SIGALRM, handler)
+        close_old_connections()
+
+    return error, time.perf_counter() - start
+
+
+def get_retry_delay(attempts):
+    """Return the seconds to wait before retrying after `attempts`."""
+    base = getattr(settings, 'TASK_RETRY_DELAY', 5)
+    limit = getattr(settings, 'TASK_MAX_RETRY_DELAY', 3600)
+    return min(base * 2 ** (attempts - 1), limit)
+
+
+def claim(limit):
+    """Mark up to `limit` due tasks as running and return them.
+
+    Rows locked by other workers are skipped. Databases without
+    SKIP LOCKED still claim each row at most once, through the
+    conditional status update.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        candidates = list(Task.objects.select_for_update(
+            skip_locked=True
+        ).filter(
+            status=Task.QUEUED, run_at__lte=now
+        ).order_by('-priority', 'run_at', 'id').values_list(
+            'id', flat=True
+        )[:limit])
+        claimed = [
+            task_id for task_id in candidates
+            if Task.objects.filter(pk=task_id, status=Task.QUEUED).update(
+                status=Task.RUNNING,
+                started_at=now,
+                attempts=F('attempts') + 1,
+            )
+        ]
+
+    return list(Task.objects.filter(pk__in=claimed).order_by(
+        '-priority', 'run_at', 'id'))
+
+
+def finish(task, error, duration):
+    """Record the outcome of a claimed task's attempt.
+
+    Outcomes of attempts since taken as lost (see `requeue_stale`) are
+    dropped, so they cannot overwrite a later attempt's row.
+    """
+    now = timezone.now()
+    changes = {'finished_at': now, 'duration': duration}
+    if error is None:
+        changes.update(status=Task.DONE, last_error='')
+    elif task.attempts < task.max_attempts:
+        changes.update(
+            status=Task.QUEUED,
+            run_at=now + timedelta(seconds=get_retry_delay(task.attempts)),
+            last_error=error,
+        )
+    else:
+        changes.update(status=Task.FAILED, last_error=error)
+    Task.objects.filter(
+        pk=task.pk, status=Task.RUNNING, attempts=task.attempts
+    ).update(**changes)
+
+    waited = (task.started_at - task.run_at).total_seconds()
+    if error is None:
+        logger.info('Task %s #%s done in %.3fs after waiting %.3fs',
+                    task.name, task.pk, duration, waited)
+    else:
+        logger.warning('Task %s #%s attempt %s failed in %.3fs:\n%s',
+                       task.name, task.pk, task.attempts, duration, error)
+
+
+def requeue_stale(timeout):
+    """Queue again tasks running for over `timeout` seconds.
+
+    Such tasks belong to workers that died without finishing them; live
+    workers interrupt tasks at their own timeout. Tasks out of attempts
+    (e.g. because they kill their worker) are marked failed instead.
+    Returns the number of tasks queued again.
+    """
+    now = timezone.now()
+    stale = Task.objects.filter(
+        status=Task.RUNNING,
+        started_at__lt=now - timedelta(seconds=timeout),
+    )
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Task.FAILED,
+        finished_at=now,
+        last_error='Worker lost while running the task.',
+    )
+    requeued = stale.update(status=Task.QUEUED, run_at=now)
+    if failed or requeued:
+        logger.warning('Found %s lost tasks: %s queued again, %s failed',
+                       failed + requeued, requeued, failed)
+
+    return requeued
+
+
+def get_periodic_tasks():
+    """Return {task name: seconds between runs} of periodic tasks."""
+    return getattr(settings, 'TASK_PERIODIC', {})
+
+
+def enqueue_periodic(schedule):
+    """Queue the tasks in `schedule` not queued within their interval.
+
+    `schedule` maps task names to seconds. Returns the queued Tasks.
+    """
+    now = timezone.now()
+    queued = []
+    for name, interval in schedule.items():
+        if not Task.objects.filter(
+                name=name,
+                created_at__gt=now - timedelta(seconds=interval)).exists():
+            queued.append(get_task(name).enqueue())
+
+    return queued
+
+
+def prune(age):
+    """Delete tasks done over `age` seconds ago; return how many.
+
+    Failed tasks are kept for inspection.
+    """
+    cutoff = timezone.now() - timedelta(seconds=age)
+    deleted, _ = Task.objects.filter(
+        status=Task.DONE, finished_at__lt=cutoff).delete()
+
+    return deleted
+
+
+def get_stats(window=None):
+    """Return per-task counts and timings.
+
+    Counts queued and running tasks, and those finished within the last
+    `window` seconds (`TASK_STATS_WINDOW` by default).
+    """
+    if window is None:
+        window = getattr(settings, 'TASK_STATS_WINDOW', 3600)
+    since = timezone.now() - timedelta(seconds=window)
+    rows = Task.objects.filter(
+        Q(status__in=[Task.QUEUED, Task.RUNNING]) | Q(finished_at__gte=since)
+    ).values('name').annotate(
+        queued=Count('id', filter=Q(status=Task.QUEUED)),
+        running=Count('id', filter=Q(status=Task.RUNNING)),
+        done=Count('id', filter=Q(status=Task.DONE)),
+        failed=Count('id', filter=Q(status=Task.FAILED)),
+        avg_duration=Avg('duration', filter=Q(status=Task.DONE)),
+        max_duration=Max('duration', filter=Q(status=Task.DONE)),
+        avg_wait=Avg(
+            F('started_at') - F('run_at'),
+            filter=Q(status__in=[Task.DONE, Task.FAILED]),
+        ),
+    ).order_by('name')
+
+    stats = {}
+    for row in rows:
+        name = row.pop('name')
+        if row['avg_wait'] is not None:
+            row['avg_wait'] = row['avg_wait'].total_seconds()
+        stats[name] = row
+
+    return stats
+
+
+class Worker:
+    """Claim and run tasks until stopped.
+
+    Tasks run on `concurrency` worker processes, or in this process
+    when it is 0, and are interrupted after `timeout` seconds. Tasks
+    running for `stale_grace` seconds longer are taken to belong to a
+    dead worker and are queued again.
+    """
+    stale_grace = 60
+
+    def __init__(self, concurrency=1, poll_interval=1.0, timeout=900):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self._stopping = threading.Event()
+        self._executor = None
+
+    def stop(self):
+        """Stop claiming tasks; running ones are finished first."""
+        self._stopping.set()
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.concurrency,
+            mp_context=multiprocessing.get_context('spawn'),
+            # Referenced directly so workers set up Django before they
+            # unpickle anything importing models.
+            initializer=django.setup,
+        )
+
+    def _collect(self, futures, timeout):
+        done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            task = futures.pop(future)
+            try:
+                error, duration = future.result()
+            except BrokenProcessPool:
+                error, duration = traceback.format_exc(), 0.0
+                self._executor = self._new_executor()
+            finish(task, error, duration)
+
+    def _maintain(self, burst):
+        """Recover lost tasks, queue periodic ones and prune old ones."""
+        requeue_stale(self.timeout + self.stale_grace)
+        if not burst:
+            enqueue_periodic(get_periodic_tasks())
+        prune(getattr(settings, 'TASK_KEEP_DONE', 24 * 60 * 60))
+
+    def run(self, burst=False):
+        """Work until stopped, or until the queue is empty with `burst`."""
+        autodiscover_modules('tasks')
+        if self.concurrency:
+            self._executor = self._new_executor()
+        futures = {}
+        next_maintenance = 0
+        try:
+            while not self._stopping.is_set():
+                if time.monotonic() >= next_maintenance:
+                    self._maintain(burst)
+                    next_maintenance = time.monotonic() + self.timeout / 10
+
+                free = 1
+                if self._executor is not None:
+                    free = self.concurrency - len(futures)
+                tasks = claim(free) if free > 0 else []
+                if self._executor is None:
+                    for claimed in tasks:
+                        finish(claimed, *execute(
+                            claimed.name, claimed.kwargs, self.timeout))
+                else:
+                    for claimed in tasks:
+                        futures[self._executor.submit(
+                            execute, claimed.name, claimed.kwargs,
+                            self.timeout,
+                        )] = claimed
+
+                if futures:
+                    self._collect(futures, self.poll_interval)
+                elif not tasks:
+                    if burst:
+                        break
+                    self._stopping.wait(self.poll_interval)
+            while futures:
+                self._collect(futures, None)
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
@@ -0,0 +1,173 @@
+"""
+Tests for cached token authentication.
+"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import (
+    LRUCache,
+    get_token_cache_key,
+    get_token_digest,
+    local_tokens,
+)
+
+ME_URL = reverse('user:me')
+
+
+class LRUCacheTests(TestCase):
+    """Test the in-process LRU."""
+
+    def test_evicts_least_recently_used(self):
+        """Test the oldest unused entry is evicted at capacity."""
+        lru = LRUCache(maxsize=2, timeout=60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+
+        self.assertEqual(lru.get('a'), 1)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('c'), 3)
+
+    def test_entries_expire(self):
+        """Test entries are dropped after the timeout."""
+        lru = LRUCache(maxsize=2, timeout=60)
+        with patch('core.authentication.time.monotonic', return_value=0):
+            lru.set('a', 1)
+        with patch('core.authentication.time.monotonic', return_value=61):
+            self.assertIsNone(lru.get('a'))
+
+    def test_set_skipped_after_delete(self):
+        """Test values read before a deletion are not stored after it."""
+        lru = LRUCache(maxsize=2, timeout=60)
+        generation = lru.generation
+        lru.delete('a')
+
+        lru.set('a', 1, generation)
+
+        self.assertIsNone(lru.get('a'))
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating requests with cached tokens."""
+
+    def setUp(self):
+        cache.clear()
+        local_tokens.clear()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'password123', name='Test')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_lookup_cached(self):
+        """Test the token is only looked up in the database once."""
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        local_tokens.clear()
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['email'], self.user.email)
+
+    @override_settings(AUTH_TOKEN_CACHE=False)
+    def test_shared_cache_disabled(self):
+        """Test lookups skip the shared cache when it is turned off."""
+        self.client.get(ME_URL)
+
+        self.assertIsNone(cache.get(get_token_cache_key(self.token.key)))
+        with self.assertNumQueries(0):
+            self.client.get(ME_URL)
+
+    def test_invalid_token_rejected(self):
+        """Test unknown tokens are rejected and not cached."""
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIsNone(cache.get(get_token_cache_key('invalid')))
+
+    def test_deleted_token_revoked(self):
+        """Test a deleted token stops working immediately."""
+        self.client.get(ME_URL)
+
+        self.token.delete()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_revoked(self):
+        """Test a deactivated user's token stops working immediately."""
+        self.client.get(ME_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_revokes_cache(self):
+        """Test changing the password drops the cached user."""
+        self.client.get(ME_URL)
+        key = get_token_cache_key(self.token.key)
+        self.assertIsNotNone(cache.get(key))
+
+        res = self.client.patch(ME_URL, {'password': 'newpassword123'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(get_token_cache_key(self.token.key), key)
+        self.assertIsNone(local_tokens.get(get_token_digest(self.token.key)))
+
+    def test_revocation_during_lookup(self):
+        """Test a lookup racing a revocation does not cache the token."""
+        lookup = TokenAuthentication.authenticate_credentials
+
+        def revoked_during_lookup(auth, key):
+            result = lookup(auth, key)
+            self.token.delete()
+            return result
+
+        with patch.object(TokenAuthentication, 'authenticate_credentials',
+                          revoked_during_lookup):
+            self.assertEqual(
+                self.client.get(ME_URL).status_code, status.HTTP_200_OK)
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile_update_not_stale(self):
+        """Test a profile update is visible on the next request."""
+        self.client.get(ME_URL)
+
+        self.client.patch(ME_URL, {'name': 'Renamed'})
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'Renamed')
+
+    def test_profile_update_keeps_other_changes(self):
+        """Test updating from a cached user keeps newer columns."""
+        self.client.get(ME_URL)
+        touched_at = timezone.now()
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            recipes_updated_at=touched_at)
+
+        self.client.patch(ME_URL, {'name': 'Renamed'})
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, 'Renamed')
+        self.assertEqual(self.user.recipes_updated_at, touched_at)
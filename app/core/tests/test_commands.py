@@ -0,0 +1,42 @@
+"""
+Test custom Django management commands.
+"""
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.utils import OperationalError
+from django.test import SimpleTestCase
+
+
+@patch('core.readiness.time.sleep')
+@patch('core.readiness.probe')
+class CommandTests(SimpleTestCase):
+    """Test commands."""
+
+    def test_wait_for_db_ready(self, patched_probe, patched_sleep):
+        """Test waiting for database if database ready."""
+        call_command('wait_for_db', stdout=StringIO())
+
+        patched_probe.assert_called_once_with('default')
+        patched_sleep.assert_not_called()
+
+    def test_wait_for_db_delay(self, patched_probe, patched_sleep):
+        """Test waiting for database backs off exponentially."""
+        patched_probe.side_effect = [OperationalError] * 8 + [None]
+
+        call_command('wait_for_db', stdout=StringIO())
+
+        self.assertEqual(patched_probe.call_count, 9)
+        self.assertEqual(
+            [call.args[0] for call in patched_sleep.call_args_list],
+            [0.01, 0.02, 0.04, 0.08, 0.16, 0.32, 0.64, 1.0],
+        )
+
+    def test_wait_for_db_timeout(self, patched_probe, patched_sleep):
+        """Test waiting for database gives up after the timeout."""
+        patched_probe.side_effect = OperationalError('refused')
+
+        with self.assertRaises(CommandError):
+            call_command('wait_for_db', timeout=0, stdout=StringIO())
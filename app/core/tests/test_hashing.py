@@ -0,0 +1,145 @@
+"""
+Tests for the password hashing pool.
+"""
+import multiprocessing
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.hashing import HashingPool, HashingPoolSaturated, get_pool
+
+TOKEN_URL = reverse('user:token')
+CREATE_USER_URL = reverse('user:create')
+STATS_URL = reverse('user:hashing-stats')
+
+
+class HashingPoolTests(TestCase):
+    """Test the bounded hashing pool."""
+
+    def test_run_on_calling_thread(self):
+        """Test calls run on the caller's thread and are counted."""
+        pool = HashingPool(workers=1, queue_size=0)
+
+        thread = pool.run(threading.current_thread)
+
+        self.assertIs(thread, threading.current_thread())
+        stats = pool.get_stats()
+        self.assertEqual(stats['completed'], 1)
+        self.assertEqual(stats['queued'], 0)
+        self.assertGreaterEqual(stats['hash_seconds_max'], 0)
+
+    def test_saturated_pool_rejects(self):
+        """Test a call is rejected at once when no slot is free."""
+        pool = HashingPool(workers=1, queue_size=0)
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        worker = threading.Thread(target=pool.run, args=(block,))
+        worker.start()
+        started.wait(5)
+        try:
+            with self.assertRaises(HashingPoolSaturated):
+                pool.run(lambda: None)
+            self.assertEqual(pool.get_stats()['running'], 1)
+        finally:
+            release.set()
+            worker.join()
+
+        self.assertEqual(pool.get_stats()['rejected'], 1)
+        self.assertIsNone(pool.run(lambda: None))
+
+    def test_limit_shared_with_forked_processes(self):
+        """Test a hash running in a forked process takes a shared slot."""
+        pool = HashingPool(workers=1, queue_size=0)
+        context = multiprocessing.get_context('fork')
+        started, release = context.Event(), context.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        child = context.Process(target=pool.run, args=(block,))
+        child.start()
+        started.wait(5)
+        try:
+            with self.assertRaises(HashingPoolSaturated):
+                pool.run(lambda: None)
+        finally:
+            release.set()
+            child.join(5)
+
+        self.assertEqual(child.exitcode, 0)
+        self.assertIsNone(pool.run(lambda: None))
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000)
+class PasswordHashingTests(TestCase):
+    """Test signing up and in through the hashing pool."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.payload = {'email': 'user@example.com', 'password': 'pass1234'}
+
+    def test_login_uses_pool(self):
+        """Test checking a password goes through the pool."""
+        user = get_user_model().objects.create_user(**self.payload)
+        completed = get_pool().get_stats()['completed']
+
+        self.assertTrue(user.check_password(self.payload['password']))
+        self.assertEqual(get_pool().get_stats()['completed'], completed + 1)
+
+    def test_saturated_login_returns_503(self):
+        """Test sign-in and sign-up fail fast when hashing is saturated."""
+        get_user_model().objects.create_user(**self.payload)
+
+        with patch.object(
+                HashingPool, 'run', side_effect=HashingPoolSaturated):
+            login = self.client.post(TOKEN_URL, self.payload)
+            signup = self.client.post(CREATE_USER_URL, {
+                'email': 'new@example.com',
+                'password': 'pass1234',
+                'name': 'New',
+            })
+
+        for res in (login, signup):
+            self.assertEqual(
+                res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            self.assertEqual(res['Retry-After'], '1')
+        self.assertFalse(
+            get_user_model().objects.filter(email='new@example.com').exists())
+
+    def test_login_upgrades_work_factor(self):
+        """Test signing in re-hashes a password made with old settings."""
+        user = get_user_model().objects.create_user(**self.payload)
+        self.assertIn('$1000$', user.password)
+
+        with self.settings(PASSWORD_HASH_ITERATIONS=2000):
+            res = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertIn('$2000$', user.password)
+
+    def test_stats_admin_only(self):
+        """Test the hashing figures are reported to admins only."""
+        user = get_user_model().objects.create_user(**self.payload)
+        self.client.force_authenticate(user)
+
+        res = self.client.get(STATS_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        user.is_staff = True
+        user.save()
+        res = self.client.get(STATS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('queued', res.data)
+        self.assertIn('hash_seconds_avg', res.data)
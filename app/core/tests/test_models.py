@@ -1,7 +1,6 @@
 """
     Test for Models
 """
-from unittest.mock import patch
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from decimal import Decimal
@@ -85,11 +84,8 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(ing), ing.name)
 
-    @patch('core.models.uuid.uuid4')
-    def test_recipe_file_name_uuid(self, mock_uuid):
-        """Test generating image path."""
-        uuid = 'test-uuid'
-        mock_uuid.return_value = uuid
-        file_path = models.recipe_image_file_path(None, 'example.jpg')
+    def test_recipe_file_name_hash(self):
+        """Test generating image path from the content hash."""
+        file_path = models.recipe_image_file_path(None, 'abc123.JPG')
 
-        self.assertEqual(file_path, f'uploads/recipe/{uuid}.jpg')
+        self.assertEqual(file_path, 'uploads/recipe/ab/abc123.jpg')
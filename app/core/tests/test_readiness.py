@@ -0,0 +1,141 @@
+"""
+Tests for startup readiness and warmup.
+"""
+from unittest.mock import patch
+
+from django.db.utils import OperationalError
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from core import readiness
+from recipe import serializers
+
+
+class ProbeTests(SimpleTestCase):
+    """Test the health and readiness endpoints."""
+
+    def setUp(self):
+        patcher = patch.object(readiness, '_ready')
+        self.ready = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(readiness, '_warming_up')
+        self.warming_up = patcher.start()
+        self.warming_up.is_set.return_value = True
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(readiness, '_warmed_up')
+        self.warmed_up = patcher.start()
+        self.warmed_up.is_set.return_value = False
+        self.addCleanup(patcher.stop)
+
+    def test_healthz(self):
+        """Test the health probe answers without queries."""
+        self.ready.is_set.return_value = False
+
+        res = self.client.get(reverse('healthz'))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json(), {'status': 'ok'})
+
+    def test_readyz(self):
+        """Test the readiness probe follows the warmup."""
+        self.ready.is_set.return_value = False
+        starting = self.client.get(reverse('readyz'))
+        self.warmed_up.is_set.return_value = True
+        self.ready.is_set.return_value = True
+        ready = self.client.get(reverse('readyz'))
+
+        self.assertEqual(starting.status_code, 503)
+        self.assertEqual(ready.status_code, 200)
+        self.assertEqual(ready.json(), {'status': 'ready'})
+        self.assertIn('no-cache', ready['Cache-Control'])
+
+    @patch('core.readiness.probe')
+    def test_readyz_waits_for_database(self, patched_probe):
+        """Test a process warmed up without the database is not ready."""
+        self.ready.is_set.side_effect = lambda: self.ready.set.called
+        self.warmed_up.is_set.return_value = True
+        patched_probe.side_effect = OperationalError
+
+        unavailable = self.client.get(reverse('readyz'))
+        patched_probe.side_effect = None
+        ready = self.client.get(reverse('readyz'))
+        self.client.get(reverse('readyz'))
+
+        self.assertEqual(unavailable.status_code, 503)
+        self.assertEqual(ready.status_code, 200)
+        self.assertEqual(patched_probe.call_count, 2)
+
+    @patch('core.readiness.probe')
+    def test_readyz_without_warmup(self, patched_probe):
+        """Test a process not warming up is ready once the database is."""
+        self.warming_up.is_set.return_value = False
+        self.ready.is_set.side_effect = lambda: self.ready.set.called
+
+        res = self.client.get(reverse('readyz'))
+
+        self.assertEqual(res.status_code, 200)
+        patched_probe.assert_called_once_with()
+
+    def test_probes_are_read_only(self):
+        """Test the probes refuse writes."""
+        self.assertEqual(self.client.post(reverse('readyz')).status_code, 405)
+
+
+class WarmupTests(TestCase):
+    """Test warming a process up."""
+
+    def test_serializer_classes(self):
+        """Test serializers are found for every viewset action."""
+        classes = readiness.get_serializer_classes()
+
+        self.assertTrue({
+            serializers.RecipeSerializer,
+            serializers.RecipeDetailSerializer,
+            serializers.RecipeImageSerializer,
+            serializers.TagSerializer,
+            serializers.IngredientSerializer,
+        } <= classes)
+
+    def test_schema_generated_once(self):
+        """Test the schema is served from the precomputed copy."""
+        readiness._schemas.clear()
+        self.addCleanup(readiness._schemas.clear)
+
+        first = self.client.get(reverse('api-schema'))
+        with patch('drf_spectacular.generators.SchemaGenerator.get_schema') \
+                as patched_get_schema:
+            second = self.client.get(reverse('api-schema'))
+
+        patched_get_schema.assert_not_called()
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.content, second.content)
+
+    def _clear(self):
+        readiness._warming_up.clear()
+        readiness._warmed_up.clear()
+        readiness._ready.clear()
+        readiness._schemas.clear()
+
+    def test_warmup(self):
+        """Test warming up marks the process ready."""
+        self._clear()
+        self.addCleanup(self._clear)
+
+        with self.assertLogs('core.readiness', 'INFO'):
+            readiness.warmup()
+
+        self.assertTrue(readiness.is_ready())
+        self.assertTrue(readiness._schemas)
+
+    @patch('core.readiness.wait_for_database', side_effect=OperationalError)
+    def test_warmup_without_database(self, patched_wait):
+        """Test a process warmed up without the database is not ready."""
+        self._clear()
+        self.addCleanup(self._clear)
+
+        with self.assertLogs('core.readiness', 'WARNING'), \
+                patch('core.readiness.probe', side_effect=OperationalError):
+            readiness.warmup()
+            self.assertFalse(readiness.is_ready())
+
+        self.assertTrue(readiness.is_ready())
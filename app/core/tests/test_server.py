@@ -0,0 +1,196 @@
+"""
+Tests for the pre-forking server.
+"""
+import http.client
+import io
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, override_settings
+
+from core import server
+from core.management.commands.serve import disable_local_caches, parse_bind
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def get(port, path='/api/schema/'):
+    """Return (status, body) of a GET to the local server."""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def hello(environ, start_response):
+    body = f'{environ["PATH_INFO"]} {os.getpid()}'.encode()
+    start_response('200 OK', [('Content-Length', str(len(body)))])
+    return [body]
+
+
+class ServerTests(SimpleTestCase):
+    """Test the server building blocks in this process."""
+
+    def test_parse_bind(self):
+        """Test listen addresses are split into host and port."""
+        self.assertEqual(parse_bind('127.0.0.1:8000'), ('127.0.0.1', 8000))
+        self.assertEqual(parse_bind(':8000'), ('0.0.0.0', 8000))
+        self.assertEqual(parse_bind('[::1]:8000'), ('::1', 8000))
+        with self.assertRaises(CommandError):
+            parse_bind('localhost')
+
+    @override_settings(AUTH_TOKEN_CACHE=True, RECIPE_RESPONSE_CACHE=True)
+    def test_local_caches_disabled_for_workers(self):
+        """Test several workers do not use process-local caches."""
+        self.assertFalse(disable_local_caches(1))
+        self.assertTrue(settings.RECIPE_RESPONSE_CACHE)
+
+        self.assertTrue(disable_local_caches(2))
+        self.assertFalse(settings.AUTH_TOKEN_CACHE)
+        self.assertFalse(settings.RECIPE_RESPONSE_CACHE)
+
+    @override_settings(AUTH_TOKEN_CACHE=True, RECIPE_RESPONSE_CACHE=True)
+    def test_serve_warns_about_local_caches(self):
+        """Test serve says when it turns the local caches off."""
+        with patch('core.management.commands.serve.Arbiter'), \
+                self.assertLogs('core.server', 'WARNING') as logs:
+            call_command('serve', workers=2, stdout=io.StringIO())
+
+        self.assertIn('MEMCACHED_LOCATION', logs.output[0])
+        self.assertFalse(settings.RECIPE_RESPONSE_CACHE)
+
+    @override_settings(
+        AUTH_TOKEN_CACHE=True,
+        CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+    )
+    def test_shared_caches_kept_for_workers(self):
+        """Test caches not local to the process stay on."""
+        self.assertFalse(disable_local_caches(4))
+        self.assertTrue(settings.AUTH_TOKEN_CACHE)
+
+    def test_drain(self):
+        """Test exiting workers notify receivers, logging failures."""
+        calls = []
+
+        def failing(sender, **kwargs):
+            raise RuntimeError('boom')
+
+        def recording(sender, **kwargs):
+            calls.append(sender)
+
+        for receiver in (failing, recording):
+            server.worker_exiting.connect(receiver)
+            self.addCleanup(server.worker_exiting.disconnect, receiver)
+
+        with self.assertLogs('core.server', 'ERROR'):
+            server.drain()
+
+        self.assertEqual(calls, [server.Worker])
+
+    def test_get_rss(self):
+        """Test resident memory is read for live processes only."""
+        if not os.path.exists('/proc/self/statm'):
+            self.skipTest('Needs /proc.')
+
+        self.assertGreater(server.get_rss(os.getpid()), 0)
+        self.assertIsNone(server.get_rss(2 ** 22 + 1))
+
+    def test_wsgi_server(self):
+        """Test requests are served and counted, one per connection."""
+        sock = server.create_socket('127.0.0.1', 0)
+        self.addCleanup(sock.close)
+        wsgi = server.WSGIServer(sock, hello, timeout=5)
+        port = sock.getsockname()[1]
+
+        def serve():
+            while wsgi.served < 2:
+                wsgi.handle_request()
+
+        thread = threading.Thread(target=serve)
+        thread.start()
+        responses = [get(port, '/a'), get(port, '/b')]
+        thread.join(10)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(
+            [(status, body.split()[0]) for status, body in responses],
+            [(200, b'/a'), (200, b'/b')],
+        )
+
+
+class ServeCommandTests(SimpleTestCase):
+    """Test `manage.py serve` end to end."""
+
+    def start(self, *args):
+        port = get_free_port()
+        process = subprocess.Popen(
+            [sys.executable, 'manage.py', 'serve',
+             '--bind', f'127.0.0.1:{port}', *args],
+            cwd=settings.BASE_DIR,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        self.addCleanup(process.kill)
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                get(port)
+                return process, port
+            except OSError:
+                if time.monotonic() > deadline or process.poll() is not None:
+                    raise
+                time.sleep(0.1)
+
+    def get_workers(self, process):
+        workers = set()
+        for pid in filter(str.isdigit, os.listdir('/proc')):
+            try:
+                with open(f'/proc/{pid}/stat') as file:
+                    stat = file.read()
+            except OSError:
+                continue
+            if int(stat.rsplit(')', 1)[1].split()[1]) == process.pid:
+                workers.add(int(pid))
+        return workers
+
+    def test_recycle_reload_and_stop(self):
+        """Test workers are recycled and reloaded without failed requests."""
+        if not os.path.exists('/proc/self/stat'):
+            self.skipTest('Needs /proc.')
+        process, port = self.start(
+            '--workers', '2', '--max-requests', '3',
+            '--max-requests-jitter', '0')
+        workers = self.get_workers(process)
+
+        statuses = [get(port)[0] for _ in range(12)]
+        time.sleep(1)
+        recycled = self.get_workers(process)
+        process.send_signal(signal.SIGHUP)
+        statuses += [get(port)[0] for _ in range(12)]
+        time.sleep(1.5)
+        reloaded = self.get_workers(process)
+        process.send_signal(signal.SIGTERM)
+
+        self.assertEqual(process.wait(30), 0)
+        self.assertEqual(set(statuses), {200})
+        self.assertEqual(len(workers), 2)
+        self.assertNotEqual(recycled, workers)
+        self.assertEqual(len(reloaded), 2)
+        self.assertFalse(reloaded & recycled)
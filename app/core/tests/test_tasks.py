@@ -0,0 +1,277 @@
+"""
+Tests for the database task queue.
+"""
+import os
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from core import tasks
+from core.models import Task
+
+calls = []
+
+
+@tasks.task()
+def record(value):
+    calls.append(value)
+
+
+@tasks.task(max_attempts=2)
+def explode():
+    raise RuntimeError('boom')
+
+
+@tasks.task()
+def write_pid(path):
+    with open(path, 'w') as file:
+        file.write(str(os.getpid()))
+
+
+@tasks.task()
+def sleep(seconds):
+    time.sleep(seconds)
+
+
+def run_queue(concurrency=0, timeout=900):
+    tasks.Worker(
+        concurrency=concurrency, poll_interval=0.05, timeout=timeout,
+    ).run(burst=True)
+
+
+class TaskQueueTests(TestCase):
+    """Test queueing and running tasks."""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_and_run(self):
+        """Test queued tasks run once with their arguments."""
+        queued = record.enqueue(value='a')
+
+        run_queue()
+
+        queued.refresh_from_db()
+        self.assertEqual(calls, ['a'])
+        self.assertEqual(queued.name, 'core.tests.test_tasks.record')
+        self.assertEqual(queued.status, Task.DONE)
+        self.assertEqual(queued.attempts, 1)
+        self.assertIsNotNone(queued.duration)
+        self.assertIsNotNone(queued.finished_at)
+
+    def test_priorities_and_delays(self):
+        """Test higher priorities run first and delayed tasks wait."""
+        record.enqueue(value='low', priority=-5)
+        record.enqueue(value='normal')
+        record.enqueue(value='high', priority=5)
+        later = record.enqueue(value='later', priority=10, delay=60)
+
+        run_queue()
+
+        self.assertEqual(calls, ['high', 'normal', 'low'])
+        later.refresh_from_db()
+        self.assertEqual(later.status, Task.QUEUED)
+
+    @override_settings(TASK_RETRY_DELAY=5)
+    def test_retry_with_backoff(self):
+        """Test failed tasks are retried later, then marked failed."""
+        queued = explode.enqueue()
+
+        with self.assertLogs('core.tasks', 'WARNING'):
+            run_queue()
+
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.QUEUED)
+        self.assertEqual(queued.attempts, 1)
+        self.assertIn('RuntimeError: boom', queued.last_error)
+        delay = (queued.run_at - queued.finished_at).total_seconds()
+        self.assertAlmostEqual(delay, 5, places=3)
+
+        Task.objects.filter(pk=queued.pk).update(run_at=timezone.now())
+        with self.assertLogs('core.tasks', 'WARNING'):
+            run_queue()
+
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.FAILED)
+        self.assertEqual(queued.attempts, 2)
+
+    @override_settings(TASK_RETRY_DELAY=5, TASK_MAX_RETRY_DELAY=30)
+    def test_retry_delay(self):
+        """Test retry delays double up to the limit."""
+        delays = [tasks.get_retry_delay(attempts) for attempts in range(1, 6)]
+
+        self.assertEqual(delays, [5, 10, 20, 30, 30])
+
+    def test_claim_once(self):
+        """Test a claimed task is not handed out again."""
+        queued = record.enqueue(value='a')
+
+        first = tasks.claim(10)
+        second = tasks.claim(10)
+
+        self.assertEqual([task.pk for task in first], [queued.pk])
+        self.assertEqual(first[0].status, Task.RUNNING)
+        self.assertEqual(second, [])
+
+    def test_requeue_stale(self):
+        """Test tasks left running by a dead worker are queued again."""
+        stale, fresh = record.enqueue(value='a'), record.enqueue(value='b')
+        tasks.claim(10)
+        Task.objects.filter(pk=stale.pk).update(
+            started_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(tasks.requeue_stale(60), 1)
+
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual(stale.status, Task.QUEUED)
+        self.assertEqual(fresh.status, Task.RUNNING)
+
+    def test_requeue_stale_out_of_attempts(self):
+        """Test lost tasks without attempts left are marked failed."""
+        lost = explode.enqueue()
+        Task.objects.filter(pk=lost.pk).update(
+            status=Task.RUNNING, attempts=2,
+            started_at=timezone.now() - timedelta(hours=1))
+
+        with self.assertLogs('core.tasks', 'WARNING'):
+            self.assertEqual(tasks.requeue_stale(60), 0)
+
+        lost.refresh_from_db()
+        self.assertEqual(lost.status, Task.FAILED)
+        self.assertIn('Worker lost', lost.last_error)
+
+    def test_lost_attempt_does_not_overwrite_retry(self):
+        """Test a stale attempt's outcome leaves a later attempt alone."""
+        queued = record.enqueue(value='a')
+        [first] = tasks.claim(1)
+        Task.objects.filter(pk=queued.pk).update(
+            started_at=timezone.now() - timedelta(hours=1))
+        with self.assertLogs('core.tasks', 'WARNING'):
+            tasks.requeue_stale(60)
+        [second] = tasks.claim(1)
+
+        with self.assertLogs('core.tasks', 'WARNING'):
+            tasks.finish(first, 'lost', 1.0)
+
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.RUNNING)
+        self.assertEqual(queued.attempts, second.attempts)
+        self.assertEqual(queued.last_error, '')
+
+    def test_timeout_interrupts_task(self):
+        """Test tasks running past the timeout fail their attempt."""
+        queued = sleep.enqueue(seconds=5)
+
+        start = time.monotonic()
+        with self.assertLogs('core.tasks', 'WARNING'):
+            run_queue(timeout=0.2)
+
+        self.assertLess(time.monotonic() - start, 5)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.QUEUED)
+        self.assertIn('TaskTimeout', queued.last_error)
+
+    def test_enqueue_periodic(self):
+        """Test periodic tasks are queued once per interval."""
+        schedule = {'core.tests.test_tasks.record': 60}
+
+        first = tasks.enqueue_periodic(schedule)
+        again = tasks.enqueue_periodic(schedule)
+        Task.objects.update(created_at=timezone.now() - timedelta(minutes=2))
+        later = tasks.enqueue_periodic(schedule)
+
+        self.assertEqual([task.name for task in first], list(schedule))
+        self.assertEqual(again, [])
+        self.assertEqual(len(later), 1)
+
+    def test_prune(self):
+        """Test only tasks done long enough ago are deleted."""
+        old, recent, failed = (
+            record.enqueue(value=value) for value in 'abc')
+        run_queue()
+        Task.objects.filter(pk__in=[old.pk, failed.pk]).update(
+            finished_at=timezone.now() - timedelta(days=2))
+        Task.objects.filter(pk=failed.pk).update(status=Task.FAILED)
+
+        self.assertEqual(tasks.prune(24 * 60 * 60), 1)
+
+        self.assertEqual(
+            set(Task.objects.values_list('pk', flat=True)),
+            {recent.pk, failed.pk},
+        )
+
+    def test_stats(self):
+        """Test per-task counts and timings are reported."""
+        record.enqueue(value='a')
+        record.enqueue(value='b', delay=60)
+        run_queue()
+
+        stats = tasks.get_stats()['core.tests.test_tasks.record']
+
+        self.assertEqual(
+            (stats['queued'], stats['running'], stats['done'],
+             stats['failed']),
+            (1, 0, 1, 0),
+        )
+        self.assertGreaterEqual(stats['max_duration'], 0)
+        self.assertGreaterEqual(stats['avg_wait'], 0)
+
+    def test_stats_window(self):
+        """Test stats leave out tasks finished before the window."""
+        record.enqueue(value='a')
+        run_queue()
+        Task.objects.update(finished_at=timezone.now() - timedelta(hours=2))
+
+        self.assertEqual(tasks.get_stats(window=3600), {})
+
+    def test_worker_processes(self):
+        """Test tasks run on separate worker processes."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        paths = [os.path.join(directory.name, str(i)) for i in range(3)]
+        queued = [write_pid.enqueue(path=path) for path in paths]
+
+        run_queue(concurrency=2)
+
+        for task in queued:
+            task.refresh_from_db()
+            self.assertEqual(task.status, Task.DONE, task.last_error)
+        for path in paths:
+            with open(path) as file:
+                self.assertNotEqual(int(file.read()), os.getpid())
+
+    def test_worker_command(self):
+        """Test the worker command drains the queue in burst mode."""
+        record.enqueue(value='a')
+        out = StringIO()
+
+        call_command('worker', burst=True, concurrency=0, stdout=out)
+
+        self.assertEqual(calls, ['a'])
+        self.assertIn('Worker stopped.', out.getvalue())
+
+    def test_stats_view_admin_only(self):
+        """Test task stats are only shown to admins."""
+        client = APIClient()
+        user = get_user_model().objects.create_user(
+            'user@example.com', 'password123')
+        client.force_authenticate(user)
+        url = reverse('task-stats')
+
+        self.assertEqual(client.get(url).status_code, 403)
+        user.is_staff = True
+        user.save()
+        record.enqueue(value='a')
+        res = client.get(url)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data['core.tests.test_tasks.record']['queued'], 1)
@@ -0,0 +1,54 @@
+"""
+Views for probes, the API schema and background task stats.
+"""
+from django.http import JsonResponse
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_safe
+from drf_spectacular.utils import OpenApiTypes, extend_schema
+from drf_spectacular.views import SpectacularAPIView
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core import readiness, tasks
+from core.authentication import CachedTokenAuthentication
+
+
+@never_cache
+@require_safe
+def healthz(request):
+    """Report that the process is serving requests."""
+    return JsonResponse({'status': 'ok'})
+
+
+@never_cache
+@require_safe
+def readyz(request):
+    """Report whether the process has been warmed up.
+
+    Neither probe queries the database once it has answered, so they
+    stay cheap under load.
+    """
+    if readiness.is_ready():
+        return JsonResponse({'status': 'ready'})
+    return JsonResponse({'status': 'starting'}, status=503)
+
+
+class SchemaView(SpectacularAPIView):
+    """OpenAPI schema, generated once per process and language."""
+
+    def _get_schema_response(self, request):
+        if self.urlconf is not None or self.api_version is not None:
+            return super()._get_schema_response(request)
+        return Response(readiness.get_schema())
+
+
+class TaskStatsView(APIView):
+    """Report background task counts and timings."""
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(responses=OpenApiTypes.OBJECT)
+    def get(self, request):
+        """Return the task counters per task name."""
+        return Response(tasks.get_stats())
@@ -0,0 +1,47 @@
+"""
+Async views for Recipe APIs.
+
+Django 3.2 has no async ORM and DRF views are synchronous, so each
+async view runs the matching DRF action, including its queries and
+rendering, in a single `sync_to_async(thread_sensitive=False)` hop.
+Concurrent requests therefore run on a pool of threads with their own
+database connections, instead of queueing behind the one thread that
+thread-sensitive calls share under ASGI.
+"""
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from recipe.views import RecipeViewSet, TagViewSet, IngredientViewSet
+
+
+def _call_view(view, request, args, kwargs):
+    """Run a sync view to completion on the current (worker) thread."""
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def as_async_view(viewset, actions):
+    """Return an async view serving `actions` of a DRF viewset."""
+    view = viewset.as_view(actions)
+    call_view = sync_to_async(_call_view, thread_sensitive=False)
+
+    async def async_view(request, *args, **kwargs):
+        return await call_view(view, request, args, kwargs)
+
+    async_view.csrf_exempt = view.csrf_exempt
+    async_view.__name__ = view.__name__
+    async_view.__doc__ = view.__doc__
+
+    return async_view
+
+
+recipe_list = as_async_view(RecipeViewSet, {'get': 'list'})
+recipe_detail = as_async_view(RecipeViewSet, {'get': 'retrieve'})
+tag_list = as_async_view(TagViewSet, {'get': 'list'})
+ingredient_list = as_async_view(IngredientViewSet, {'get': 'list'})
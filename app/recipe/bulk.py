@@ -0,0 +1,291 @@
+"""
+Bulk create, update and delete for Recipe APIs.
+
+A bulk request is a list of operations::
+
+    {"op": "create", "data": {...}}
+    {"op": "update", "id": 7, "data": {...}}
+    {"op": "delete", "id": 7}
+
+Every operation is validated up front. Valid operations are then
+written in batches: recipes with bulk_create/bulk_update, tags and
+ingredients with one name lookup per batch, and memberships with
+batched inserts and deletes on the through tables. Bulk writes skip
+model signals, so the owner is touched and the search data rebuilt
+here instead.
+"""
+import itertools
+
+from django.db import DatabaseError, connections, transaction
+from django.utils import timezone
+from rest_framework import status
+
+from core.models import Recipe, Tag, Ingredient
+from recipe import search
+from recipe.serializers import (
+    BulkOperationSerializer,
+    RecipeDetailSerializer,
+    get_or_create_ids,
+)
+from recipe.signals import defer_touches, touch_user
+
+ATOMIC = 'atomic'
+BEST_EFFORT = 'best-effort'
+MODES = [ATOMIC, BEST_EFFORT]
+RELATIONS = [('tags', Tag), ('ingredients', Ingredient)]
+SEARCHED_FIELDS = {'title', 'description'}
+
+
+def _chunks(items, size):
+    """Yield lists of up to `size` items."""
+    iterator = iter(items)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Operation:
+    """One operation of a bulk request and its outcome."""
+
+    def __init__(self, index, raw):
+        self.index = index
+        self.raw = raw
+        self.op = raw.get('op') if isinstance(raw, dict) else None
+        self.id = None
+        self.instance = None
+        self.payload = None
+        self.data = None
+        self.changed = set()
+        self.status = None
+        self.errors = None
+
+    def fail(self, status_code, errors):
+        self.status = status_code
+        self.errors = errors
+
+    def to_result(self):
+        result = {'index': self.index, 'op': self.op, 'status': self.status}
+        if self.id is not None:
+            result['id'] = self.id
+        if self.errors is not None:
+            result['errors'] = self.errors
+
+        return result
+
+
+def validate(user, items, context):
+    """Return an `Operation` per item, failed ones carrying errors."""
+    operations = [Operation(index, raw) for index, raw in enumerate(items)]
+    shaped = []
+    for operation in operations:
+        serializer = BulkOperationSerializer(data=operation.raw)
+        if not serializer.is_valid():
+            operation.fail(status.HTTP_400_BAD_REQUEST, serializer.errors)
+            continue
+        operation.op = serializer.validated_data['op']
+        operation.id = serializer.validated_data.get('id')
+        operation.payload = serializer.validated_data.get('data')
+        shaped.append(operation)
+
+    instances = Recipe.objects.filter(user=user).in_bulk(
+        [operation.id for operation in shaped if operation.op != 'create'])
+    seen = set()
+    for operation in shaped:
+        if operation.op != 'create':
+            if operation.id in seen:
+                operation.fail(status.HTTP_400_BAD_REQUEST, {
+                    'id': 'Recipe appears more than once in the request.'})
+                continue
+            seen.add(operation.id)
+            operation.instance = instances.get(operation.id)
+            if operation.instance is None:
+                operation.fail(
+                    status.HTTP_404_NOT_FOUND, {'detail': 'Not found.'})
+                continue
+        if operation.op == 'delete':
+            continue
+
+        serializer = RecipeDetailSerializer(
+            operation.instance,
+            data=operation.payload,
+            partial=operation.op == 'update',
+            context=context,
+        )
+        if serializer.is_valid():
+            operation.data = serializer.validated_data
+        else:
+            operation.fail(status.HTTP_400_BAD_REQUEST, serializer.errors)
+
+    return operations
+
+
+def reject(operations):
+    """Mark valid operations as not applied because others failed."""
+    for operation in operations:
+        if operation.status is None:
+            operation.fail(status.HTTP_424_FAILED_DEPENDENCY, {
+                'detail': 'Not applied as other operations are invalid.'})
+
+
+def _recipe_fields(data):
+    return {
+        name: value for name, value in data.items()
+        if name not in dict(RELATIONS)
+    }
+
+
+def _insert(recipes, batch_size):
+    """Insert new recipes and set their ids.
+
+    Returns whether the rows were saved one by one, which already
+    indexed them through the post_save signal.
+    """
+    if connections[Recipe.objects.db].features \
+            .can_return_rows_from_bulk_insert:
+        Recipe.objects.bulk_create(recipes, batch_size=batch_size)
+        return False
+
+    for recipe in recipes:
+        recipe.save(force_insert=True)
+    return True
+
+
+def _set_memberships(relation, wanted, replaced, batch_size):
+    """Give each recipe in `wanted` exactly the wanted target ids.
+
+    Only rows of the `replaced` recipes are read; others are new.
+    """
+    field = Recipe._meta.get_field(relation)
+    through = field.remote_field.through
+    source = f'{field.m2m_field_name()}_id'
+    target = f'{field.m2m_reverse_field_name()}_id'
+
+    current = {}
+    rows = through.objects.filter(
+        **{f'{source}__in': replaced}
+    ).values_list('pk', source, target)
+    for pk, recipe_id, target_id in rows:
+        current.setdefault(recipe_id, {})[target_id] = pk
+
+    stale = [
+        pk
+        for recipe_id, targets in current.items()
+        for target_id, pk in targets.items()
+        if target_id not in wanted[recipe_id]
+    ]
+    for chunk in _chunks(stale, batch_size):
+        through.objects.filter(pk__in=chunk).delete()
+    through.objects.bulk_create(
+        [
+            through(**{source: recipe_id, target: target_id})
+            for recipe_id, target_ids in wanted.items()
+            for target_id in target_ids
+            if target_id not in current.get(recipe_id, {})
+        ],
+        batch_size=batch_size,
+    )
+
+
+def _write_batch(user, batch, batch_size):
+    """Apply a batch of validated operations."""
+    creates = [op for op in batch if op.op == 'create']
+    updates = [op for op in batch if op.op == 'update']
+    deletes = [op for op in batch if op.op == 'delete']
+    writes = creates + updates
+
+    names = {
+        relation: {
+            item['name']
+            for operation in writes
+            for item in operation.data.get(relation, [])
+        }
+        for relation, model in RELATIONS
+    }
+    ids = {
+        relation: get_or_create_ids(model, user, names[relation])
+        for relation, model in RELATIONS
+    }
+
+    recipes = [
+        Recipe(user=user, **_recipe_fields(operation.data))
+        for operation in creates
+    ]
+    indexed = _insert(recipes, batch_size)
+    for operation, recipe in zip(creates, recipes):
+        operation.instance = recipe
+        operation.id = recipe.pk
+        operation.changed = set() if indexed else SEARCHED_FIELDS
+        operation.status = status.HTTP_201_CREATED
+
+    fields = {'updated_at'}
+    now = timezone.now()
+    for operation in updates:
+        for name, value in _recipe_fields(operation.data).items():
+            if getattr(operation.instance, name) != value:
+                setattr(operation.instance, name, value)
+                operation.changed.add(name)
+        operation.instance.updated_at = now
+        fields |= operation.changed
+        operation.status = status.HTTP_200_OK
+    Recipe.objects.bulk_update(
+        [operation.instance for operation in updates],
+        sorted(fields),
+        batch_size=batch_size,
+    )
+
+    for relation, model in RELATIONS:
+        wanted = {
+            operation.id: {
+                ids[relation][item['name']]
+                for item in operation.data[relation]
+            }
+            for operation in writes
+            if relation in operation.data
+        }
+        replaced = [
+            operation.id for operation in updates
+            if relation in operation.data
+        ]
+        _set_memberships(relation, wanted, replaced, batch_size)
+
+    if deletes:
+        Recipe.objects.filter(
+            user=user, pk__in=[operation.id for operation in deletes]
+        ).delete()
+        for operation in deletes:
+            operation.status = status.HTTP_204_NO_CONTENT
+
+    search.index_recipes([
+        operation.id for operation in writes
+        if operation.changed & SEARCHED_FIELDS
+    ])
+    touch_user(user.pk)
+
+
+def write(user, operations, mode, batch_size):
+    """Apply the valid operations in batches of `batch_size`.
+
+    In atomic mode every batch shares one transaction. In best-effort
+    mode each batch commits on its own, and a batch the database
+    rejects is reported as failed without affecting the others.
+    """
+    valid = [operation for operation in operations if operation.status is None]
+    with defer_touches():
+        if mode == ATOMIC:
+            with transaction.atomic():
+                for batch in _chunks(valid, batch_size):
+                    _write_batch(user, batch, batch_size)
+            return
+
+        for batch in _chunks(valid, batch_size):
+            try:
+                with transaction.atomic():
+                    _write_batch(user, batch, batch_size)
+            except DatabaseError:
+                for operation in batch:
+                    if operation.op == 'create':
+                        operation.id = None
+                    operation.fail(status.HTTP_500_INTERNAL_SERVER_ERROR, {
+                        'detail': 'The batch could not be written.'})
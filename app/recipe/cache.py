@@ -0,0 +1,150 @@
+"""
+Per-user versioned response cache for Recipe APIs.
+
+Cached responses are keyed by user, data version, path, query string
+and media type. Any change to a user's recipes, tags or ingredients
+bumps that user's version (see `recipe.signals`), which orphans every
+cached response for the user in O(1); orphans expire by timeout.
+"""
+import functools
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+VERSION_KEY = 'recipe-api:version:{user_id}'
+RESPONSE_KEY = 'recipe-api:response:{user_id}:{version}:{digest}'
+STATS_KEY = 'recipe-api:stats:{name}'
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+def _new_version():
+    """Return a version that cannot collide with an evicted one."""
+    return time.time_ns()
+
+
+def get_version(user_id):
+    """Return the current data version for a user."""
+    key = VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+
+    return version
+
+
+def bump_version(user_id):
+    """Invalidate every cached response for a user."""
+    key = VERSION_KEY.format(user_id=user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), None)
+
+
+def _incr_stat(name):
+    key = STATS_KEY.format(name=name)
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, None)
+
+
+def get_stats():
+    """Return the response cache hit and miss counters."""
+    stats = {
+        name: cache.get(STATS_KEY.format(name=name), 0)
+        for name in ('hits', 'misses')
+    }
+    total = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = stats['hits'] / total if total else 0.0
+
+    return stats
+
+
+def get_response_key(request):
+    """Return the cache key for the response to `request`."""
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    digest = hashlib.md5(
+        f'{request.path}?{query}|{request.accepted_media_type}'.encode()
+    ).hexdigest()
+
+    return RESPONSE_KEY.format(
+        user_id=request.user.pk,
+        version=get_version(request.user.pk),
+        digest=digest,
+    )
+
+
+def is_enabled():
+    """Return whether responses are cached."""
+    return getattr(settings, 'RECIPE_RESPONSE_CACHE', False)
+
+
+def cache_response(method):
+    """Serve a view action from the cache, storing it on a miss.
+
+    The view must use `ResponseCacheMixin`, which stores the rendered
+    response once DRF has picked its renderer.
+    """
+    @functools.wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        if not is_enabled():
+            return method(self, request, *args, **kwargs)
+
+        key = get_response_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            _incr_stat('hits')
+            content, headers = cached
+            response = get_conditional_response(
+                request,
+                etag=headers.get('ETag'),
+                last_modified=parse_http_date_safe(
+                    headers.get('Last-Modified', '')),
+            )
+            if response is None:
+                response = HttpResponse(
+                    content, content_type=headers['Content-Type'])
+            for header in ('ETag', 'Last-Modified'):
+                if header in headers:
+                    response[header] = headers[header]
+            response['X-Cache'] = 'HIT'
+            return response
+
+        _incr_stat('misses')
+        self.response_cache_key = key
+        return method(self, request, *args, **kwargs)
+
+    return wrapper
+
+
+class ResponseCacheMixin:
+    """Store responses of actions decorated with `cache_response`."""
+    response_cache_key = None
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs)
+        if self.response_cache_key and response.status_code == 200:
+            if hasattr(response, 'render'):
+                response.render()
+            headers = {
+                header: response[header] for header in CACHED_HEADERS
+                if response.has_header(header)
+            }
+            cache.set(
+                self.response_cache_key,
+                (response.content, headers),
+                getattr(settings, 'RECIPE_RESPONSE_CACHE_TIMEOUT', 300),
+            )
+            response['X-Cache'] = 'MISS'
+
+        return response
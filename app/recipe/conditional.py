@@ -0,0 +1,94 @@
+"""
+Conditional GET (ETag / Last-Modified) support for Recipe APIs.
+
+Validators come from a single indexed lookup of a timestamp: the
+recipe's `updated_at` for a detail, or the owner's `recipes_updated_at`
+(touched by every recipe, tag and ingredient change, deletes included)
+for a list, whose ETag also names the user since users share list URLs
+and may share a timestamp (or have none yet). A request can then be
+answered with 304 without building the response body.
+"""
+import functools
+import hashlib
+from urllib.parse import urlencode
+
+from django.contrib.auth import get_user_model
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def _make_etag(request, *parts):
+    """Return a strong ETag for `parts` and the requested variant."""
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    source = '|'.join(
+        [request.path, query, request.accepted_media_type]
+        + [str(part) for part in parts]
+    )
+
+    return quote_etag(hashlib.md5(source.encode()).hexdigest())
+
+
+def _make_validators(request, updated_at, *parts):
+    """Return (etag, last_modified) for a resource changed at a time."""
+    if updated_at is None:
+        return _make_etag(request, *parts), None
+
+    return _make_etag(request, updated_at.isoformat(), *parts), updated_at
+
+
+def list_validators(view, request, *args, **kwargs):
+    """Return (etag, last_modified) for a list of the user's rows."""
+    updated_at = get_user_model().objects.filter(
+        pk=request.user.pk
+    ).values_list('recipes_updated_at', flat=True).first()
+
+    return _make_validators(request, updated_at, request.user.pk)
+
+
+def detail_validators(view, request, *args, pk=None, **kwargs):
+    """Return (etag, last_modified) for one row, or (None, None)."""
+    try:
+        updated_at = view.queryset.filter(
+            user=request.user, pk=pk
+        ).values_list('updated_at', flat=True).first()
+    except (TypeError, ValueError):
+        updated_at = None
+    if updated_at is None:
+        return None, None
+
+    return _make_validators(request, updated_at, pk)
+
+
+def condition_response(get_validators):
+    """Answer matching conditional GETs with 304 and tag responses.
+
+    `get_validators(view, request, *args, **kwargs)` returns the
+    (etag, last_modified) pair for the requested resource.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            etag, last_modified = get_validators(
+                self, request, *args, **kwargs)
+            timestamp = None
+            if last_modified is not None:
+                timestamp = int(last_modified.timestamp())
+
+            if etag is not None:
+                not_modified = get_conditional_response(
+                    request, etag=etag, last_modified=timestamp)
+                if not_modified is not None:
+                    not_modified['ETag'] = etag
+                    return not_modified
+
+            response = method(self, request, *args, **kwargs)
+            if etag is not None and response.status_code == 200:
+                response['ETag'] = etag
+                if timestamp is not None:
+                    response['Last-Modified'] = http_date(timestamp)
+
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,96 @@
+"""
+Read-only fast path for serializing recipes.
+
+Builds the same output as `RecipeSerializer`/`RecipeDetailSerializer`
+from `values()` rows and one tag/ingredient lookup per page, without
+creating model instances or running per-instance field machinery.
+"""
+import itertools
+from collections import defaultdict
+
+from rest_framework import serializers
+
+from core.models import Recipe
+from recipe.serializers import ImageVariantsField
+
+
+def _get_columns(serializer):
+    """Return the names of the serializer's scalar (column) fields."""
+    return [
+        name for name, field in serializer.fields.items()
+        if not isinstance(field, serializers.ListSerializer)
+    ]
+
+
+def get_values(queryset, serializer, extra=()):
+    """Return `queryset` as dict rows holding the serializer's columns.
+
+    `extra` names further columns needed by the caller, e.g. the fields
+    a cursor paginator orders by.
+    """
+    columns = _get_columns(serializer)
+    for name in ['id', *extra]:
+        if name not in columns:
+            columns.append(name)
+
+    return queryset.prefetch_related(None).values(*columns)
+
+
+def _get_memberships(relation, recipe_ids):
+    """Map recipe id to its related {'id', 'name'} dicts, ordered by id."""
+    through = getattr(Recipe, relation).through
+    target = getattr(Recipe, relation).field.m2m_reverse_field_name()
+    rows = through.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by(f'{target}_id').values_list(
+        'recipe_id', f'{target}_id', f'{target}__name'
+    )
+
+    memberships = defaultdict(list)
+    for recipe_id, related_id, name in rows:
+        memberships[recipe_id].append({'id': related_id, 'name': name})
+
+    return memberships
+
+
+def serialize(rows, serializer):
+    """Return the representation of `rows` from `get_values`."""
+    recipe_ids = [row['id'] for row in rows]
+    plan = []
+    for name, field in serializer.fields.items():
+        if isinstance(field, serializers.ListSerializer):
+            plan.append((name, _get_memberships(name, recipe_ids), None))
+        elif isinstance(field, (serializers.DecimalField, ImageVariantsField)):
+            plan.append((name, None, field.to_representation))
+        else:
+            plan.append((name, None, None))
+
+    data = []
+    for row in rows:
+        item = {}
+        for name, memberships, convert in plan:
+            if memberships is not None:
+                item[name] = memberships.get(row['id'], [])
+                continue
+            value = row[name]
+            if convert is not None and value is not None:
+                value = convert(value)
+            item[name] = value
+        data.append(item)
+
+    return data
+
+
+def iter_serialized(queryset, serializer, chunk_size):
+    """Yield the representation of every row of `queryset`.
+
+    Rows are read through a server-side cursor where the database
+    supports one and tags and ingredients are looked up per chunk, so
+    memory use does not grow with the size of the queryset.
+    """
+    rows = get_values(queryset, serializer).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield from serialize(chunk, serializer)
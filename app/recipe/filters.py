@@ -0,0 +1,147 @@
+"""
+Filters for Recipe APIs
+"""
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Exists, OuterRef
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+from core.models import Recipe
+from recipe import search
+
+
+def _params_to_ints(param, value):
+    """Convert a comma separated list of ids to integers."""
+    try:
+        return [int(str_id) for str_id in value.split(',') if str_id]
+    except ValueError:
+        raise ValidationError(
+            {param: 'Must be a comma separated list of ids.'})
+
+
+class RecipeRelationFilter(BaseFilterBackend):
+    """Filter recipes by `?tags=1,4&ingredients=7`.
+
+    Recipes having any of the listed tags (and any of the listed
+    ingredients) match. Each relation is checked with an EXISTS
+    semi-join on its through table, so no DISTINCT over a fan-out join
+    is needed.
+    """
+    relations = ['tags', 'ingredients']
+
+    def filter_queryset(self, request, queryset, view):
+        for relation in self.relations:
+            value = request.query_params.get(relation)
+            if not value:
+                continue
+            ids = _params_to_ints(relation, value)
+            field = Recipe._meta.get_field(relation)
+            memberships = field.remote_field.through.objects.filter(**{
+                field.m2m_field_name(): OuterRef('pk'),
+                f'{field.m2m_reverse_field_name()}__in': ids,
+            })
+            queryset = queryset.filter(Exists(memberships))
+
+        return queryset
+
+
+def get_user_indexed_fields(model):
+    """Return fields indexed right after `user` in the model's indexes."""
+    return [
+        index.fields[1] for index in model._meta.indexes
+        if len(index.fields) > 1 and index.fields[0] == 'user'
+    ]
+
+
+class RecipeRangeFilter(BaseFilterBackend):
+    """Filter recipes by `?price__lte=`, `?time_minutes__range=10,30`, ..."""
+    range_fields = ['price', 'time_minutes']
+    lookups = ['lt', 'lte', 'gt', 'gte', 'range']
+
+    def _get_value(self, param, lookup, value):
+        field = Recipe._meta.get_field(param.split('__')[0])
+        values = value.split(',')
+        if lookup == 'range' and len(values) != 2:
+            raise ValidationError(
+                {param: 'Must be two comma separated values.'})
+        try:
+            values = [field.to_python(item) for item in values]
+        except DjangoValidationError as exc:
+            raise ValidationError({param: exc.messages})
+
+        return values if lookup == 'range' else values[0]
+
+    def filter_queryset(self, request, queryset, view):
+        for field in self.range_fields:
+            for lookup in self.lookups:
+                param = f'{field}__{lookup}'
+                value = request.query_params.get(param)
+                if value is None:
+                    continue
+                queryset = queryset.filter(
+                    **{param: self._get_value(param, lookup, value)})
+
+        return queryset
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': f'{field}__{lookup}',
+                'required': False,
+                'in': 'query',
+                'description': (
+                    f'Recipes with {field} in the comma separated range'
+                    if lookup == 'range' else
+                    f'Recipes with {field} {lookup} the value'
+                ),
+                'schema': {'type': 'string'},
+            }
+            for field in self.range_fields
+            for lookup in self.lookups
+        ]
+
+
+class RecipeSearchFilter(BaseFilterBackend):
+    """Full-text search recipe titles and descriptions with `?search=`."""
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '').strip()
+        if not text:
+            return queryset
+
+        return search.search(queryset, text)
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.search_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Words to find in recipe titles and '
+                           'descriptions; results are ranked by relevance',
+            'schema': {'type': 'string'},
+        }]
+
+
+class RecipeOrderingFilter(OrderingFilter):
+    """Order recipes by `?ordering=price,-time_minutes`.
+
+    Only fields covered by an index leading with `user_id` can be used;
+    other fields are ignored. Ties are broken by id so cursors are
+    stable. Searches default to the best ranked results first.
+    """
+    ordering_fields = get_user_indexed_fields(Recipe)
+
+    def get_default_ordering(self, view):
+        search_param = RecipeSearchFilter.search_param
+        if view.request.query_params.get(search_param, '').strip():
+            return ('-search_rank', '-id')
+
+        return super().get_default_ordering(view)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering and not {'id', '-id'} & set(ordering):
+            ordering = [*ordering, '-id']
+
+        return ordering
@@ -0,0 +1,350 @@
+"""
+Resized variants of recipe images.
+
+After an upload, every size in `RECIPE_IMAGE_VARIANTS` is rendered as
+WebP and JPEG on a pool of worker processes, off the request path;
+WebP is skipped when Pillow was built without it. Variants get the
+original's EXIF orientation applied and carry no EXIF data themselves.
+Workers only use Pillow and storage; the parent process records the
+results on the recipe.
+
+Images are stored once per content (see `core.models.ImageBlob`), and
+variants are named after the image and their size, so recipes sharing
+an image share its variants. Files no recipe references any more are
+deleted by `collect_garbage`.
+"""
+import io
+import logging
+import multiprocessing
+import os
+import posixpath
+import threading
+from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from core.models import ImageBlob, Recipe
+from core.tasks import enqueue
+from recipe.signals import touch_user
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {'jpeg': 'JPEG', 'webp': 'WEBP'}
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp')
+
+
+def get_storage():
+    """Return the storage holding recipe images."""
+    return Recipe._meta.get_field('image').storage
+
+
+def get_formats():
+    """Return {extension: Pillow format} of the variants to render."""
+    return {ext: image_format for ext, image_format in FORMATS.items()
+            if image_format != 'WEBP' or features.check('webp')}
+
+
+def get_variant_sizes():
+    """Return {variant name: longest edge in pixels}."""
+    return getattr(settings, 'RECIPE_IMAGE_VARIANTS', {
+        'thumbnail': 200,
+        'small': 480,
+        'medium': 1024,
+    })
+
+
+def get_quality():
+    """Return the WebP/JPEG encoder quality for variants."""
+    return getattr(settings, 'RECIPE_IMAGE_VARIANT_QUALITY', 80)
+
+
+def get_variants_directory(image_name):
+    """Return the storage directory holding the variants of an image."""
+    directory, filename = posixpath.split(image_name)
+    return posixpath.join(directory, 'variants', os.path.splitext(filename)[0])
+
+
+def get_variant_name(image_name, size, ext):
+    """Return the storage name of an image's variant of `size`."""
+    return posixpath.join(get_variants_directory(image_name), f'{size}.{ext}')
+
+
+def get_variant_names(variants):
+    """Return every storage name in a {variant: {format: name}} map."""
+    return [name for formats in variants.values() for name in formats.values()]
+
+
+def _prepare(image):
+    """Return `image` upright, in an encodable mode, without metadata."""
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        has_alpha = 'A' in image.mode or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    for key in METADATA_KEYS:
+        image.info.pop(key, None)
+
+    return image
+
+
+def render_variants(image_name, sizes, quality):
+    """Render and store the variants of a stored image.
+
+    Runs in a worker process. Returns {variant: {format: name}}. Files
+    already rendered for the same image and size are reused.
+    """
+    storage = get_storage()
+    formats = get_formats()
+    names = {
+        variant: {ext: get_variant_name(image_name, size, ext)
+                  for ext in formats}
+        for variant, size in sizes.items()
+    }
+    if all(map(storage.exists, get_variant_names(names))):
+        return {variant: names[variant] for variant in sorted(names)}
+
+    largest = max(sizes.values())
+    with storage.open(image_name) as file, Image.open(file) as original:
+        # Let JPEG decode at a reduced scale when the variants allow.
+        original.draft('RGB', (largest, largest))
+        image = _prepare(original)
+
+    for variant, size in sorted(sizes.items(), key=lambda item: -item[1]):
+        # Shrink from the previous, larger variant to save work.
+        image.thumbnail((size, size), Image.LANCZOS)
+        for ext, image_format in formats.items():
+            name = names[variant][ext]
+            if storage.exists(name):
+                continue
+            encoded = image
+            if image_format == 'JPEG' and image.mode != 'RGB':
+                encoded = image.convert('RGB')
+            buffer = io.BytesIO()
+            encoded.save(buffer, format=image_format, quality=quality)
+            stored = storage.save(name, ContentFile(buffer.getvalue()))
+            if stored != name:
+                # Rendered concurrently for another recipe.
+                storage.delete(stored)
+
+    return {variant: names[variant] for variant in sorted(names)}
+
+
+def save_variants(recipe_id, image_name, variants):
+    """Record rendered variants, unless the image changed meanwhile.
+
+    Variants of a replaced image are left for `collect_garbage`.
+    """
+    recipes = Recipe.objects.filter(pk=recipe_id, image=image_name)
+    if recipes.update(image_variants=variants, updated_at=timezone.now()):
+        touch_user(recipes.values_list('user_id', flat=True).get())
+
+
+def _delete_directory_files(storage, directory):
+    try:
+        files = storage.listdir(directory)[1]
+    except FileNotFoundError:
+        return
+    for filename in files:
+        storage.delete(posixpath.join(directory, filename))
+
+
+def collect_garbage(grace):
+    """Delete images unreferenced for `grace` seconds, with variants.
+
+    Each file is deleted while its row is locked, so an upload of the
+    same content either keeps it or stores it again. Returns the number
+    of images deleted.
+    """
+    storage = get_storage()
+    cutoff = timezone.now() - timedelta(seconds=grace)
+    names = list(ImageBlob.objects.filter(
+        refcount=0, released_at__lt=cutoff).values_list('name', flat=True))
+    deleted = 0
+    for name in names:
+        with transaction.atomic():
+            blob = ImageBlob.objects.select_for_update().filter(
+                name=name, refcount=0).first()
+            if blob is None:
+                continue
+            _delete_directory_files(storage, get_variants_directory(name))
+            storage.delete(name)
+            blob.delete()
+        deleted += 1
+
+    return deleted
+
+
+def collect_orphans(grace, directory='uploads/recipe'):
+    """Delete image files older than `grace` seconds nothing refers to.
+
+    Catches files stored by uploads whose transaction rolled back.
+    Returns the number of files deleted.
+    """
+    storage = get_storage()
+    cutoff = timezone.now() - timedelta(seconds=grace)
+    try:
+        subdirectories, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return 0
+    deleted = 0
+    for subdirectory in subdirectories:
+        if subdirectory != 'variants':
+            deleted += collect_orphans(
+                grace, posixpath.join(directory, subdirectory))
+
+    names = {posixpath.join(directory, filename) for filename in files}
+    referenced = set(ImageBlob.objects.filter(
+        name__in=names).values_list('name', flat=True))
+    referenced.update(Recipe.objects.filter(
+        image__in=names - referenced).values_list('image', flat=True))
+    for name in sorted(names - referenced):
+        if storage.get_modified_time(name) < cutoff:
+            _delete_directory_files(storage, get_variants_directory(name))
+            storage.delete(name)
+            deleted += 1
+
+    return deleted
+
+
+class VariantPipeline:
+    """Render variants on worker processes.
+
+    At most `workers + queue_size` images are in flight; further
+    submissions wait (with `block=True`) or go to the database task
+    queue, so a burst of uploads cannot pile up in memory. Failed
+    renders are retried `retries` times with exponential backoff from
+    `retry_delay` seconds.
+    """
+
+    def __init__(self, workers, queue_size, retries, retry_delay):
+        self.workers = workers
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._capacity = workers + queue_size
+        self._slots = threading.BoundedSemaphore(self._capacity)
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            # Referenced directly so workers set up Django before they
+            # unpickle anything importing models.
+            initializer=django.setup,
+        )
+
+    def submit(self, recipe_id, image_name, block=False):
+        """Queue rendering for an image; return False when saturated."""
+        if not self._slots.acquire(blocking=block):
+            logger.warning(
+                'Image variant queue full, recipe %s left to the task queue',
+                recipe_id)
+            enqueue('recipe.render_image_variants', {
+                'recipe_id': recipe_id, 'image_name': image_name})
+            return False
+        self._start(recipe_id, image_name, 0)
+
+        return True
+
+    def _start(self, recipe_id, image_name, attempt):
+        args = (image_name, get_variant_sizes(), get_quality())
+        try:
+            with self._lock:
+                try:
+                    future = self._executor.submit(render_variants, *args)
+                except BrokenProcessPool:
+                    self._executor = self._new_executor()
+                    future = self._executor.submit(render_variants, *args)
+        except Exception:
+            logger.exception('Could not queue variants of %s', image_name)
+            self._slots.release()
+            return
+        future.add_done_callback(
+            lambda done: self._finish(done, recipe_id, image_name, attempt))
+
+    def _finish(self, future, recipe_id, image_name, attempt):
+        try:
+            variants = future.result()
+        except Exception:
+            if attempt < self.retries:
+                timer = threading.Timer(
+                    self.retry_delay * 2 ** attempt,
+                    self._start,
+                    (recipe_id, image_name, attempt + 1),
+                )
+                timer.daemon = True
+                timer.start()
+                return
+            logger.exception('Giving up on variants of %s', image_name)
+            self._slots.release()
+            return
+
+        try:
+            save_variants(recipe_id, image_name, variants)
+        except Exception:
+            logger.exception('Could not save variants of %s', image_name)
+        finally:
+            close_old_connections()
+            self._slots.release()
+
+    def join(self):
+        """Wait until every submitted image is done."""
+        for _ in range(self._capacity):
+            self._slots.acquire()
+        for _ in range(self._capacity):
+            self._slots.release()
+
+    def shutdown(self):
+        self.join()
+        self._executor.shutdown()
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline():
+    """Return the process-wide variant pipeline, creating it on first use."""
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = VariantPipeline(
+                    getattr(settings, 'RECIPE_IMAGE_VARIANT_WORKERS', 2),
+                    getattr(settings, 'RECIPE_IMAGE_VARIANT_QUEUE_SIZE', 32),
+                    getattr(settings, 'RECIPE_IMAGE_VARIANT_RETRIES', 3),
+                    getattr(settings, 'RECIPE_IMAGE_VARIANT_RETRY_DELAY', 1.0),
+                )
+
+    return _pipeline
+
+
+def shutdown_pipeline():
+    """Finish the images in flight and stop the pipeline, if started."""
+    global _pipeline
+    with _pipeline_lock:
+        pipeline, _pipeline = _pipeline, None
+    if pipeline is not None:
+        pipeline.shutdown()
+
+
+def schedule_variants(recipe_id, image_name):
+    """Render the variants of a recipe's new image in the background.
+
+    With `RECIPE_IMAGE_VARIANTS_INLINE` they are rendered right away
+    instead, e.g. in tests.
+    """
+    if getattr(settings, 'RECIPE_IMAGE_VARIANTS_INLINE', False):
+        variants = render_variants(
+            image_name, get_variant_sizes(), get_quality())
+        save_variants(recipe_id, image_name, variants)
+        return True
+
+    return get_pipeline().submit(recipe_id, image_name)
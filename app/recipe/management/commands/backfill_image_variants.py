@@ -0,0 +1,59 @@
+"""Django command to render missing recipe image variants"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from recipe import images
+
+
+class Command(BaseCommand):
+    """Render the variants of recipe images that have none."""
+    help = 'Render resized variants of existing recipe images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Re-render images that already have variants.')
+        parser.add_argument(
+            '--workers', type=int,
+            default=settings.RECIPE_IMAGE_VARIANT_WORKERS,
+            help='Worker processes; 0 renders in this process.')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            recipes = recipes.filter(image_variants={})
+        rows = recipes.order_by('id').values_list('id', 'image').iterator(
+            chunk_size=options['batch_size'])
+
+        pipeline = None
+        if options['workers'] > 0:
+            pipeline = images.VariantPipeline(
+                options['workers'],
+                settings.RECIPE_IMAGE_VARIANT_QUEUE_SIZE,
+                settings.RECIPE_IMAGE_VARIANT_RETRIES,
+                settings.RECIPE_IMAGE_VARIANT_RETRY_DELAY,
+            )
+
+        count = 0
+        for recipe_id, image_name in rows:
+            if pipeline is None:
+                self._render(recipe_id, image_name)
+            else:
+                pipeline.submit(recipe_id, image_name, block=True)
+            count += 1
+
+        if pipeline is not None:
+            pipeline.shutdown()
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {count} image(s).'))
+
+    def _render(self, recipe_id, image_name):
+        try:
+            variants = images.render_variants(
+                image_name, images.get_variant_sizes(), images.get_quality())
+        except Exception as exc:
+            self.stderr.write(f'Recipe {recipe_id}: {exc}')
+            return
+        images.save_variants(recipe_id, image_name, variants)
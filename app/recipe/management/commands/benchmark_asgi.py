@@ -0,0 +1,171 @@
+"""Django command to compare WSGI and async (ASGI) recipe API throughput"""
+import asyncio
+import io
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from recipe.management.commands.benchmark_serializers import seed_recipes
+
+BENCHMARK_EMAIL = 'benchmark-asgi@example.com'
+
+
+def call_wsgi(application, path, token):
+    """Serve one GET through the WSGI application, return the status."""
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'localhost',
+        'HTTP_AUTHORIZATION': f'Token {token}',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': io.StringIO(),
+        'wsgi.url_scheme': 'http',
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        'wsgi.version': (1, 0),
+    }
+    statuses = []
+
+    def start_response(status, headers, exc_info=None):
+        statuses.append(int(status.split()[0]))
+
+    response = application(environ, start_response)
+    try:
+        for _ in response:
+            pass
+    finally:
+        if hasattr(response, 'close'):
+            response.close()
+
+    return statuses[0]
+
+
+async def call_asgi(application, path, token):
+    """Serve one GET through the ASGI application, return the status."""
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'headers': [
+            (b'host', b'localhost'),
+            (b'authorization', f'Token {token}'.encode()),
+        ],
+        'server': ('localhost', 80),
+        'client': ('127.0.0.1', 0),
+    }
+    statuses = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            statuses.append(message['status'])
+
+    await application(scope, receive, send)
+    return statuses[0]
+
+
+async def run_clients(concurrency, requests, fetch):
+    """Run `concurrency` clients each sending `requests` GETs in turn.
+
+    Returns (elapsed seconds, latencies, error count).
+    """
+    latencies = []
+    errors = 0
+
+    async def client():
+        nonlocal errors
+        for _ in range(requests):
+            start = time.perf_counter()
+            status = await fetch()
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+
+    return time.perf_counter() - start, latencies, errors
+
+
+class Command(BaseCommand):
+    """Django command to compare WSGI and async view throughput."""
+    help = (
+        'Compare concurrent recipe list throughput of the WSGI application '
+        'and the async views under the ASGI application, in process, '
+        'against the configured database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=[100, 1000])
+        parser.add_argument(
+            '--requests', type=int, default=5,
+            help='Requests sent by each client.')
+        parser.add_argument(
+            '--threads', type=int, default=32,
+            help='Threads serving WSGI requests and async view hops.')
+        parser.add_argument('--recipes', type=int, default=100)
+        parser.add_argument(
+            '--cache', action='store_true',
+            help='Keep the response cache on (off by default).')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        get_user_model().objects.filter(email=BENCHMARK_EMAIL).delete()
+        user = get_user_model().objects.create_user(BENCHMARK_EMAIL)
+        token = Token.objects.create(user=user).key
+        try:
+            seed_recipes(user, options['recipes'])
+            with override_settings(RECIPE_RESPONSE_CACHE=options['cache']):
+                for concurrency in options['concurrency']:
+                    asyncio.run(self._compare(concurrency, token, options))
+        finally:
+            user.delete()
+
+    async def _compare(self, concurrency, token, options):
+        executor = ThreadPoolExecutor(max_workers=options['threads'])
+        asyncio.get_running_loop().set_default_executor(executor)
+        loop = asyncio.get_running_loop()
+        wsgi = get_wsgi_application()
+        asgi = get_asgi_application()
+        wsgi_path = reverse('recipe:recipe-list')
+        asgi_path = reverse('recipe-async:recipe-list')
+
+        async def fetch_wsgi():
+            return await loop.run_in_executor(
+                executor, call_wsgi, wsgi, wsgi_path, token)
+
+        async def fetch_asgi():
+            return await call_asgi(asgi, asgi_path, token)
+
+        for name, fetch in (('wsgi', fetch_wsgi), ('asgi', fetch_asgi)):
+            elapsed, latencies, errors = await run_clients(
+                concurrency, options['requests'], fetch)
+            latencies.sort()
+            self.stdout.write(
+                f'{name} c={concurrency:>5}: '
+                f'{len(latencies) / elapsed:>8.0f} req/s, '
+                f'p50 {statistics.median(latencies) * 1000:>7.1f} ms, '
+                f'p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:>7.1f}'
+                f' ms, {errors} errors'
+            )
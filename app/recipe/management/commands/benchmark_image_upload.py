@@ -0,0 +1,140 @@
+"""Django command to benchmark peak memory of recipe image uploads"""
+import io
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+from django.core.files.storage import default_storage
+from django.core.handlers.wsgi import WSGIRequest
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from PIL import Image
+from rest_framework import serializers
+
+from recipe import uploads
+from recipe.serializers import HeaderCheckedImageField
+
+BOUNDARY = 'BenchmarkBoundary'
+MODES = {
+    'buffered': 'default upload handlers and full Pillow validation',
+    'streaming': 'size-limited streaming and header-only validation',
+}
+
+
+def write_body(path, size):
+    """Write a multipart body holding a PNG of about `size` bytes."""
+    side = int((size / 3) ** 0.5)
+    image = Image.frombytes('RGB', (side, side), os.urandom(side * side * 3))
+    with open(path, 'wb') as body:
+        body.write(
+            f'--{BOUNDARY}\r\n'
+            'Content-Disposition: form-data; name="image"; '
+            'filename="large.png"\r\n'
+            'Content-Type: image/png\r\n\r\n'.encode()
+        )
+        image.save(body, format='PNG')
+        body.write(f'\r\n--{BOUNDARY}--\r\n'.encode())
+
+
+def reset_peak_rss():
+    """Restart peak RSS tracking where the OS allows it (Linux)."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        pass
+
+
+def read_status_kb(name):
+    """Return a /proc/self/status figure in KiB, or None."""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith(f'{name}:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_kb():
+    """Return the peak resident set size of this process in KiB."""
+    peak = read_status_kb('VmHWM')
+    if peak is None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak
+
+
+def rss_kb():
+    """Return the current resident set size of this process in KiB."""
+    return read_status_kb('VmRSS') or peak_rss_kb()
+
+
+def make_request(path):
+    """Return a POST request reading its body from `path`."""
+    return WSGIRequest({
+        'REQUEST_METHOD': 'POST',
+        'PATH_INFO': '/',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'CONTENT_TYPE': f'multipart/form-data; boundary={BOUNDARY}',
+        'CONTENT_LENGTH': str(os.path.getsize(path)),
+        'wsgi.input': open(path, 'rb'),
+        'wsgi.errors': io.StringIO(),
+        'wsgi.url_scheme': 'http',
+    })
+
+
+class Command(BaseCommand):
+    """Django command to compare peak RSS of image upload handling."""
+    help = (
+        'Compare the peak RSS of handling a large image upload before '
+        '(buffered) and after (streaming) upload streaming was added. '
+        'Each mode runs in a fresh process.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=20)
+        parser.add_argument('--child', choices=list(MODES))
+        parser.add_argument('--body')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        if options['child']:
+            self._run_child(options['child'], options['body'])
+            return
+
+        size = options['size_mb'] * 1024 * 1024
+        with tempfile.TemporaryDirectory() as tmp:
+            body = os.path.join(tmp, 'body')
+            write_body(body, size)
+            for mode, description in MODES.items():
+                result = subprocess.run(
+                    [sys.executable, sys.argv[0], 'benchmark_image_upload',
+                     '--child', mode, '--body', body],
+                    capture_output=True, text=True, check=True,
+                )
+                self.stdout.write(
+                    f'{mode:>9} ({description}): '
+                    f'peak RSS +{int(result.stdout) / 1024:.1f} MiB '
+                    f'for a {os.path.getsize(body) / 1024 ** 2:.1f} MiB upload'
+                )
+
+    def _run_child(self, mode, body):
+        with tempfile.TemporaryDirectory() as media, override_settings(
+                MEDIA_ROOT=media,
+                RECIPE_IMAGE_MAX_UPLOAD_SIZE=os.path.getsize(body)):
+            request = make_request(body)
+            reset_peak_rss()
+            baseline = rss_kb()
+            if mode == 'streaming':
+                uploads.limit_upload_size(request)
+                field = HeaderCheckedImageField()
+            else:
+                field = serializers.ImageField()
+            image = field.to_internal_value(request.FILES['image'])
+            default_storage.save('recipe.png', image)
+
+            self.stdout.write(str(peak_rss_kb() - baseline))
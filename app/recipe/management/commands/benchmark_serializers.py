@@ -0,0 +1,105 @@
+"""Django command to benchmark the recipe serialization fast path"""
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Prefetch
+
+from core.models import Recipe, Tag, Ingredient
+from recipe import fastpath
+from recipe.serializers import RecipeSerializer
+
+
+def seed_recipes(user, count):
+    """Create `count` recipes with two tags and two ingredients each."""
+    tags = Tag.objects.bulk_create(
+        Tag(user=user, name=f'Tag {i}') for i in range(20)
+    )
+    ingredients = Ingredient.objects.bulk_create(
+        Ingredient(user=user, name=f'Ingredient {i}') for i in range(20)
+    )
+    Recipe.objects.bulk_create(
+        Recipe(
+            user=user,
+            title=f'Recipe {i}',
+            time_minutes=i % 120,
+            price=Decimal('9.99'),
+            link='http://example.com/recipe.pdf',
+        )
+        for i in range(count)
+    )
+    tag_ids = [tag.id for tag in Tag.objects.filter(user=user)]
+    ing_ids = [ing.id for ing in Ingredient.objects.filter(user=user)]
+    recipe_ids = Recipe.objects.filter(user=user).values_list('id', flat=True)
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_ids[j])
+        for i, recipe_id in enumerate(recipe_ids)
+        for j in (i % 20, (i + 1) % 20)
+    )
+    Recipe.ingredients.through.objects.bulk_create(
+        Recipe.ingredients.through(
+            recipe_id=recipe_id, ingredient_id=ing_ids[j])
+        for i, recipe_id in enumerate(recipe_ids)
+        for j in (i % 20, (i + 1) % 20)
+    )
+
+    return tags, ingredients
+
+
+def best_time(func, repeat):
+    """Return the fastest of `repeat` runs of `func` in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    return min(timings)
+
+
+class Command(BaseCommand):
+    """Django command to compare recipe serialization throughput."""
+    help = 'Compare RecipeSerializer with the fast path (rolled back).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[1000, 10000])
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        with transaction.atomic():
+            for size in options['sizes']:
+                self._run(size, options['repeat'])
+            transaction.set_rollback(True)
+
+    def _run(self, size, repeat):
+        user = get_user_model().objects.create_user(
+            f'benchmark-{size}@example.com')
+        seed_recipes(user, size)
+        queryset = Recipe.objects.filter(user=user).order_by('-id')
+
+        def serializer_path():
+            recipes = queryset.prefetch_related(
+                Prefetch('tags', queryset=Tag.objects.order_by('id')),
+                Prefetch(
+                    'ingredients', queryset=Ingredient.objects.order_by('id')
+                ),
+            )
+            return RecipeSerializer(recipes, many=True).data
+
+        def fast_path():
+            serializer = RecipeSerializer()
+            rows = list(fastpath.get_values(queryset, serializer))
+            return fastpath.serialize(rows, serializer)
+
+        slow = best_time(serializer_path, repeat)
+        fast = best_time(fast_path, repeat)
+        self.stdout.write(
+            f'{size:>6} recipes: '
+            f'serializer {size / slow:>10.0f} obj/s, '
+            f'fast path {size / fast:>10.0f} obj/s '
+            f'({slow / fast:.1f}x)'
+        )
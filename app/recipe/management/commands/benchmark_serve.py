@@ -0,0 +1,130 @@
+"""Django command to compare `serve` and `runserver` recipe API throughput"""
+import http.client
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from recipe.management.commands.benchmark_serializers import seed_recipes
+
+BENCHMARK_EMAIL = 'benchmark-serve@example.com'
+
+
+def get_free_port():
+    """Return a local port nothing listens on."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def fetch(port, path, token):
+    """Send one GET over a new connection; return (status, seconds)."""
+    start = time.perf_counter()
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        connection.request(
+            'GET', path, headers={'Authorization': f'Token {token}'})
+        response = connection.getresponse()
+        response.read()
+        status = response.status
+    except OSError:
+        status = None
+    finally:
+        connection.close()
+
+    return status, time.perf_counter() - start
+
+
+def start_server(args, port):
+    """Start a manage.py server command; return it once it answers."""
+    process = subprocess.Popen(
+        [sys.executable, 'manage.py', *args],
+        cwd=settings.BASE_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while fetch(port, '/', '')[0] is None:
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            raise CommandError(f'Could not start {" ".join(args)}.')
+        time.sleep(0.1)
+
+    return process
+
+
+class Command(BaseCommand):
+    """Django command to compare production and development servers."""
+    help = (
+        'Compare recipe list throughput of `manage.py serve` and '
+        '`manage.py runserver`, over HTTP on localhost, against the '
+        'configured database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=[1, 16, 64])
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Requests sent by each client.')
+        parser.add_argument(
+            '--workers', type=int, default=settings.SERVE_WORKERS,
+            help='Workers started by `serve`.')
+        parser.add_argument('--recipes', type=int, default=100)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        get_user_model().objects.filter(email=BENCHMARK_EMAIL).delete()
+        user = get_user_model().objects.create_user(BENCHMARK_EMAIL)
+        token = Token.objects.create(user=user).key
+        path = reverse('recipe:recipe-list')
+        servers = {
+            'runserver': ['runserver', '--noreload'],
+            'serve': ['serve', '--workers', str(options['workers'])],
+        }
+        try:
+            seed_recipes(user, options['recipes'])
+            for name, args in servers.items():
+                port = get_free_port()
+                bind = f'127.0.0.1:{port}'
+                process = start_server(
+                    [*args, '--bind', bind] if name == 'serve'
+                    else [*args, bind],
+                    port,
+                )
+                try:
+                    for concurrency in options['concurrency']:
+                        self._run(name, port, path, token, concurrency,
+                                  options['requests'])
+                finally:
+                    process.terminate()
+                    process.wait()
+        finally:
+            user.delete()
+
+    def _run(self, name, port, path, token, concurrency, requests):
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            start = time.perf_counter()
+            results = list(executor.map(
+                lambda _: fetch(port, path, token),
+                range(concurrency * requests),
+            ))
+            elapsed = time.perf_counter() - start
+
+        latencies = sorted(seconds for _, seconds in results)
+        errors = sum(status != 200 for status, _ in results)
+        self.stdout.write(
+            f'{name:>9} c={concurrency:>4}: '
+            f'{len(latencies) / elapsed:>8.0f} req/s, '
+            f'p50 {statistics.median(latencies) * 1000:>7.1f} ms, '
+            f'p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:>7.1f}'
+            f' ms, {errors} errors'
+        )
@@ -0,0 +1,26 @@
+"""Django command to delete recipe images no recipe refers to"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipe import images
+
+
+class Command(BaseCommand):
+    """Delete unreferenced recipe images and their variants."""
+    help = 'Delete recipe images no longer used by any recipe.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=settings.RECIPE_IMAGE_GC_GRACE,
+            help='Seconds an image must have been unused for.')
+        parser.add_argument(
+            '--orphans', action='store_true',
+            help='Also scan storage for files without any record.')
+
+    def handle(self, *args, **options):
+        deleted = images.collect_garbage(options['grace'])
+        if options['orphans']:
+            deleted += images.collect_orphans(options['grace'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} image(s).'))
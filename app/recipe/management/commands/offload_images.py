@@ -0,0 +1,37 @@
+"""Django command to upload locally left recipe images to the store"""
+import os
+import posixpath
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe.images import get_storage
+from recipe.storage import OffloadedStorage
+
+
+class Command(BaseCommand):
+    """Offload local copies of recipe images, e.g. after failed uploads."""
+    help = 'Upload recipe images still on local disk to the object store.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directory', default='uploads/recipe')
+
+    def handle(self, *args, **options):
+        storage = get_storage()
+        if not isinstance(storage, OffloadedStorage):
+            raise CommandError('Recipe images are not offloaded.')
+
+        count = 0
+        for name in self._walk(storage, options['directory']):
+            if storage.offloader.upload(name):
+                count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Offloaded {count} file(s).'))
+
+    def _walk(self, storage, directory):
+        """Yield the names of local files under `directory`."""
+        root = storage.path(directory)
+        for path, _, files in os.walk(root):
+            relative = os.path.relpath(path, root).replace(os.sep, '/')
+            for filename in sorted(files):
+                yield posixpath.normpath(
+                    posixpath.join(directory, relative, filename))
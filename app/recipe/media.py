@@ -0,0 +1,196 @@
+"""
+Serving of recipe images and their variants.
+
+Stored images never change (they are named after their content), so
+responses may be cached for a long time. Files are validated with an
+ETag and Last-Modified taken from their stat and support single byte
+ranges. With `RECIPE_MEDIA_SENDFILE` set the front-end server sends the
+bytes (X-Accel-Redirect for nginx, X-Sendfile for Apache or lighttpd),
+so they never pass through a Python worker. Files without a local copy
+are redirected to, e.g. a presigned object store URL. Only image
+extensions are served, each with a fixed Content-Type.
+"""
+import os
+import posixpath
+import re
+import stat as stat_module
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+)
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from recipe.images import get_storage
+
+MEDIA_PREFIX = 'uploads/recipe/'
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+# Content types by extension; anything else is not served, so stored
+# files cannot be sniffed or rendered as, e.g. HTML.
+CONTENT_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+}
+SENDFILE_HEADERS = {
+    'x-accel-redirect': 'X-Accel-Redirect',
+    'x-sendfile': 'X-Sendfile',
+}
+
+
+def get_etag(stat):
+    """Return a strong ETag for a file's modification time and size."""
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def parse_range(header, size):
+    """Return the inclusive (start, end) byte range asked for by `header`.
+
+    Returns None when the whole file should be sent (no, malformed or
+    multiple ranges) and raises ValueError for unsatisfiable ranges.
+    """
+    match = RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError('Unsatisfiable range.')
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if last and end < start:
+        return None
+    if start >= size:
+        raise ValueError('Unsatisfiable range.')
+    return start, min(end, size - 1)
+
+
+def _range_applies(request, etag, last_modified):
+    """Return whether an `If-Range` header (if any) still matches."""
+    value = request.META.get('HTTP_IF_RANGE')
+    if value is None:
+        return True
+    if value.startswith('"'):
+        return value == etag
+    return parse_http_date_safe(value) == last_modified
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def _get_redirect_response(storage, name):
+    """Redirect to a storage URL that stays valid while cached."""
+    get_redirect_url = getattr(storage, 'get_redirect_url', storage.url)
+    response = HttpResponseRedirect(get_redirect_url(name))
+    expiry = getattr(settings, 'RECIPE_IMAGE_STORE_URL_EXPIRY', 3600)
+    patch_cache_control(response, public=True, max_age=expiry // 2)
+
+    return response
+
+
+def _get_file_response(request, name, path, stat, etag):
+    content_type = CONTENT_TYPES[posixpath.splitext(name)[1].lower()]
+    sendfile = getattr(settings, 'RECIPE_MEDIA_SENDFILE', None)
+    if sendfile in SENDFILE_HEADERS:
+        # The front-end server answers range requests itself.
+        response = HttpResponse(content_type=content_type)
+        if sendfile == 'x-accel-redirect':
+            prefix = getattr(
+                settings, 'RECIPE_MEDIA_ACCEL_PREFIX', '/protected-media/')
+            response['X-Accel-Redirect'] = prefix + quote(name)
+        else:
+            response['X-Sendfile'] = path
+        return response
+
+    byte_range = None
+    if _range_applies(request, etag, int(stat.st_mtime)):
+        try:
+            byte_range = parse_range(
+                request.META.get('HTTP_RANGE', ''), stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+
+    if byte_range is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _read_range(path, start, end - start + 1),
+            status=206,
+            content_type=content_type,
+        )
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    response['Accept-Ranges'] = 'bytes'
+
+    return response
+
+
+@require_safe
+def serve_image(request, name):
+    """Serve a recipe image or variant stored as `name`."""
+    name = posixpath.normpath(name)
+    if not name.startswith(MEDIA_PREFIX):
+        raise Http404
+    if posixpath.splitext(name)[1].lower() not in CONTENT_TYPES:
+        raise Http404
+    storage = get_storage()
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        return _get_redirect_response(storage, name)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        stat = os.stat(path)
+    except OSError:
+        if hasattr(storage, 'get_redirect_url'):
+            return _get_redirect_response(storage, name)
+        raise Http404
+    if not stat_module.S_ISREG(stat.st_mode):
+        raise Http404
+
+    etag = get_etag(stat)
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _get_file_response(request, name, path, stat, etag)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['X-Content-Type-Options'] = 'nosniff'
+    patch_cache_control(
+        response,
+        public=True,
+        max_age=getattr(
+            settings, 'RECIPE_MEDIA_CACHE_MAX_AGE', 365 * 24 * 60 * 60),
+        immutable=True,
+    )
+
+    return response
@@ -0,0 +1,148 @@
+"""
+Pagination for Recipe APIs
+"""
+import json
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class KeysetCursorPagination(CursorPagination):
+    """Cursor pagination seeking on every ordering field.
+
+    DRF's cursor holds the first ordering field only and steps over
+    ties with an OFFSET, capped at `offset_cutoff`, so pages of rows
+    sharing a value (the same price, or search rank) repeat forever.
+    Here the cursor holds the whole ordering key, which ends with `id`
+    and so is unique, and each page is a single index seek: with
+    ordering (price, -id), the next page is
+    `price > p OR (price = p AND id < i)`. Ordering fields must not be
+    null.
+    """
+    tie_breaker = '-id'
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not {'id', '-id', 'pk', '-pk'} & set(ordering):
+            ordering = (*ordering, self.tie_breaker)
+
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = None if self.cursor is None else self.cursor.position
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [
+                field[1:] if field.startswith('-') else f'-{field}'
+                for field in ordering
+            ]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._seek(ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        if self.page:
+            self.next_position = self._get_position_from_instance(
+                self.page[-1], self.ordering)
+            self.previous_position = self._get_position_from_instance(
+                self.page[0], self.ordering)
+        else:
+            # Nothing left in this direction; turning back starts from
+            # the position we came from.
+            self.next_position = self.previous_position = position
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def _seek(self, ordering, position):
+        """Return a filter for rows after `position` in `ordering`."""
+        conditions = []
+        for i, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {
+                previous.lstrip('-'): value
+                for previous, value in zip(ordering[:i], position)
+            }
+            conditions.append(Q(**equal, **{f'{name}__{lookup}': position[i]}))
+
+        return reduce(or_, conditions)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=False, position=self.next_position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=True, position=self.previous_position))
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+        try:
+            position = json.loads(cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if (not isinstance(position, list)
+                or len(position) != len(self.ordering)
+                or not all(isinstance(value, str) for value in position)):
+            raise NotFound(self.invalid_cursor_message)
+
+        return cursor._replace(offset=0, position=position)
+
+    def encode_cursor(self, cursor):
+        return super().encode_cursor(cursor._replace(
+            position=json.dumps(cursor.position, separators=(',', ':'))))
+
+    def _get_position_from_instance(self, instance, ordering):
+        position = []
+        for field in ordering:
+            name = field.lstrip('-')
+            if isinstance(instance, dict):
+                value = instance[name]
+            else:
+                value = getattr(instance, name)
+            position.append(str(value))
+
+        return position
+
+
+class RecipeCursorPagination(KeysetCursorPagination):
+    """Keyset pagination for recipes, newest first."""
+    ordering = '-id'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class RecipeAttrCursorPagination(KeysetCursorPagination):
+    """Keyset pagination for tags and ingredients, by name."""
+    ordering = ('-name', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,94 @@
+"""
+Database-side JSON assembly for recipe lists on PostgreSQL.
+
+Builds the JSON array `RecipeSerializer` would produce for a page of
+recipe ids in a single statement with json_agg/json_build_object over
+the recipe, tag and ingredient join tables, so no model instances are
+created.
+"""
+from django.db import connections
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+from core.models import Recipe
+from recipe.serializers import ImageVariantsField
+
+
+def is_supported(using='default'):
+    """Return whether the database can assemble the JSON itself."""
+    return connections[using].vendor == 'postgresql'
+
+
+def _nested_sql(relation, qn):
+    """Return SQL for the ordered {'id', 'name'} array of a relation."""
+    field = Recipe._meta.get_field(relation)
+    through = field.remote_field.through._meta
+    target = field.related_model._meta
+    source_column = through.get_field(field.m2m_field_name()).column
+    target_column = through.get_field(field.m2m_reverse_field_name()).column
+
+    return (
+        f"COALESCE((SELECT json_agg(json_build_object("
+        f"'id', t.{qn('id')}, 'name', t.{qn('name')}) ORDER BY t.{qn('id')})"
+        f" FROM {qn(through.db_table)} m"
+        f" INNER JOIN {qn(target.db_table)} t"
+        f" ON t.{qn('id')} = m.{qn(target_column)}"
+        f" WHERE m.{qn(source_column)} = r.{qn('id')}), '[]'::json)"
+    )
+
+
+def _variants_sql(column):
+    """Return SQL turning variant storage names into URLs.
+
+    Takes the URL prefix as its parameter; keys are sorted as in
+    `ImageVariantsField`.
+    """
+    return (
+        "COALESCE((SELECT json_object_agg(v.key, (SELECT json_object_agg("
+        "f.key, %s || f.value ORDER BY f.key COLLATE \"C\")"
+        " FROM jsonb_each_text(v.value) f) ORDER BY v.key COLLATE \"C\")"
+        f" FROM jsonb_each(r.{column}) v), '{{}}'::json)"
+    )
+
+
+def _object_sql(serializer, qn):
+    """Return the json_build_object() SQL and params for one recipe."""
+    parts = []
+    params = []
+    for name, field in serializer.fields.items():
+        params.append(name)
+        if isinstance(field, serializers.ListSerializer):
+            expression = _nested_sql(name, qn)
+        elif isinstance(field, ImageVariantsField):
+            column = qn(Recipe._meta.get_field(name).column)
+            expression = _variants_sql(column)
+            params.append(field.get_url_prefix())
+        else:
+            column = qn(Recipe._meta.get_field(name).column)
+            expression = f'r.{column}'
+            if isinstance(field, serializers.DecimalField) and getattr(
+                field,
+                'coerce_to_string',
+                api_settings.COERCE_DECIMAL_TO_STRING,
+            ):
+                expression = f'{expression}::text'
+        parts.append(f'%s, {expression}')
+
+    return f"json_build_object({', '.join(parts)})", params
+
+
+def render(recipe_ids, serializer, using='default'):
+    """Return the JSON array text for `recipe_ids`, in that order."""
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    object_sql, params = _object_sql(serializer, qn)
+    sql = (
+        f"SELECT COALESCE(json_agg({object_sql} ORDER BY p.n), '[]'::json)"
+        f"::text FROM unnest(%s::bigint[]) WITH ORDINALITY AS p(id, n)"
+        f" INNER JOIN {qn(Recipe._meta.db_table)} r"
+        f" ON r.{qn('id')} = p.id"
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [list(recipe_ids)])
+        return cursor.fetchone()[0]
@@ -0,0 +1,69 @@
+"""
+Renderers for Recipe APIs
+"""
+import csv
+import json
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Render items as newline delimited JSON, one item per line."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        items = data if isinstance(data, list) else [data]
+        return ''.join(self.stream(items)).encode(self.charset)
+
+    def stream(self, items, fields=None):
+        """Yield the lines for `items`."""
+        for item in items:
+            yield json.dumps(
+                item,
+                cls=JSONEncoder,
+                ensure_ascii=False,
+                separators=(',', ':'),
+            ) + '\n'
+
+
+class _Echo:
+    """File-like object handing back what csv.writer writes."""
+
+    def write(self, value):
+        return value
+
+
+class CSVRenderer(BaseRenderer):
+    """Render items as CSV rows under a header of their field names.
+
+    Nested objects are written as their names, joined by `separator`,
+    and mappings as JSON.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    separator = ';'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        items = data if isinstance(data, list) else [data]
+        fields = list(items[0]) if items else []
+        return ''.join(self.stream(items, fields)).encode(self.charset)
+
+    def _to_cell(self, value):
+        if isinstance(value, list):
+            return self.separator.join(
+                str(item['name'] if isinstance(item, dict) else item)
+                for item in value
+            )
+        if isinstance(value, dict):
+            return json.dumps(value, cls=JSONEncoder, separators=(',', ':'))
+        return value
+
+    def stream(self, items, fields):
+        """Yield the header and a row per item of `items`."""
+        writer = csv.writer(_Echo())
+        yield writer.writerow(fields)
+        for item in items:
+            yield writer.writerow(
+                [self._to_cell(item.get(field)) for field in fields])
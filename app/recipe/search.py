@@ -0,0 +1,104 @@
+"""
+Full-text search over recipe titles and descriptions.
+
+On PostgreSQL each recipe keeps a weighted tsvector in
+`Recipe.search_vector` (GIN-indexed) and results are ranked with
+ts_rank. Other databases use the `RecipeSearchTerm` inverted index,
+ranked by the summed weight of the matched terms.
+"""
+import re
+from collections import Counter
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+)
+from django.db import connections
+from django.db.models import (
+    Exists,
+    F,
+    FloatField,
+    OuterRef,
+    Subquery,
+    Sum,
+)
+from django.db.models.functions import Cast
+
+from core.models import Recipe, RecipeSearchTerm
+
+SEARCH_CONFIG = 'english'
+TITLE_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+MAX_TERM_LENGTH = RecipeSearchTerm._meta.get_field('term').max_length
+
+
+def uses_vector(using='default'):
+    """Return whether the database supports tsvector search."""
+    return connections[using].vendor == 'postgresql'
+
+
+def tokenize(text):
+    """Return the lowercase word terms in `text`."""
+    return [
+        word[:MAX_TERM_LENGTH] for word in re.findall(r'\w+', text.lower())
+    ]
+
+
+def _get_term_weights(title, description):
+    weights = Counter()
+    for term in tokenize(title):
+        weights[term] += TITLE_WEIGHT
+    for term in tokenize(description):
+        weights[term] += DESCRIPTION_WEIGHT
+
+    return weights
+
+
+def index_recipes(recipe_ids, using='default'):
+    """Rebuild the search data of the given recipes."""
+    recipes = Recipe.objects.using(using).filter(pk__in=recipe_ids)
+    if uses_vector(using):
+        recipes.update(search_vector=(
+            SearchVector('title', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('description', weight='B', config=SEARCH_CONFIG)
+        ))
+        return
+
+    RecipeSearchTerm.objects.using(using).filter(
+        recipe_id__in=recipe_ids).delete()
+    RecipeSearchTerm.objects.using(using).bulk_create(
+        RecipeSearchTerm(recipe_id=recipe_id, term=term, weight=weight)
+        for recipe_id, title, description in recipes.values_list(
+            'id', 'title', 'description')
+        for term, weight in _get_term_weights(title, description).items()
+    )
+
+
+def search(queryset, text):
+    """Filter `queryset` to recipes matching `text`.
+
+    Matches are annotated with a `search_rank`, higher is better.
+    """
+    if uses_vector(queryset.db):
+        query = SearchQuery(
+            text, search_type='websearch', config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=Cast(
+                SearchRank(F('search_vector'), query),
+                output_field=FloatField(),
+            ),
+        )
+
+    terms = set(tokenize(text))
+    if not terms:
+        return queryset.none()
+    for term in terms:
+        queryset = queryset.filter(Exists(RecipeSearchTerm.objects.filter(
+            recipe=OuterRef('pk'), term=term)))
+    rank = RecipeSearchTerm.objects.filter(
+        recipe=OuterRef('pk'), term__in=terms
+    ).values('recipe').annotate(rank=Sum('weight')).values('rank')
+
+    return queryset.annotate(
+        search_rank=Cast(Subquery(rank), output_field=FloatField()))
@@ -1,8 +1,63 @@
 """
 Serializers for Recipe APIs
 """
+from django.db import transaction
 from rest_framework import serializers
-from core.models import Recipe, Tag, Ingredient
+from core.models import ImageBlob, Recipe, Tag, Ingredient
+from recipe.uploads import validate_image_header
+
+
+class SparseFieldsMixin:
+    """Limit output to the `fields` and drop the `omit` serializer kwargs.
+
+    Read-only serializers lose the unwanted fields up front so they are
+    never evaluated; serializers taking input keep every field for
+    validation and only trim the representation.
+    """
+
+    def __init__(self, *args, fields=None, omit=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        hidden = set()
+        if fields is not None:
+            hidden |= set(self.fields) - set(fields)
+        if omit is not None:
+            hidden |= set(omit)
+
+        self._hidden_fields = set()
+        if hasattr(self, 'initial_data'):
+            self._hidden_fields = hidden
+        else:
+            for name in hidden:
+                self.fields.pop(name, None)
+
+    def to_representation(self, instance):
+        ret = super().to_representation(instance)
+        for name in self._hidden_fields:
+            ret.pop(name, None)
+        return ret
+
+
+def get_or_create_ids(model, user, names):
+    """Return a {name: id} map of the user's `model` rows named `names`.
+
+    Existing names are found with one query and the missing ones are
+    bulk inserted; names inserted concurrently by another request are
+    skipped by the unique constraint and re-read.
+    """
+    names = set(names)
+    if not names:
+        return {}
+    objects = model.objects.filter(user=user)
+    ids = dict(objects.filter(name__in=names).values_list('name', 'id'))
+    missing = names - set(ids)
+    if missing:
+        model.objects.bulk_create(
+            [model(user=user, name=name) for name in missing],
+            ignore_conflicts=True,
+        )
+        ids.update(objects.filter(name__in=missing).values_list('name', 'id'))
+
+    return ids
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -23,10 +78,32 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class ImageVariantsField(serializers.ReadOnlyField):
+    """URLs of a recipe's image variants, as {variant: {format: url}}."""
+
+    def get_url_prefix(self):
+        """Return the URL variant storage names are appended to."""
+        url = Recipe._meta.get_field('image').storage.url('')
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    def to_representation(self, value):
+        prefix = self.get_url_prefix()
+        return {
+            variant: {
+                ext: prefix + name for ext, name in sorted(formats.items())
+            }
+            for variant, formats in sorted(value.items())
+        }
+
+
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for Recipe"""
     tags = TagSerializer(many=True, required=False)
     ingredients = IngredientSerializer(many=True, required=False)
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
@@ -37,28 +114,26 @@ class RecipeSerializer(serializers.ModelSerializer):
             'price',
             'link',
             'tags',
-            'ingredients'
+            'ingredients',
+            'image_variants',
             ]
         read_only_fields = ['id']
 
+    def _get_or_create_objects(self, model, items):
+        """Return the user's `model` ids named in `items`, in order."""
+        names = list(dict.fromkeys(item['name'] for item in items))
+        ids = get_or_create_ids(model, self.context['request'].user, names)
+
+        return [ids[name] for name in names]
+
     def _get_or_create_tag(self, tags, recipe):
-        auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag,
-            )
-            recipe.tags.add(tag_obj)
+        recipe.tags.add(*self._get_or_create_objects(Tag, tags))
 
     def _get_or_create_ingredient(self, ingredients, recipe):
-        auth_user = self.context['request'].user
-        for ingredient in ingredients:
-            ingredient_obj, created = Ingredient.objects.get_or_create(
-                user=auth_user,
-                **ingredient,
-            )
-            recipe.ingredients.add(ingredient_obj)
+        recipe.ingredients.add(
+            *self._get_or_create_objects(Ingredient, ingredients))
 
+    @transaction.atomic
     def create(self, validated_data):
         """Create a recipe"""
         tags = validated_data.pop('tags', [])
@@ -68,22 +143,30 @@ class RecipeSerializer(serializers.ModelSerializer):
         self._get_or_create_ingredient(ingredients, recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        """Updating recipe."""
+        """Updating recipe.
+
+        Only memberships that changed are inserted or deleted, and only
+        changed attributes are written.
+        """
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
         if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tag(tags, instance)
+            instance.tags.set(self._get_or_create_objects(Tag, tags))
 
         if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredient(ingredients, instance)
+            instance.ingredients.set(
+                self._get_or_create_objects(Ingredient, ingredients))
 
+        changed = []
         for attr, value in validated_data.items():
-            setattr(instance, attr, value)
+            if getattr(instance, attr) != value:
+                setattr(instance, attr, value)
+                changed.append(attr)
 
-        instance.save()
+        if changed:
+            instance.save(update_fields=[*changed, 'updated_at'])
         return instance
 
 
@@ -94,10 +177,51 @@ class RecipeDetailSerializer(RecipeSerializer):
         fields = RecipeSerializer.Meta.fields + ['description']
 
 
-class RecipeImageSerializer(serializers.ModelSerializer):
+class BulkOperationSerializer(serializers.Serializer):
+    """Serializer for one operation of a bulk recipe request."""
+    op = serializers.ChoiceField(choices=['create', 'update', 'delete'])
+    id = serializers.IntegerField(required=False)
+    data = serializers.DictField(required=False)
+
+    def validate(self, attrs):
+        if attrs['op'] != 'create' and 'id' not in attrs:
+            raise serializers.ValidationError(
+                {'id': f'Required for {attrs["op"]}.'})
+        if attrs['op'] != 'delete' and 'data' not in attrs:
+            raise serializers.ValidationError(
+                {'data': f'Required for {attrs["op"]}.'})
+        return attrs
+
+
+class HeaderCheckedImageField(serializers.ImageField):
+    """Image field validated from the file header only."""
+
+    def to_internal_value(self, data):
+        file = serializers.FileField.to_internal_value(self, data)
+        validate_image_header(file)
+        return file
+
+
+class RecipeImageSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Serializer for uploading images to recipes."""
+    image = HeaderCheckedImageField()
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
-        fields = ['id', 'image']
+        fields = ['id', 'image', 'image_variants']
         read_only_fields = ['id']
-        extra_kwargs = {'image': {'required': 'True'}}
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        """Replace the image, releasing the old one.
+
+        Variants of the new image are rendered later by the view.
+        """
+        old = instance.image.name
+        instance.image_variants = {}
+        instance = super().update(instance, validated_data)
+        if old:
+            ImageBlob.objects.release(old)
+
+        return instance
@@ -0,0 +1,151 @@
+"""
+Signal handlers for Recipe APIs
+"""
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (
+    post_save,
+    pre_delete,
+    post_delete,
+    m2m_changed,
+)
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import ImageBlob, Recipe, Tag, Ingredient
+from core.server import worker_exiting
+from recipe import search
+from recipe.cache import bump_version
+from recipe.storage import OffloadedStorage
+
+
+_deferred = threading.local()
+
+
+@contextmanager
+def defer_touches():
+    """Touch each changed user once when the block exits.
+
+    Used by bulk writes so deleting many recipes does not touch their
+    owner once per row.
+    """
+    if getattr(_deferred, 'user_ids', None) is not None:
+        yield
+        return
+
+    _deferred.user_ids = set()
+    try:
+        yield
+    finally:
+        user_ids, _deferred.user_ids = _deferred.user_ids, None
+        for user_id in user_ids:
+            touch_user(user_id)
+
+
+def touch_user(user_id):
+    """Mark a user's recipe data as modified.
+
+    Cached responses are invalidated once the transaction commits: a
+    request served before then still reads the old data, and must not
+    cache it under the new version.
+    """
+    user_ids = getattr(_deferred, 'user_ids', None)
+    if user_ids is not None:
+        user_ids.add(user_id)
+        return
+
+    transaction.on_commit(lambda: bump_version(user_id))
+    get_user_model().objects.filter(pk=user_id).update(
+        recipes_updated_at=timezone.now())
+
+
+def touch_recipes(recipes):
+    """Mark recipes as modified, e.g. when their tags change."""
+    recipes.update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_user_data(sender, instance, **kwargs):
+    """Invalidate cached responses for the owner of a changed object."""
+    touch_user(instance.user_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def release_recipe_image(sender, instance, using='default', **kwargs):
+    """Drop a deleted recipe's reference to its image."""
+    if instance.image:
+        ImageBlob.objects.using(using).release(instance.image.name)
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, update_fields=None, using='default',
+                 **kwargs):
+    """Keep the search data of a saved recipe up to date."""
+    if update_fields is None or {'title', 'description'} & update_fields:
+        search.index_recipes([instance.pk], using=using)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_new_user(sender, instance, created, **kwargs):
+    """Start new users on a fresh version in case their id is reused."""
+    if created:
+        bump_version(instance.pk)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def touch_tagged_recipes(sender, instance, created=False, **kwargs):
+    """Touch recipes showing a renamed or deleted tag."""
+    if not created:
+        touch_recipes(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def touch_recipes_with_ingredient(sender, instance, created=False,
+                                  **kwargs):
+    """Touch recipes showing a renamed or deleted ingredient."""
+    if not created:
+        touch_recipes(Recipe.objects.filter(ingredients=instance))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def touch_recipe_relations(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    """Touch recipes and their owner when tags or ingredients change."""
+    if action.startswith('post_'):
+        touch_user(instance.user_id)
+
+    if not reverse:
+        if action.startswith('post_'):
+            touch_recipes(Recipe.objects.filter(pk=instance.pk))
+    elif action in ('post_add', 'post_remove'):
+        touch_recipes(Recipe.objects.filter(pk__in=pk_set))
+    elif action == 'pre_clear':
+        related = 'tags' if sender is Recipe.tags.through else 'ingredients'
+        touch_recipes(Recipe.objects.filter(**{related: instance}))
+
+
+@receiver(worker_exiting)
+def drain_image_work(sender, **kwargs):
+    """Render pending variants and upload pending images before exiting.
+
+    Variants are recorded before the uploads are awaited, as rendering
+    them stores new files.
+    """
+    from recipe import images
+
+    images.shutdown_pipeline()
+    storage = images.get_storage()
+    if isinstance(storage, OffloadedStorage):
+        storage.join()
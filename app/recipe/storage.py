@@ -0,0 +1,313 @@
+"""
+Recipe image storage backed by an S3-compatible object store.
+
+`OffloadedStorage` writes files to the local `MEDIA_ROOT` first, so
+uploads return as soon as the bytes are on disk, then uploads them to
+the configured object store on background threads and drops the local
+copy. Files are read from the local copy while it exists and from the
+object store afterwards, and the media view redirects to presigned
+object store URLs, so app nodes do not need to share a volume.
+
+Object stores are configured with `RECIPE_IMAGE_STORE`:
+
+    {'BACKEND': 'recipe.storage.S3ObjectStore', 'OPTIONS': {...}}
+
+`MemoryObjectStore` keeps objects in process, for tests.
+"""
+import logging
+import mimetypes
+import os
+import posixpath
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+class S3ObjectStore:
+    """Objects in an S3-compatible bucket, accessed with boto3.
+
+    `client_options` go to `boto3.client('s3', ...)`, e.g.
+    `endpoint_url` for MinIO or other S3-compatible services.
+    Credentials are found the usual boto3 way.
+    """
+
+    def __init__(self, bucket, prefix='', **client_options):
+        try:
+            import boto3
+            from botocore.exceptions import ClientError
+        except ImportError:
+            raise ImproperlyConfigured('S3ObjectStore requires boto3.')
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client('s3', **client_options)
+        self.client_error = ClientError
+
+    def _key(self, name):
+        return posixpath.join(self.prefix, name) if self.prefix else name
+
+    def put(self, name, file):
+        content_type = mimetypes.guess_type(name)[0]
+        self.client.upload_fileobj(
+            file, self.bucket, self._key(name), ExtraArgs={
+                'ContentType': content_type or 'application/octet-stream',
+                'CacheControl': CACHE_CONTROL,
+            })
+
+    def get(self, name, file):
+        """Write an object into `file`; raise FileNotFoundError if missing."""
+        try:
+            self.client.download_fileobj(self.bucket, self._key(name), file)
+        except self.client_error as exc:
+            raise FileNotFoundError(name) from exc
+
+    def delete(self, name):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(name))
+
+    def stat(self, name):
+        """Return (size, modified time) of an object, or None."""
+        try:
+            head = self.client.head_object(
+                Bucket=self.bucket, Key=self._key(name))
+        except self.client_error:
+            return None
+        return head['ContentLength'], head['LastModified']
+
+    def listdir(self, path):
+        """Return the (directories, files) directly under `path`."""
+        prefix = self._key(path).rstrip('/') + '/'
+        directories, files = [], []
+        pages = self.client.get_paginator('list_objects_v2').paginate(
+            Bucket=self.bucket, Prefix=prefix, Delimiter='/')
+        for page in pages:
+            for entry in page.get('CommonPrefixes', []):
+                directories.append(entry['Prefix'][len(prefix):-1])
+            for entry in page.get('Contents', []):
+                files.append(entry['Key'][len(prefix):])
+        return directories, files
+
+    def url(self, name, expires):
+        """Return a presigned URL reading the object for `expires` s."""
+        return self.client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket, 'Key': self._key(name)},
+            ExpiresIn=expires,
+        )
+
+
+class MemoryObjectStore:
+    """In-process object store for tests."""
+
+    def __init__(self, base_url='https://objects.invalid/'):
+        self.base_url = base_url
+        self.objects = {}
+        self._lock = threading.Lock()
+
+    def put(self, name, file):
+        data = file.read()
+        with self._lock:
+            self.objects[name] = (data, datetime.now(dt_timezone.utc))
+
+    def get(self, name, file):
+        with self._lock:
+            if name not in self.objects:
+                raise FileNotFoundError(name)
+            file.write(self.objects[name][0])
+
+    def delete(self, name):
+        with self._lock:
+            self.objects.pop(name, None)
+
+    def stat(self, name):
+        with self._lock:
+            if name not in self.objects:
+                return None
+            data, modified = self.objects[name]
+        return len(data), modified
+
+    def listdir(self, path):
+        prefix = path.rstrip('/') + '/'
+        directories, files = set(), []
+        with self._lock:
+            names = list(self.objects)
+        for name in names:
+            if not name.startswith(prefix):
+                continue
+            head, sep, tail = name[len(prefix):].partition('/')
+            if sep:
+                directories.add(head)
+            else:
+                files.append(head)
+        return sorted(directories), sorted(files)
+
+    def url(self, name, expires):
+        token = signing.dumps(
+            {'name': name, 'expires': int(time.time()) + expires})
+        return f'{self.base_url}{name}?token={token}'
+
+
+def get_object_store():
+    """Return a new object store as configured in `RECIPE_IMAGE_STORE`."""
+    config = getattr(settings, 'RECIPE_IMAGE_STORE', None)
+    if not config:
+        raise ImproperlyConfigured(
+            'OffloadedStorage requires RECIPE_IMAGE_STORE.')
+    return import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+
+
+class Offloader:
+    """Upload locally written files to an object store.
+
+    Uploads run on `workers` threads (inline with 0) and are retried
+    `retries` times with exponential backoff. The local copy is removed
+    once uploaded unless `keep_local` is set; files that failed keep
+    theirs for the `offload_images` command.
+    """
+
+    def __init__(self, storage, workers, retries, retry_delay, keep_local):
+        self.storage = storage
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.keep_local = keep_local
+        self._executor = ThreadPoolExecutor(workers) if workers else None
+        self._futures = set()
+        self._lock = threading.Lock()
+
+    def submit(self, name):
+        if self._executor is None:
+            self.upload(name)
+            return
+        future = self._executor.submit(self.upload, name)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._discard)
+
+    def _discard(self, future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def upload(self, name):
+        """Upload one local file; return whether it is in the store."""
+        path = self.storage.path(name)
+        for attempt in range(self.retries + 1):
+            try:
+                with open(path, 'rb') as file:
+                    self.storage.store.put(name, file)
+                break
+            except FileNotFoundError:
+                # Deleted, or uploaded by another worker, meanwhile.
+                return False
+            except Exception:
+                if attempt == self.retries:
+                    logger.exception('Could not offload %s', name)
+                    return False
+                time.sleep(self.retry_delay * 2 ** attempt)
+
+        if not self.keep_local:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        return True
+
+    def join(self):
+        """Wait for the uploads submitted so far."""
+        with self._lock:
+            futures = list(self._futures)
+        wait(futures)
+
+
+class OffloadedStorage(FileSystemStorage):
+    """Local storage whose files move to an object store in background."""
+
+    def __init__(self, store=None, **kwargs):
+        super().__init__(**kwargs)
+        if store is not None:
+            self.store = store
+
+    @cached_property
+    def store(self):
+        return get_object_store()
+
+    @cached_property
+    def offloader(self):
+        return Offloader(
+            self,
+            getattr(settings, 'RECIPE_IMAGE_STORE_WORKERS', 4),
+            getattr(settings, 'RECIPE_IMAGE_STORE_RETRIES', 3),
+            getattr(settings, 'RECIPE_IMAGE_STORE_RETRY_DELAY', 1.0),
+            getattr(settings, 'RECIPE_IMAGE_STORE_KEEP_LOCAL', False),
+        )
+
+    def join(self):
+        """Wait for the uploads started by this process, if any."""
+        if 'offloader' in self.__dict__:
+            self.offloader.join()
+
+    def get_redirect_url(self, name):
+        """Return a presigned object store URL for `name`.
+
+        Used by the media view for files without a local copy.
+        """
+        return self.store.url(
+            name, getattr(settings, 'RECIPE_IMAGE_STORE_URL_EXPIRY', 3600))
+
+    def _open(self, name, mode='rb'):
+        if os.path.exists(self.path(name)):
+            return super()._open(name, mode)
+        file = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+        self.store.get(name, file)
+        file.seek(0)
+        return File(file, name)
+
+    def _save(self, name, content):
+        name = super()._save(name, content)
+        self.offloader.submit(name)
+        return name
+
+    def delete(self, name):
+        super().delete(name)
+        self.store.delete(name)
+
+    def exists(self, name):
+        return super().exists(name) or self.store.stat(name) is not None
+
+    def listdir(self, path):
+        try:
+            directories, files = super().listdir(path)
+        except FileNotFoundError:
+            directories, files = [], []
+        remote_directories, remote_files = self.store.listdir(path)
+        return (
+            sorted(set(directories) | set(remote_directories)),
+            sorted(set(files) | set(remote_files)),
+        )
+
+    def _stat(self, name):
+        stat = self.store.stat(name)
+        if stat is None:
+            raise FileNotFoundError(name)
+        return stat
+
+    def size(self, name):
+        if os.path.exists(self.path(name)):
+            return super().size(name)
+        return self._stat(name)[0]
+
+    def get_modified_time(self, name):
+        if os.path.exists(self.path(name)):
+            return super().get_modified_time(name)
+        return self._stat(name)[1]
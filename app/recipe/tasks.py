@@ -0,0 +1,23 @@
+"""
+Background tasks for Recipe APIs
+"""
+from django.conf import settings
+
+from core.tasks import task
+from recipe import images
+
+
+@task(name='recipe.render_image_variants')
+def render_image_variants(recipe_id, image_name):
+    """Render and record the variants of a recipe image."""
+    variants = images.render_variants(
+        image_name, images.get_variant_sizes(), images.get_quality())
+    images.save_variants(recipe_id, image_name, variants)
+
+
+@task(name='recipe.collect_image_garbage', priority=-1, max_attempts=1)
+def collect_image_garbage(grace=None):
+    """Delete recipe images no recipe has used for `grace` seconds."""
+    if grace is None:
+        grace = settings.RECIPE_IMAGE_GC_GRACE
+    images.collect_garbage(grace)
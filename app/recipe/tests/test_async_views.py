@@ -0,0 +1,87 @@
+"""
+Tests for the async recipe views.
+"""
+from decimal import Decimal
+from urllib.parse import urlencode
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import AsyncClient, TransactionTestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+
+class AsyncRecipeViewTests(TransactionTestCase):
+    """Test the async views match the sync API.
+
+    Async views query from worker threads, so the data must be
+    committed for them to see it.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'password123')
+        token = Token.objects.create(user=self.user)
+        self.async_client = AsyncClient()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.headers = {'authorization': f'Token {token.key}'}
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Dal',
+            time_minutes=20,
+            price=Decimal('3.00'),
+        )
+        self.recipe.tags.add(tag)
+
+    def _get(self, url, **params):
+        if params:
+            url = f'{url}?{urlencode(params)}'
+        return self._fetch(url, **self.headers)
+
+    @async_to_sync
+    async def _fetch(self, url, **headers):
+        return await self.async_client.get(url, **headers)
+
+    def test_auth_required(self):
+        """Test async views authenticate like the sync ones."""
+        res = self._fetch(reverse('recipe-async:recipe-list'))
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_responses_match_sync_api(self):
+        """Test list and detail bodies equal the sync responses."""
+        pairs = [
+            ('recipe-list', 'recipe:recipe-list', [], {'fields': 'id,tags'}),
+            ('recipe-detail', 'recipe:recipe-detail', [self.recipe.id], {}),
+            ('tag-list', 'recipe:tag-list', [], {}),
+            ('ingredient-list', 'recipe:ingredient-list', [], {}),
+        ]
+        for async_name, sync_name, args, params in pairs:
+            res = self._get(
+                reverse(f'recipe-async:{async_name}', args=args), **params)
+            expected = self.client.get(
+                reverse(sync_name, args=args), params)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertJSONEqual(res.content, expected.json())
+
+    def test_detail_not_found(self):
+        """Test other users' recipes are not served."""
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'password123')
+        recipe = Recipe.objects.create(
+            user=other, title='Secret', time_minutes=5, price=Decimal('1'))
+
+        res = self._get(
+            reverse('recipe-async:recipe-detail', args=[recipe.id]))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
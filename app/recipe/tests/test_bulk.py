@@ -0,0 +1,254 @@
+"""
+Tests for the bulk recipe API.
+"""
+import json
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+
+BULK_URL = reverse('recipe:recipe-bulk')
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe."""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def recipe_data(**params):
+    """Return a payload creating a recipe."""
+    data = {'title': 'Curry', 'time_minutes': 30, 'price': '4.50'}
+    data.update(params)
+    return data
+
+
+class BulkRecipeApiTests(TestCase):
+    """Test bulk recipe writes."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'password123')
+        self.client.force_authenticate(self.user)
+
+    def _post(self, operations, **params):
+        url = BULK_URL
+        if params:
+            url += '?' + '&'.join(f'{k}={v}' for k, v in params.items())
+        return self.client.post(url, operations, format='json')
+
+    def test_auth_required(self):
+        """Test auth is required for bulk writes."""
+        res = APIClient().post(BULK_URL, [], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_bulk_create(self):
+        """Test creating recipes with shared tags and ingredients."""
+        Tag.objects.create(user=self.user, name='Dinner')
+        operations = [
+            {'op': 'create', 'data': recipe_data(
+                title=f'Recipe {i}',
+                tags=[{'name': 'Dinner'}, {'name': f'Tag {i % 2}'}],
+                ingredients=[{'name': 'Salt'}],
+            )}
+            for i in range(4)
+        ]
+
+        res = self._post(operations)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        results = res.data['results']
+        self.assertEqual(
+            [r['status'] for r in results], [status.HTTP_201_CREATED] * 4)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 3)
+        for i, result in enumerate(results):
+            recipe = Recipe.objects.get(pk=result['id'], user=self.user)
+            self.assertEqual(recipe.title, f'Recipe {i}')
+            self.assertEqual(
+                set(recipe.tags.values_list('name', flat=True)),
+                {'Dinner', f'Tag {i % 2}'},
+            )
+            self.assertEqual(recipe.ingredients.get().name, 'Salt')
+
+    def test_bulk_update_and_delete(self):
+        """Test updating and deleting recipes in one request."""
+        kept = Tag.objects.create(user=self.user, name='Kept')
+        dropped = Tag.objects.create(user=self.user, name='Dropped')
+        recipe = create_recipe(self.user)
+        recipe.tags.add(kept, dropped)
+        membership = Recipe.tags.through.objects.get(tag=kept)
+        doomed = create_recipe(self.user)
+        operations = [
+            {'op': 'update', 'id': recipe.id, 'data': {
+                'title': 'Renamed',
+                'tags': [{'name': 'Kept'}, {'name': 'New'}],
+            }},
+            {'op': 'delete', 'id': doomed.id},
+        ]
+
+        res = self._post(operations)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r['status'] for r in res.data['results']],
+            [status.HTTP_200_OK, status.HTTP_204_NO_CONTENT],
+        )
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Renamed')
+        self.assertEqual(recipe.price, Decimal('5.00'))
+        self.assertEqual(
+            set(recipe.tags.values_list('name', flat=True)), {'Kept', 'New'})
+        self.assertTrue(
+            Recipe.tags.through.objects.filter(pk=membership.pk).exists())
+        self.assertFalse(Recipe.objects.filter(pk=doomed.id).exists())
+
+    def test_atomic_rejects_all_on_error(self):
+        """Test one invalid operation rejects the whole request."""
+        operations = [
+            {'op': 'create', 'data': recipe_data()},
+            {'op': 'create', 'data': recipe_data(price='not a price')},
+            {'op': 'update', 'data': {}},
+        ]
+
+        res = self._post(operations)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        results = res.data['results']
+        self.assertEqual(
+            results[0]['status'], status.HTTP_424_FAILED_DEPENDENCY)
+        self.assertIn('price', results[1]['errors'])
+        self.assertIn('id', results[2]['errors'])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_best_effort_applies_valid_operations(self):
+        """Test best-effort mode applies what it can."""
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'password123')
+        foreign = create_recipe(other)
+        operations = [
+            {'op': 'create', 'data': recipe_data()},
+            {'op': 'delete', 'id': foreign.id},
+            {'op': 'create', 'data': recipe_data(title='')},
+        ]
+
+        res = self._post(operations, mode='best-effort')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r['status'] for r in res.data['results']],
+            [
+                status.HTTP_201_CREATED,
+                status.HTTP_404_NOT_FOUND,
+                status.HTTP_400_BAD_REQUEST,
+            ],
+        )
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 1)
+        self.assertTrue(Recipe.objects.filter(pk=foreign.id).exists())
+
+    def test_repeated_recipe_rejected(self):
+        """Test a recipe may only be targeted once per request."""
+        recipe = create_recipe(self.user)
+        operations = [
+            {'op': 'update', 'id': recipe.id, 'data': {'title': 'A'}},
+            {'op': 'delete', 'id': recipe.id},
+        ]
+
+        res = self._post(operations, mode='best-effort')
+
+        self.assertEqual(
+            res.data['results'][1]['status'], status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Recipe.objects.filter(pk=recipe.id).exists())
+
+    def test_ndjson_body(self):
+        """Test operations can be streamed as NDJSON."""
+        body = '\n'.join(
+            json.dumps({'op': 'create', 'data': recipe_data(title=f'R{i}')})
+            for i in range(3)
+        ) + '\n'
+
+        res = self.client.post(
+            BULK_URL, body, content_type='application/x-ndjson')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 3)
+
+    def test_invalid_ndjson(self):
+        """Test a malformed NDJSON line is rejected."""
+        res = self.client.post(
+            BULK_URL, '{"op": "create"}\n{oops\n',
+            content_type='application/x-ndjson')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_params(self):
+        """Test bad modes, batch sizes and bodies are rejected."""
+        for params, body in [
+            ({'mode': 'sometimes'}, []),
+            ({'batch_size': 0}, []),
+            ({'batch_size': 'many'}, []),
+            ({}, {'op': 'create'}),
+        ]:
+            res = self._post(body, **params)
+
+            self.assertEqual(
+                res.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_batches_written(self):
+        """Test small batches still write every operation."""
+        operations = [
+            {'op': 'create', 'data': recipe_data(
+                title=f'R{i}', tags=[{'name': f'T{i}'}])}
+            for i in range(5)
+        ]
+
+        res = self._post(operations, batch_size=2)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(Recipe.objects.filter(tags__isnull=False).count(), 5)
+
+    def test_bulk_update_queries_constant(self):
+        """Test updates do not query per recipe."""
+        Tag.objects.create(user=self.user, name='Tag')
+        counts = []
+        for size in (2, 20):
+            recipes = [create_recipe(self.user) for _ in range(size)]
+            operations = [
+                {'op': 'update', 'id': recipe.id, 'data': {
+                    'title': 'Updated', 'tags': [{'name': 'Tag'}]}}
+                for recipe in recipes
+            ]
+            with CaptureQueriesContext(connection) as ctx:
+                res = self._post(operations)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            counts.append(len(ctx.captured_queries))
+
+        self.assertEqual(counts[0], counts[1], counts)
+
+    def test_bulk_write_refreshes_reads(self):
+        """Test cached lists and search see bulk writes."""
+        self.client.get(RECIPE_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._post([{'op': 'create', 'data': recipe_data(title='Laksa')}])
+
+        res = self.client.get(RECIPE_URL, {'search': 'laksa'})
+        self.assertEqual(len(res.data['results']), 1)
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(len(res.data['results']), 1)
@@ -0,0 +1,168 @@
+"""
+Tests for the recipe API response cache.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+STATS_URL = reverse('recipe:cache-stats')
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL."""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe."""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class ResponseCacheTests(TestCase):
+    """Test GET responses are cached per user and data version."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'password123')
+        self.client.force_authenticate(self.user)
+
+    def test_second_request_served_from_cache(self):
+        """Test a repeated GET is a cache hit without queries."""
+        recipe = create_recipe(self.user)
+        first = self.client.get(detail_url(recipe.id))
+
+        with self.assertNumQueries(0):
+            second = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.content, first.content)
+
+    def test_query_string_is_part_of_key(self):
+        """Test different query strings are cached separately."""
+        create_recipe(self.user)
+        self.client.get(RECIPE_URL, {'fields': 'id', 'page_size': 5})
+
+        same = self.client.get(RECIPE_URL, {'page_size': 5, 'fields': 'id'})
+        other = self.client.get(RECIPE_URL, {'fields': 'title'})
+
+        self.assertEqual(same['X-Cache'], 'HIT')
+        self.assertEqual(other['X-Cache'], 'MISS')
+
+    def test_cache_is_per_user(self):
+        """Test users never see each other's cached responses."""
+        create_recipe(self.user)
+        self.client.get(RECIPE_URL)
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'password123')
+        self.client.force_authenticate(other)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.json()['results'], [])
+
+    def test_recipe_change_invalidates(self):
+        """Test saving a recipe invalidates cached responses."""
+        recipe = create_recipe(self.user)
+        self.client.get(RECIPE_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.title = 'Changed'
+            recipe.save()
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.json()['results'][0]['title'], 'Changed')
+
+    def test_tag_membership_change_invalidates(self):
+        """Test adding a tag to a recipe invalidates cached responses."""
+        recipe = create_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(RECIPE_URL)
+        self.client.get(TAGS_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.tags.add(tag)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.json()['results'][0]['tags'][0]['name'], 'Vegan')
+
+    def test_invalidated_on_commit(self):
+        """Test responses read before a write commits are not kept."""
+        recipe = create_recipe(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.title = 'Changed'
+            recipe.save()
+            # Served while the write is still uncommitted.
+            self.client.get(detail_url(recipe.id))
+
+        res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+
+    def test_tag_delete_invalidates(self):
+        """Test deleting a tag invalidates cached tag lists."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(TAGS_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.delete()
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.json()['results'], [])
+
+    def test_other_user_change_keeps_cache(self):
+        """Test another user's writes leave this user's cache intact."""
+        create_recipe(self.user)
+        self.client.get(RECIPE_URL)
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'password123')
+        create_recipe(other)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res['X-Cache'], 'HIT')
+
+    def test_cache_stats_requires_staff(self):
+        """Test only staff can read the cache counters."""
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_cache_stats(self):
+        """Test the hit and miss counters are reported."""
+        self.client.get(RECIPE_URL)
+        self.client.get(RECIPE_URL)
+        admin = get_user_model().objects.create_superuser(
+            'admin@example.com', 'password123')
+        self.client.force_authenticate(admin)
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['hits'], 1)
+        self.assertEqual(res.data['misses'], 1)
+        self.assertEqual(res.data['hit_ratio'], 0.5)
@@ -0,0 +1,182 @@
+"""
+Tests for conditional GET support in the recipe APIs.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL."""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe."""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+@override_settings(RECIPE_RESPONSE_CACHE=False)
+class ConditionalGetTests(TestCase):
+    """Test ETag and Last-Modified handling."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'password123')
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(self.user)
+
+    def test_detail_not_modified(self):
+        """Test a matching If-None-Match gets 304 after one query."""
+        res = self.client.get(detail_url(self.recipe.id))
+        self.assertIn('ETag', res)
+        self.assertIn('Last-Modified', res)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(
+                detail_url(self.recipe.id), HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+
+    def test_detail_if_modified_since(self):
+        """Test If-Modified-Since at Last-Modified gets 304."""
+        res = self.client.get(detail_url(self.recipe.id))
+
+        res = self.client.get(
+            detail_url(self.recipe.id),
+            HTTP_IF_MODIFIED_SINCE=res['Last-Modified'],
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_modified_after_update(self):
+        """Test the ETag changes when the recipe changes."""
+        etag = self.client.get(detail_url(self.recipe.id))['ETag']
+        self.recipe.title = 'Changed'
+        self.recipe.save()
+
+        res = self.client.get(
+            detail_url(self.recipe.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_detail_modified_after_tag_rename(self):
+        """Test renaming a recipe's tag changes the recipe ETag."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe.tags.add(tag)
+        etag = self.client.get(detail_url(self.recipe.id))['ETag']
+        tag.name = 'Vegetarian'
+        tag.save()
+
+        res = self.client.get(
+            detail_url(self.recipe.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_etag_depends_on_query_string(self):
+        """Test sparse representations have their own ETag."""
+        etag = self.client.get(detail_url(self.recipe.id))['ETag']
+
+        res = self.client.get(
+            detail_url(self.recipe.id),
+            {'fields': 'id'},
+            HTTP_IF_NONE_MATCH=etag,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_list_not_modified(self):
+        """Test a matching list ETag gets 304 after one query."""
+        etag = self.client.get(RECIPE_URL)['ETag']
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_etag_per_user(self):
+        """Test another user's list ETag never gets a 304."""
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'password123')
+        other_client = APIClient()
+        other_client.force_authenticate(other)
+        get_user_model().objects.update(recipes_updated_at=None)
+
+        res = self.client.get(RECIPE_URL)
+        other_res = other_client.get(RECIPE_URL)
+        stale = other_client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(other_res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], other_res['ETag'])
+        self.assertEqual(stale.status_code, status.HTTP_200_OK)
+        self.assertEqual(stale.data['results'], [])
+
+    def test_list_modified_after_delete(self):
+        """Test deleting a recipe changes the list validators."""
+        res = self.client.get(RECIPE_URL)
+        create_recipe(self.user).delete()
+
+        etag_res = self.client.get(
+            RECIPE_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(etag_res.status_code, status.HTTP_200_OK)
+
+    def test_tag_list_modified_after_new_tag(self):
+        """Test the tag list ETag changes when a tag is added."""
+        etag = self.client.get(TAGS_URL)['ETag']
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_missing_recipe_has_no_etag(self):
+        """Test a missing recipe is still a 404."""
+        res = self.client.get(detail_url(self.recipe.id + 1))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn('ETag', res)
+
+
+class CachedConditionalGetTests(TestCase):
+    """Test conditional GETs answered from the response cache."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'password123')
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(self.user)
+
+    def test_cached_not_modified_without_queries(self):
+        """Test a cached response answers 304 without touching the DB."""
+        etag = self.client.get(detail_url(self.recipe.id))['ETag']
+
+        with self.assertNumQueries(0):
+            res = self.client.get(
+                detail_url(self.recipe.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
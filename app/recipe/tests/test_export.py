@@ -0,0 +1,151 @@
+"""
+Tests for the streaming recipe export.
+"""
+import csv
+import io
+import json
+import tracemalloc
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from recipe.serializers import RecipeDetailSerializer
+
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe."""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def seed_recipes(user, count):
+    """Create `count` recipes each having one tag."""
+    tag = Tag.objects.create(user=user, name=f'Tag {count}')
+    Recipe.objects.bulk_create(
+        Recipe(
+            user=user,
+            title=f'Recipe {i}',
+            description='Some description ' * 5,
+            time_minutes=10,
+            price=Decimal('5.00'),
+        )
+        for i in range(count)
+    )
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe_id, tag_id=tag.id)
+        for recipe_id in Recipe.objects.filter(
+            user=user).values_list('id', flat=True)
+    )
+
+
+def consume(response):
+    """Read a streaming response without keeping its content."""
+    size = 0
+    for chunk in response.streaming_content:
+        size += len(chunk)
+
+    return size
+
+
+class RecipeExportTests(TestCase):
+    """Test exporting recipes."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'password123')
+        self.client.force_authenticate(self.user)
+
+    def _export(self, **params):
+        res = self.client.get(EXPORT_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return b''.join(res.streaming_content).decode(), res
+
+    def test_auth_required(self):
+        """Test auth is required to export."""
+        res = APIClient().get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_export_ndjson(self):
+        """Test each line holds a recipe's detail representation."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        r1 = create_recipe(self.user, title='Dal', description='Lentils')
+        r1.tags.add(tag)
+        r2 = create_recipe(self.user, title='Rice')
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'password123')
+        create_recipe(other)
+
+        content, res = self._export()
+
+        self.assertTrue(res['Content-Type'].startswith('application/x-ndjson'))
+        self.assertIn('recipes.ndjson', res['Content-Disposition'])
+        expected = RecipeDetailSerializer([r2, r1], many=True).data
+        self.assertEqual(
+            [json.loads(line) for line in content.splitlines()],
+            json.loads(json.dumps(expected)),
+        )
+
+    def test_export_csv(self):
+        """Test CSV exports a header and joined tag names."""
+        recipe = create_recipe(self.user, title='Dal')
+        recipe.tags.add(
+            Tag.objects.create(user=self.user, name='Vegan'),
+            Tag.objects.create(user=self.user, name='Quick'),
+        )
+
+        content, res = self._export(format='csv')
+
+        self.assertTrue(res['Content-Type'].startswith('text/csv'))
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['title'], 'Dal')
+        self.assertEqual(rows[0]['price'], '5.00')
+        self.assertEqual(rows[0]['tags'], 'Vegan;Quick')
+
+    def test_export_filtered_sparse(self):
+        """Test filters and sparse fields apply to the export."""
+        create_recipe(self.user, title='Cheap', price=Decimal('1.00'))
+        create_recipe(self.user, title='Dear', price=Decimal('9.00'))
+
+        content, res = self._export(price__lte='5', fields='id,title')
+
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([set(row) for row in rows], [{'id', 'title'}])
+        self.assertEqual(rows[0]['title'], 'Cheap')
+
+    @override_settings(RECIPE_EXPORT_CHUNK_SIZE=50)
+    def test_export_memory_flat(self):
+        """Test peak memory does not grow with the catalog size."""
+        peaks = []
+        for count in (200, 2000):
+            user = get_user_model().objects.create_user(
+                f'user{count}@example.com', 'password123')
+            seed_recipes(user, count)
+            self.client.force_authenticate(user)
+
+            tracemalloc.start()
+            try:
+                res = self.client.get(EXPORT_URL)
+                size = consume(res)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+            self.assertGreater(size, count * 100)
+
+        self.assertLess(peaks[1], peaks[0] * 1.5, peaks)
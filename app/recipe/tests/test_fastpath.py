@@ -0,0 +1,95 @@
+"""
+Tests for the read-only recipe serialization fast path.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL."""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+@override_settings(RECIPE_RESPONSE_CACHE=False)
+class FastPathTests(TestCase):
+    """Test the fast path renders the same JSON as the serializers."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'password123')
+        self.client.force_authenticate(self.user)
+
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        dinner = Tag.objects.create(user=self.user, name='Dinner')
+        kale = Ingredient.objects.create(user=self.user, name='Kale')
+        for i in range(3):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe {i}',
+                description=f'Description {i}',
+                time_minutes=10 + i,
+                price=Decimal('4.5'),
+                link='' if i else 'http://example.com/recipe.pdf',
+            )
+            recipe.tags.add(dinner, vegan)
+            if i:
+                recipe.ingredients.add(kale)
+        self.recipe = recipe
+
+    def _assert_same_content(self, url, params=None):
+        with override_settings(RECIPE_FAST_SERIALIZATION=True):
+            fast = self.client.get(url, params)
+        with override_settings(RECIPE_FAST_SERIALIZATION=False):
+            slow = self.client.get(url, params)
+
+        self.assertEqual(fast.status_code, slow.status_code)
+        self.assertEqual(fast.content, slow.content)
+        return fast
+
+    def test_list_matches_serializer(self):
+        """Test the recipe list is byte-identical."""
+        res = self._assert_same_content(RECIPE_URL)
+
+        self.assertEqual(len(res.data['results']), 3)
+        self.assertEqual(res.data['results'][0]['price'], '4.50')
+
+    def test_list_page_matches_serializer(self):
+        """Test later pages are byte-identical."""
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+
+        self._assert_same_content(res.data['next'])
+
+    def test_detail_matches_serializer(self):
+        """Test the recipe detail is byte-identical."""
+        res = self._assert_same_content(detail_url(self.recipe.id))
+
+        self.assertIn('description', res.data)
+
+    def test_sparse_fields_match_serializer(self):
+        """Test sparse fieldsets are byte-identical."""
+        self._assert_same_content(RECIPE_URL, {'fields': 'title,tags'})
+        self._assert_same_content(
+            detail_url(self.recipe.id), {'omit': 'ingredients,price'})
+
+    def test_detail_not_found(self):
+        """Test missing and other users' recipes are not found."""
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'password123')
+        recipe = Recipe.objects.create(
+            user=other, title='Other', time_minutes=5, price=Decimal('1'))
+
+        for url in [detail_url(recipe.id), detail_url('abc')]:
+            res = self._assert_same_content(url)
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,433 @@
+"""
+Tests for recipe image variants.
+"""
+import hashlib
+import io
+import posixpath
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import server
+from core.models import ImageBlob, Recipe, Task, get_content_hash
+from recipe import images
+from recipe.uploads import SizeLimitedUploadHandler
+
+RECIPES_URL = reverse('recipe:recipe-list')
+SIZES = {'thumbnail': 50, 'small': 120}
+
+
+def image_upload_url(recipe_id):
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def make_jpeg(size=(400, 200), orientation=None, color='red'):
+    """Return JPEG bytes, optionally with an EXIF orientation."""
+    exif = Image.Exif()
+    if orientation is not None:
+        exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, format='JPEG', exif=exif)
+    return buffer.getvalue()
+
+
+def create_recipe(user, image=None):
+    recipe = Recipe.objects.create(
+        user=user, title='Soup', time_minutes=10, price=Decimal('2.50'))
+    if image is not None:
+        recipe.image.save('photo.jpg', ContentFile(image))
+    return recipe
+
+
+class MediaRootMixin:
+    """Store uploads in a temporary MEDIA_ROOT."""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'password123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+@override_settings(
+    RECIPE_IMAGE_VARIANTS=SIZES, RECIPE_IMAGE_VARIANTS_INLINE=True)
+class ImageVariantTests(MediaRootMixin, TestCase):
+    """Test rendering and exposing image variants."""
+
+    def _open_variant(self, name):
+        with images.get_storage().open(name) as file:
+            image = Image.open(file)
+            image.load()
+        return image
+
+    def test_upload_renders_variants(self):
+        """Test uploading an image renders every variant and format."""
+        recipe = create_recipe(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(
+                image_upload_url(recipe.id),
+                {'image': ContentFile(make_jpeg(), name='photo.jpg')},
+                format='multipart',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['image_variants'], {})
+        recipe.refresh_from_db()
+        self.assertEqual(set(recipe.image_variants), set(SIZES))
+        for variant, size in SIZES.items():
+            formats = recipe.image_variants[variant]
+            self.assertEqual(set(formats), {'jpeg', 'webp'})
+            for ext, name in formats.items():
+                image = self._open_variant(name)
+                self.assertEqual(image.format, images.FORMATS[ext])
+                self.assertEqual(max(image.size), size)
+
+    def test_variants_are_upright_without_exif(self):
+        """Test variants apply the EXIF orientation and drop the EXIF."""
+        recipe = create_recipe(self.user, make_jpeg(orientation=6))
+
+        variants = images.render_variants(recipe.image.name, SIZES, 80)
+
+        for formats in variants.values():
+            for name in formats.values():
+                image = self._open_variant(name)
+                self.assertLess(image.width, image.height)
+                self.assertEqual(len(image.getexif()), 0)
+
+    @patch('recipe.uploads.features.check', return_value=False)
+    @patch('recipe.images.features.check', return_value=False)
+    def test_webp_skipped_without_codec(self, *mocks):
+        """Test WebP is neither rendered nor accepted without a codec."""
+        recipe = create_recipe(self.user, make_jpeg())
+
+        variants = images.render_variants(recipe.image.name, SIZES, 80)
+
+        for formats in variants.values():
+            self.assertEqual(set(formats), {'jpeg'})
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (20, 20)).save(buffer, format='WEBP')
+        res = self.client.post(
+            image_upload_url(recipe.id),
+            {'image': ContentFile(buffer.getvalue(), name='photo.webp')},
+            format='multipart',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_variant_urls_in_responses(self):
+        """Test recipe lists and details expose absolute variant URLs."""
+        recipe = create_recipe(self.user, make_jpeg())
+        variants = images.render_variants(recipe.image.name, SIZES, 80)
+        images.save_variants(recipe.id, recipe.image.name, variants)
+        url = 'http://testserver' + images.get_storage().url(
+            variants['thumbnail']['webp'])
+
+        for path in (RECIPES_URL, detail_url(recipe.id)):
+            res = self.client.get(path)
+            data = res.data['results'][0] if path == RECIPES_URL else res.data
+            self.assertEqual(data['image_variants']['thumbnail']['webp'], url)
+
+    def test_new_image_replaces_variants(self):
+        """Test replacing an image replaces its variants."""
+        recipe = create_recipe(self.user, make_jpeg())
+        variants = images.render_variants(recipe.image.name, SIZES, 80)
+        images.save_variants(recipe.id, recipe.image.name, variants)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                image_upload_url(recipe.id),
+                {'image': ContentFile(
+                    make_jpeg(color='blue'), name='new.jpg')},
+                format='multipart',
+            )
+
+        recipe.refresh_from_db()
+        self.assertEqual(set(recipe.image_variants), set(SIZES))
+        self.assertNotEqual(recipe.image_variants, variants)
+
+    def test_stale_variants_discarded(self):
+        """Test variants of a replaced image are not recorded."""
+        recipe = create_recipe(self.user, make_jpeg())
+        old = recipe.image.name
+        variants = images.render_variants(old, SIZES, 80)
+        recipe.image.save('new.jpg', ContentFile(make_jpeg(color='blue')))
+
+        images.save_variants(recipe.id, old, variants)
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_variants, {})
+
+    def test_variants_shared_by_identical_images(self):
+        """Test recipes with the same image reuse rendered variants."""
+        first = create_recipe(self.user, make_jpeg())
+        second = create_recipe(self.user, make_jpeg())
+        variants = images.render_variants(first.image.name, SIZES, 80)
+
+        with patch('recipe.images.Image.open') as open_image:
+            reused = images.render_variants(second.image.name, SIZES, 80)
+
+        open_image.assert_not_called()
+        self.assertEqual(reused, variants)
+
+    def test_backfill_command(self):
+        """Test the backfill renders only images missing variants."""
+        pending = create_recipe(self.user, make_jpeg())
+        done = create_recipe(self.user, make_jpeg())
+        Recipe.objects.filter(pk=done.pk).update(
+            image_variants={'thumbnail': {'jpeg': 'kept.jpg'}})
+        create_recipe(self.user)
+
+        call_command(
+            'backfill_image_variants', workers=0, stdout=io.StringIO())
+
+        pending.refresh_from_db()
+        done.refresh_from_db()
+        self.assertEqual(set(pending.image_variants), set(SIZES))
+        self.assertEqual(
+            done.image_variants, {'thumbnail': {'jpeg': 'kept.jpg'}})
+
+
+class ImageStorageTests(MediaRootMixin, TestCase):
+    """Test storing recipe images by content."""
+
+    def _upload(self, recipe, content, name='photo.JPG'):
+        return self.client.post(
+            image_upload_url(recipe.id),
+            {'image': ContentFile(content, name=name)},
+            format='multipart',
+        )
+
+    def test_upload_named_by_content_hash(self):
+        """Test uploads are stored under the SHA-256 of their content."""
+        recipe = create_recipe(self.user)
+        content = make_jpeg()
+
+        res = self._upload(recipe, content)
+
+        recipe.refresh_from_db()
+        digest = hashlib.sha256(content).hexdigest()
+        self.assertEqual(
+            recipe.image.name, f'uploads/recipe/{digest[:2]}/{digest}.jpg')
+        self.assertTrue(res.data['image'].endswith(f'{digest}.jpg'))
+
+    def test_upload_hashed_while_streaming(self):
+        """Test the upload handler hashes files as they are received."""
+        content = make_jpeg()
+        handler = SizeLimitedUploadHandler(max_size=len(content))
+        handler.new_file('image', 'photo.jpg', 'image/jpeg', len(content))
+        for start in range(0, len(content), 1000):
+            handler.receive_data_chunk(content[start:start + 1000], start)
+
+        file = handler.file_complete(len(content))
+
+        self.assertEqual(file.sha256, hashlib.sha256(content).hexdigest())
+        self.assertEqual(get_content_hash(file), file.sha256)
+        file.close()
+
+    def test_identical_uploads_stored_once(self):
+        """Test recipes with the same image share one counted file."""
+        first = create_recipe(self.user)
+        second = create_recipe(self.user)
+        content = make_jpeg()
+
+        self._upload(first, content)
+        self._upload(second, content)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.image.name, second.image.name)
+        directory = posixpath.dirname(first.image.name)
+        self.assertEqual(len(images.get_storage().listdir(directory)[1]), 1)
+        blob = ImageBlob.objects.get(name=first.image.name)
+        self.assertEqual(blob.refcount, 2)
+
+    def test_extension_follows_detected_format(self):
+        """Test the stored extension ignores the uploaded name's."""
+        first = create_recipe(self.user)
+        second = create_recipe(self.user)
+        content = make_jpeg()
+
+        self._upload(first, content, name='photo.png')
+        self._upload(second, content, name='photo.html')
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        digest = hashlib.sha256(content).hexdigest()
+        self.assertEqual(
+            first.image.name, f'uploads/recipe/{digest[:2]}/{digest}.jpg')
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertEqual(ImageBlob.objects.get().refcount, 2)
+
+    def test_garbage_collects_unreferenced_images(self):
+        """Test images are deleted once no recipe uses them."""
+        first = create_recipe(self.user, make_jpeg())
+        second = create_recipe(self.user, make_jpeg())
+        name = first.image.name
+        variants = images.render_variants(name, SIZES, 80)
+        storage = images.get_storage()
+
+        self._upload(first, make_jpeg(color='blue'))
+        self.assertEqual(images.collect_garbage(0), 0)
+        second.delete()
+        self.assertEqual(images.collect_garbage(3600), 0)
+        self.assertTrue(storage.exists(name))
+
+        self.assertEqual(images.collect_garbage(0), 1)
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(ImageBlob.objects.filter(name=name).exists())
+        for variant in images.get_variant_names(variants):
+            self.assertFalse(storage.exists(variant))
+
+    def test_reupload_after_collection(self):
+        """Test content uploaded again after collection is stored again."""
+        recipe = create_recipe(self.user, make_jpeg())
+        name = recipe.image.name
+        recipe.delete()
+        images.collect_garbage(0)
+
+        create_recipe(self.user, make_jpeg())
+
+        self.assertTrue(images.get_storage().exists(name))
+        self.assertEqual(ImageBlob.objects.get(name=name).refcount, 1)
+
+    def test_collects_orphaned_files(self):
+        """Test the orphan sweep deletes only files nothing refers to."""
+        recipe = create_recipe(self.user, make_jpeg())
+        storage = images.get_storage()
+        orphan = storage.save(
+            'uploads/recipe/ff/orphan.jpg', ContentFile(b'x'))
+
+        self.assertEqual(images.collect_orphans(3600), 0)
+        call_command(
+            'collect_image_garbage', grace=0, orphans=True,
+            stdout=io.StringIO())
+
+        self.assertFalse(storage.exists(orphan))
+        self.assertTrue(storage.exists(recipe.image.name))
+
+
+@override_settings(RECIPE_IMAGE_VARIANTS=SIZES)
+class VariantPipelineTests(MediaRootMixin, TransactionTestCase):
+    """Test scheduling variants on the worker pool."""
+
+    def _pipeline(self, queue_size=4, retries=0):
+        pipeline = images.VariantPipeline(1, queue_size, retries, 0)
+        pipeline._executor.shutdown()
+        pipeline._executor = ThreadPoolExecutor(1)
+        self.addCleanup(pipeline.shutdown)
+        return pipeline
+
+    def test_retries_failed_renders(self):
+        """Test a failing render is retried before being recorded."""
+        recipe = create_recipe(self.user, make_jpeg())
+        pipeline = self._pipeline(retries=2)
+        render = images.render_variants
+        calls = []
+
+        def flaky(*args):
+            calls.append(args)
+            if len(calls) < 3:
+                raise OSError('storage unavailable')
+            return render(*args)
+
+        with patch('recipe.images.render_variants', flaky):
+            self.assertTrue(pipeline.submit(recipe.id, recipe.image.name))
+            pipeline.join()
+
+        recipe.refresh_from_db()
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(set(recipe.image_variants), set(SIZES))
+
+    def test_refuses_work_when_full(self):
+        """Test submissions past the queue size go to the task queue."""
+        recipe = create_recipe(self.user, make_jpeg())
+        pipeline = self._pipeline(queue_size=0)
+        release = threading.Event()
+
+        def blocked(*args):
+            release.wait(5)
+            return {}
+
+        with patch('recipe.images.render_variants', blocked):
+            self.assertTrue(pipeline.submit(recipe.id, recipe.image.name))
+            with self.assertLogs('recipe.images', 'WARNING'):
+                self.assertFalse(
+                    pipeline.submit(recipe.id, recipe.image.name))
+            task = Task.objects.get()
+            self.assertEqual(task.name, 'recipe.render_image_variants')
+            self.assertEqual(task.kwargs, {
+                'recipe_id': recipe.id, 'image_name': recipe.image.name})
+            release.set()
+            pipeline.join()
+
+        self.assertTrue(pipeline.submit(recipe.id, recipe.image.name))
+        pipeline.join()
+
+    def test_drained_before_worker_exits(self):
+        """Test a served worker finishes its variants before exiting."""
+        recipe = create_recipe(self.user, make_jpeg())
+        pipeline = self._pipeline()
+        render = images.render_variants
+
+        def slow(*args):
+            time.sleep(0.2)
+            return render(*args)
+
+        with patch('recipe.images.render_variants', slow), \
+                patch('recipe.images._pipeline', pipeline):
+            self.assertTrue(pipeline.submit(recipe.id, recipe.image.name))
+            server.drain()
+            self.assertIsNone(images._pipeline)
+
+        recipe.refresh_from_db()
+        self.assertEqual(set(recipe.image_variants), set(SIZES))
+
+
+@override_settings(RECIPE_IMAGE_VARIANTS=SIZES)
+class VariantProcessTests(TransactionTestCase):
+    """Test rendering variants on worker processes.
+
+    The workers read the project settings, so the image is stored in the
+    configured MEDIA_ROOT.
+    """
+
+    def test_renders_on_worker_processes(self):
+        """Test variants rendered by a worker process are recorded."""
+        user = get_user_model().objects.create_user(
+            'user@example.com', 'password123')
+        recipe = create_recipe(user, make_jpeg())
+        self.addCleanup(images.collect_garbage, 0)
+        self.addCleanup(recipe.image.delete, save=False)
+        pipeline = images.VariantPipeline(1, 0, 0, 0)
+
+        self.assertTrue(pipeline.submit(recipe.id, recipe.image.name))
+        pipeline.shutdown()
+
+        recipe.refresh_from_db()
+        self.assertEqual(set(recipe.image_variants), set(SIZES))
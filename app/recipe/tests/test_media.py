@@ -0,0 +1,159 @@
+"""
+Tests for serving recipe images.
+"""
+import os
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+
+from recipe.media import parse_range
+
+CONTENT = bytes(range(256)) * 4
+NAME = 'uploads/recipe/ab/abcdef.jpg'
+
+
+def media_url(name=NAME):
+    return reverse('media', args=[name])
+
+
+class ParseRangeTests(TestCase):
+    """Test parsing Range headers."""
+
+    def test_ranges(self):
+        """Test satisfiable, ignored and unsatisfiable ranges."""
+        cases = [
+            ('bytes=0-9', (0, 9)),
+            ('bytes=10-', (10, 99)),
+            ('bytes=-10', (90, 99)),
+            ('bytes=-500', (0, 99)),
+            ('bytes=90-500', (90, 99)),
+            ('bytes=9-2', None),
+            ('bytes=0-1,5-6', None),
+            ('items=0-1', None),
+            ('', None),
+        ]
+        for header, expected in cases:
+            with self.subTest(header=header):
+                self.assertEqual(parse_range(header, 100), expected)
+
+        for header in ('bytes=100-', 'bytes=-0'):
+            with self.subTest(header=header):
+                with self.assertRaises(ValueError):
+                    parse_range(header, 100)
+
+
+class ServeImageTests(TestCase):
+    """Test the recipe image view."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        default_storage.save(NAME, ContentFile(CONTENT))
+        self.stat = os.stat(default_storage.path(NAME))
+
+    def test_serve_image(self):
+        """Test images are served with long-lived cache headers."""
+        res = self.client.get(media_url())
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), CONTENT)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res['X-Content-Type-Options'], 'nosniff')
+        self.assertEqual(res['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', res['Cache-Control'])
+        self.assertIn('max-age=31536000', res['Cache-Control'])
+        self.assertEqual(
+            res['ETag'],
+            f'"{self.stat.st_mtime_ns:x}-{self.stat.st_size:x}"',
+        )
+
+    def test_not_modified(self):
+        """Test matching validators are answered with 304."""
+        etag = self.client.get(media_url())['ETag']
+
+        by_etag = self.client.get(media_url(), HTTP_IF_NONE_MATCH=etag)
+        by_date = self.client.get(
+            media_url(),
+            HTTP_IF_MODIFIED_SINCE=http_date(self.stat.st_mtime + 1),
+        )
+
+        self.assertEqual(by_etag.status_code, 304)
+        self.assertEqual(by_date.status_code, 304)
+        self.assertIn('immutable', by_etag['Cache-Control'])
+
+    def test_range_request(self):
+        """Test a byte range is served as partial content."""
+        res = self.client.get(media_url(), HTTP_RANGE='bytes=10-19')
+
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(b''.join(res.streaming_content), CONTENT[10:20])
+        self.assertEqual(res['Content-Length'], '10')
+        self.assertEqual(
+            res['Content-Range'], f'bytes 10-19/{len(CONTENT)}')
+
+    def test_range_not_satisfiable(self):
+        """Test ranges past the end of the file are refused."""
+        res = self.client.get(media_url(), HTTP_RANGE='bytes=5000-')
+
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res['Content-Range'], f'bytes */{len(CONTENT)}')
+
+    def test_if_range_mismatch_sends_whole_file(self):
+        """Test a stale If-Range gets the whole, current file."""
+        res = self.client.get(
+            media_url(), HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), CONTENT)
+
+    @override_settings(RECIPE_MEDIA_SENDFILE='x-accel-redirect')
+    def test_x_accel_redirect(self):
+        """Test nginx is told which internal location to send."""
+        res = self.client.get(media_url(), HTTP_RANGE='bytes=0-9')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.content, b'')
+        self.assertEqual(res['X-Accel-Redirect'], f'/protected-media/{NAME}')
+        self.assertIn('ETag', res)
+
+    @override_settings(RECIPE_MEDIA_SENDFILE='x-sendfile')
+    def test_x_sendfile(self):
+        """Test the front-end server is given the file path."""
+        res = self.client.get(media_url())
+
+        self.assertEqual(res.content, b'')
+        self.assertEqual(res['X-Sendfile'], default_storage.path(NAME))
+
+    def test_only_recipe_images_served(self):
+        """Test missing files and paths outside the images 404."""
+        default_storage.save('private.txt', ContentFile(b'secret'))
+
+        for name in ('uploads/recipe/ab/missing.jpg', 'private.txt',
+                     'uploads/recipe/../../private.txt', 'uploads/recipe/ab'):
+            with self.subTest(name=name):
+                res = self.client.get(media_url(name))
+                self.assertEqual(res.status_code, 404)
+
+    def test_only_image_extensions_served(self):
+        """Test stored files without an image extension 404."""
+        for name in ('uploads/recipe/ab/evil.html', 'uploads/recipe/ab/x.svg',
+                     'uploads/recipe/ab/noext'):
+            default_storage.save(name, ContentFile(CONTENT + b'<script>'))
+            with self.subTest(name=name):
+                res = self.client.get(media_url(name))
+                self.assertEqual(res.status_code, 404)
+
+    def test_post_not_allowed(self):
+        """Test images are read only."""
+        res = self.client.post(media_url())
+
+        self.assertEqual(res.status_code, 405)
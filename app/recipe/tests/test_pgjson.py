@@ -0,0 +1,95 @@
+"""
+Tests for database-side JSON assembly of recipe lists.
+"""
+import json
+import unittest
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe import pgjson
+from recipe.serializers import RecipeSerializer
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+@override_settings(RECIPE_RESPONSE_CACHE=False)
+class DatabaseJSONTests(TestCase):
+    """Test recipe lists assembled by the database."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'password123')
+        self.client.force_authenticate(self.user)
+
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        spicy = Tag.objects.create(user=self.user, name='Spicy "hot"')
+        chili = Ingredient.objects.create(user=self.user, name='Chili')
+        for i in range(3):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe {i} é',
+                time_minutes=10 + i,
+                price=Decimal('4.5'),
+                link='http://example.com/recipe.pdf' if i else '',
+            )
+            recipe.tags.add(spicy, vegan)
+            if i:
+                recipe.ingredients.add(chili)
+
+    def _serializer_data(self, recipes):
+        """Return the serializer output round-tripped through JSON."""
+        data = RecipeSerializer(recipes, many=True).data
+        return json.loads(JSONRenderer().render(data))
+
+    @unittest.skipUnless(pgjson.is_supported(), 'requires PostgreSQL')
+    def test_render_matches_serializer(self):
+        """Test the database JSON equals RecipeSerializer output."""
+        recipes = Recipe.objects.order_by('-id')
+        ids = [recipe.id for recipe in recipes]
+
+        results = pgjson.render(ids, RecipeSerializer())
+
+        self.assertEqual(json.loads(results), self._serializer_data(recipes))
+
+    @unittest.skipUnless(pgjson.is_supported(), 'requires PostgreSQL')
+    def test_render_sparse_fields_and_empty_page(self):
+        """Test sparse fields and empty pages render as the serializer."""
+        recipes = Recipe.objects.order_by('id')
+        serializer = RecipeSerializer(fields=['title', 'price', 'tags'])
+
+        results = pgjson.render([r.id for r in recipes], serializer)
+
+        expected = [
+            {'title': r['title'], 'price': r['price'], 'tags': r['tags']}
+            for r in self._serializer_data(recipes)
+        ]
+        self.assertEqual(json.loads(results), expected)
+        self.assertEqual(json.loads(pgjson.render([], serializer)), [])
+
+    def test_list_matches_serializer(self):
+        """Test the recipe list is equivalent with either backend."""
+        with override_settings(RECIPE_DB_JSON_RENDERING=True):
+            db_json = self.client.get(RECIPE_URL, {'page_size': 2})
+        with override_settings(
+            RECIPE_DB_JSON_RENDERING=False,
+            RECIPE_FAST_SERIALIZATION=False,
+        ):
+            serialized = self.client.get(RECIPE_URL, {'page_size': 2})
+
+        self.assertEqual(db_json.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(db_json.content),
+                         json.loads(serialized.content))
+        self.assertEqual(
+            json.loads(db_json.content)['results'],
+            self._serializer_data(Recipe.objects.order_by('-id')[:2]),
+        )
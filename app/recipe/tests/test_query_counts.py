@@ -0,0 +1,168 @@
+"""
+Tests for the number of queries run by the recipe APIs.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+SEED_SIZES = [10, 100, 1000]
+
+
+def create_user(email='user@example.com', password='Welcome123'):
+    """Create and return a new user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def seed_recipes(user, count):
+    """Create `count` recipes, each linked to two tags and two ingredients."""
+    tags = Tag.objects.bulk_create(
+        Tag(user=user, name=f'Tag {i}') for i in range(count)
+    )
+    ingredients = Ingredient.objects.bulk_create(
+        Ingredient(user=user, name=f'Ingredient {i}') for i in range(count)
+    )
+    Recipe.objects.bulk_create(
+        Recipe(
+            user=user,
+            title=f'Recipe {i}',
+            time_minutes=10,
+            price=Decimal('5.00'),
+        )
+        for i in range(count)
+    )
+    recipe_ids = list(
+        Recipe.objects.filter(user=user).values_list('id', flat=True)
+    )
+    tag_ids = [tag.id for tag in Tag.objects.filter(user=user)]
+    ingredient_ids = [ing.id for ing in Ingredient.objects.filter(user=user)]
+
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+        for i, recipe_id in enumerate(recipe_ids)
+        for tag_id in {tag_ids[i], tag_ids[(i + 1) % count]}
+    )
+    Recipe.ingredients.through.objects.bulk_create(
+        Recipe.ingredients.through(
+            recipe_id=recipe_id,
+            ingredient_id=ingredient_id,
+        )
+        for i, recipe_id in enumerate(recipe_ids)
+        for ingredient_id in {
+            ingredient_ids[i], ingredient_ids[(i + 1) % count]
+        }
+    )
+
+    return tags, ingredients
+
+
+class QueryCountTests(TestCase):
+    """Test the recipe APIs run a constant number of queries."""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def _count_queries(self, url, size):
+        """Seed `size` recipes for a new user and count queries for GET."""
+        user = create_user(email=f'user{size}@example.com')
+        seed_recipes(user, size)
+        self.client.force_authenticate(user)
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries)
+
+    def _assert_flat(self, url):
+        counts = [self._count_queries(url, size) for size in SEED_SIZES]
+
+        self.assertEqual(len(set(counts)), 1, counts)
+
+    def test_recipe_list_queries_constant(self):
+        """Test listing recipes does not query per recipe."""
+        self._assert_flat(RECIPE_URL)
+
+    def test_recipe_list_query_count(self):
+        """Test the list runs the ETag lookup plus one query per table."""
+        count = self._count_queries(RECIPE_URL, SEED_SIZES[0])
+
+        self.assertEqual(count, 4)
+
+    def test_recipe_detail_query_count(self):
+        """Test retrieving a recipe loads tags and ingredients once."""
+        user = create_user()
+        seed_recipes(user, SEED_SIZES[0])
+        self.client.force_authenticate(user)
+        recipe = Recipe.objects.filter(user=user).first()
+        url = reverse('recipe:recipe-detail', args=[recipe.id])
+
+        with self.assertNumQueries(4):
+            res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['tags']), 2)
+        self.assertEqual(len(res.data['ingredients']), 2)
+
+    def test_tag_list_queries_constant(self):
+        """Test listing tags does not query per tag."""
+        self._assert_flat(TAGS_URL)
+
+    def test_ingredient_list_queries_constant(self):
+        """Test listing ingredients does not query per ingredient."""
+        self._assert_flat(INGREDIENTS_URL)
+
+    def test_prefetch_loads_only_serialized_columns(self):
+        """Test tag and ingredient prefetches select only id and name."""
+        user = create_user()
+        seed_recipes(user, SEED_SIZES[0])
+        self.client.force_authenticate(user)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(RECIPE_URL)
+
+        prefetches = [q['sql'] for q in ctx.captured_queries[2:]]
+        for sql in prefetches:
+            self.assertNotIn('"user_id"', sql.split(' FROM ')[0])
+
+    def _count_create_queries(self, size):
+        """Count queries creating a recipe with `size` tags and ingredients."""
+        user = create_user(email=f'writer{size}@example.com')
+        Tag.objects.bulk_create(
+            Tag(user=user, name=f'Tag {i}') for i in range(0, size, 2)
+        )
+        self.client.force_authenticate(user)
+        payload = {
+            'title': 'Stew',
+            'time_minutes': 30,
+            'price': '4.00',
+            'tags': [{'name': f'Tag {i}'} for i in range(size)],
+            'ingredients': [{'name': f'Ingredient {i}'} for i in range(size)],
+        }
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data['tags']), size)
+        self.assertEqual(len(res.data['ingredients']), size)
+        return len(ctx.captured_queries)
+
+    def test_recipe_create_queries_constant(self):
+        """Test creating a recipe does not query per tag or ingredient."""
+        counts = [self._count_create_queries(size) for size in (2, 20)]
+
+        self.assertEqual(len(set(counts)), 1, counts)
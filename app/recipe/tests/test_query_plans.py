@@ -0,0 +1,146 @@
+"""
+Tests for the query plans of filtered recipe lists.
+"""
+import re
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.filters import RecipeRelationFilter
+
+
+SEQUENTIAL_SCAN = {
+    'postgresql': re.compile(r'Seq Scan'),
+    'sqlite': re.compile(r'\bSCAN\b'),
+}
+# Indexes each vendor's plans are expected to name, by filter. SQLite
+# probes the through tables from each recipe, through their unique
+# (recipe, target) indexes; PostgreSQL starts from the few matching
+# rows of the reverse (target, recipe) indexes.
+EXPECTED_INDEXES = {
+    'postgresql': {
+        'unfiltered': {'core_recipe_user_id_idx'},
+        'tags': {'core_recipe_tags_tag_recipe_idx'},
+        'tags+ingredients': {
+            'core_recipe_tags_tag_recipe_idx',
+            'core_recipe_ingredients_ing_recipe_idx',
+        },
+    },
+    'sqlite': {
+        'unfiltered': {'core_recipe_user_id_idx'},
+        'tags': {'core_recipe_user_id_idx'},
+        'tags+ingredients': {'core_recipe_user_id_idx'},
+    },
+}
+RECIPES_PER_USER = 2000
+RELATIONS_PER_USER = 100
+
+
+def explain(queryset):
+    """Return the plan for `queryset` on up-to-date statistics."""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'ANALYZE core_recipe, core_recipe_tags, '
+                'core_recipe_ingredients')
+    return queryset.explain()
+
+
+class FilterQueryPlanTests(TestCase):
+    """Test filtered recipe lists are answered from the new indexes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            'user@example.com', 'password123')
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'password123')
+        for owner in (other, cls.user):
+            tags = Tag.objects.bulk_create(
+                Tag(user=owner, name=f'Tag {i}')
+                for i in range(RELATIONS_PER_USER)
+            )
+            ingredients = Ingredient.objects.bulk_create(
+                Ingredient(user=owner, name=f'Ing {i}')
+                for i in range(RELATIONS_PER_USER)
+            )
+            Recipe.objects.bulk_create(
+                Recipe(
+                    user=owner,
+                    title=f'Recipe {i}',
+                    time_minutes=i,
+                    price=Decimal('1.00'),
+                )
+                for i in range(RECIPES_PER_USER)
+            )
+            tags = list(Tag.objects.filter(user=owner).order_by('id'))
+            ingredients = list(
+                Ingredient.objects.filter(user=owner).order_by('id'))
+            recipe_ids = list(Recipe.objects.filter(
+                user=owner).order_by('id').values_list('id', flat=True))
+            # Each tag and ingredient is on 1% of the recipes.
+            Recipe.tags.through.objects.bulk_create(
+                Recipe.tags.through(
+                    recipe_id=recipe_id,
+                    tag_id=tags[i % RELATIONS_PER_USER].id,
+                )
+                for i, recipe_id in enumerate(recipe_ids)
+            )
+            Recipe.ingredients.through.objects.bulk_create(
+                Recipe.ingredients.through(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredients[i % RELATIONS_PER_USER].id,
+                )
+                for i, recipe_id in enumerate(recipe_ids)
+            )
+        cls.tags = tags
+        cls.ingredients = ingredients
+
+    def _filtered(self, params):
+        request = Request(APIRequestFactory().get('/', params))
+        queryset = Recipe.objects.filter(user=self.user).order_by('-id')
+        return RecipeRelationFilter().filter_queryset(request, queryset, None)
+
+    def _assert_plan(self, queryset, case):
+        """Assert the plan scans no table and names the expected indexes."""
+        pattern = SEQUENTIAL_SCAN.get(connection.vendor)
+        if pattern is None:
+            self.skipTest(f'No plan check for {connection.vendor}')
+        plan = explain(queryset)
+
+        self.assertIsNone(pattern.search(plan), plan)
+        for index in EXPECTED_INDEXES[connection.vendor][case]:
+            self.assertIn(index, plan)
+
+    def test_unfiltered_list_plan(self):
+        """Test listing a user's recipes uses the (user, id) index."""
+        self._assert_plan(self._filtered({}), 'unfiltered')
+
+    def test_tag_filter_plan(self):
+        """Test filtering by tags uses the reverse tag index."""
+        ids = f'{self.tags[0].id},{self.tags[1].id}'
+
+        self._assert_plan(self._filtered({'tags': ids}), 'tags')
+
+    def test_tag_and_ingredient_filter_plan(self):
+        """Test filtering by both uses both reverse indexes."""
+        params = {
+            'tags': self.tags[0].id,
+            'ingredients': self.ingredients[0].id,
+        }
+
+        self._assert_plan(self._filtered(params), 'tags+ingredients')
+
+    def test_filter_has_no_distinct(self):
+        """Test filters use semi-joins instead of DISTINCT."""
+        queryset = self._filtered({'tags': self.tags[0].id})
+
+        self.assertNotIn('DISTINCT', str(queryset.query))
+        self.assertEqual(
+            queryset.count(), RECIPES_PER_USER // RELATIONS_PER_USER)
@@ -4,15 +4,22 @@ Test for Recipe API
 import tempfile
 import os
 from PIL import Image
+from PIL.ImageFile import ImageFile
 from decimal import Decimal
-from django.test import TestCase
+from unittest.mock import patch
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 from core.models import Recipe, Tag, Ingredient
-from recipe.serializers import RecipeDetailSerializer
+from recipe import images
+from recipe.filters import RecipeOrderingFilter
+from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
 
 
 RECIPE_URL = reverse('recipe:recipe-list')
@@ -77,11 +84,9 @@ class PrivateRecipeAPITests(TestCase):
 
         res = self.client.get(RECIPE_URL)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        # recipes = Recipe.objects.all().order_by('-id')
-        # serializer = RecipeSerializer(recipes, many=True)
-        # print(res.data)
-        # print(serializer.data)
-        # self.assertEqual(res.data, serializer.data)
+        recipes = Recipe.objects.all().order_by('-id')
+        serializer = RecipeSerializer(recipes, many=True)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_retrive_list_limited_user(self):
         """Test retrive list of recipes for authenticated user"""
@@ -92,9 +97,9 @@ class PrivateRecipeAPITests(TestCase):
 
         res = self.client.get(RECIPE_URL)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        # recipes = Recipe.objects.filter(user=self.user)
-        # serializer = RecipeSerializer(recipes, many=True)
-        # self.assertEqual(res.data, serializer.data)
+        recipes = Recipe.objects.filter(user=self.user)
+        serializer = RecipeSerializer(recipes, many=True)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_get_recipe_detail(self):
         """test get recipe details."""
@@ -140,6 +145,24 @@ class PrivateRecipeAPITests(TestCase):
         self.assertEqual(recipe.user, self.user)
         self.assertEqual(recipe.link, original_link)
 
+    def test_partial_update_writes_changed_columns(self):
+        """Test a partial update only writes the changed columns."""
+        recipe = create_recipe(user=self.user, title='Sample title')
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.patch(
+                detail_url(recipe.id),
+                {'title': 'New title', 'price': '4.25'},
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        update = next(
+            q['sql'] for q in ctx.captured_queries
+            if q['sql'].startswith('UPDATE "core_recipe" SET "title"')
+        )
+        self.assertNotIn('"price"', update)
+        self.assertNotIn('"link"', update)
+
     def test_full_update(self):
         """test full update for recipe"""
         recipe = create_recipe(
@@ -244,6 +267,20 @@ class PrivateRecipeAPITests(TestCase):
             ).exists()
             self.assertTrue(exists)
 
+    def test_create_recipe_with_repeated_tag(self):
+        """Test a tag named twice in a payload is created once."""
+        payload = {
+            'title': 'Dal',
+            'time_minutes': 20,
+            'price': Decimal('1.50'),
+            'tags': [{'name': 'Indian'}, {'name': 'Indian'}],
+        }
+        res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(len(res.data['tags']), 1)
+
     def test_create_tag_on_update(self):
         """Test creating tag when updating a recipe."""
         recipe = create_recipe(user=self.user)
@@ -256,6 +293,28 @@ class PrivateRecipeAPITests(TestCase):
         newTag = Tag.objects.get(user=self.user, name='Lunch')
         self.assertIn(newTag, recipe.tags.all())
 
+    def test_update_recipe_keeps_unchanged_tags(self):
+        """Test unchanged memberships are not deleted and re-inserted."""
+        tag_breakfast = Tag.objects.create(user=self.user, name='Breakfast')
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag_breakfast)
+        through = Recipe.tags.through
+        membership = through.objects.get(recipe=recipe)
+
+        payload = {'tags': [{'name': 'Breakfast'}, {'name': 'Lunch'}]}
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.patch(
+                detail_url(recipe.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(through.objects.filter(pk=membership.pk).exists())
+        self.assertEqual(recipe.tags.count(), 2)
+        table = through._meta.db_table
+        self.assertFalse(any(
+            q['sql'].startswith(f'DELETE FROM "{table}"')
+            for q in ctx.captured_queries
+        ))
+
     def test_update_recipe_assign_tag(self):
         """Test assigning an existing tag when updating a recipe."""
         tag_breakfast = Tag.objects.create(user=self.user, name='Breakfast')
@@ -377,6 +436,297 @@ class PrivateRecipeAPITests(TestCase):
         self.assertEqual(recipe.ingredients.count(), 0)
         self.assertNotIn(ingredient, recipe.ingredients.all())
 
+    def test_list_recipes_paginated(self):
+        """Test recipes are returned in pages following the next cursor."""
+        recipes = [create_recipe(user=self.user) for _ in range(5)]
+
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsNone(res.data['previous'])
+        seen = [r['id'] for r in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            seen += [r['id'] for r in res.data['results']]
+
+        self.assertEqual(seen, [r.id for r in reversed(recipes)])
+
+    def test_list_recipes_page_does_not_count_or_offset(self):
+        """Test paging recipes never runs COUNT(*) or an OFFSET scan."""
+        for _ in range(5):
+            create_recipe(user=self.user)
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+        res = self.client.get(res.data['next'])
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+        for query in ctx.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'].upper())
+            self.assertNotIn('OFFSET', query['sql'].upper())
+
+    def test_list_recipes_excludes_description(self):
+        """Test the recipe list uses the slim representation."""
+        create_recipe(user=self.user, description='A long description')
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('description', res.data['results'][0])
+        self.assertNotIn('"description"', ctx.captured_queries[-1]['sql'])
+
+    def test_list_recipes_sparse_fields(self):
+        """Test ?fields= limits the output and the selected columns."""
+        recipe = create_recipe(user=self.user)
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPE_URL, {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data['results'],
+            [{'id': recipe.id, 'title': recipe.title}],
+        )
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertNotIn('"price"', ctx.captured_queries[-1]['sql'])
+
+    def test_get_recipe_detail_omit_fields(self):
+        """Test ?omit= drops fields from the recipe detail."""
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(
+                detail_url(recipe.id),
+                {'omit': 'tags,ingredients,description'},
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(res.data),
+            {'id', 'title', 'time_minutes', 'price', 'link', 'image_variants'},
+        )
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertNotIn('"description"', ctx.captured_queries[-1]['sql'])
+
+    def test_sparse_fields_unknown_field_error(self):
+        """Test requesting an unknown field returns an error."""
+        res = self.client.get(RECIPE_URL, {'fields': 'id,user'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_update_recipe_sparse_fields(self):
+        """Test ?fields= trims the response without dropping input."""
+        recipe = create_recipe(user=self.user)
+        payload = {'title': 'New title', 'tags': [{'name': 'Lunch'}]}
+        url = f'{detail_url(recipe.id)}?fields=id'
+
+        res = self.client.patch(url, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'id': recipe.id})
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, payload['title'])
+        self.assertEqual(recipe.tags.count(), 1)
+
+    def test_filter_by_tags(self):
+        """Test returning recipes with specific tags."""
+        r1 = create_recipe(user=self.user, title='Thai Vegetable Curry')
+        r2 = create_recipe(user=self.user, title='Aubergine with Tahini')
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Vegetarian')
+        r1.tags.add(tag1)
+        r2.tags.add(tag1, tag2)
+        r3 = create_recipe(user=self.user, title='Fish and chips')
+
+        params = {'tags': f'{tag1.id},{tag2.id}'}
+        res = self.client.get(RECIPE_URL, params)
+
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [r2.id, r1.id])
+        self.assertNotIn(r3.id, ids)
+
+    def test_filter_by_ingredients(self):
+        """Test returning recipes with specific ingredients."""
+        r1 = create_recipe(user=self.user, title='Posh Beans on Toast')
+        r2 = create_recipe(user=self.user, title='Chicken Cacciatore')
+        in1 = Ingredient.objects.create(user=self.user, name='Feta Cheese')
+        in2 = Ingredient.objects.create(user=self.user, name='Chicken')
+        r1.ingredients.add(in1)
+        r2.ingredients.add(in2)
+        create_recipe(user=self.user, title='Red Lentil Daal')
+
+        res = self.client.get(RECIPE_URL, {'ingredients': f'{in1.id}'})
+
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [r1.id])
+
+    def test_filter_by_tags_and_ingredients(self):
+        """Test tag and ingredient filters must both match."""
+        r1 = create_recipe(user=self.user)
+        r2 = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='Kale')
+        r1.tags.add(tag)
+        r1.ingredients.add(ingredient)
+        r2.tags.add(tag)
+
+        res = self.client.get(
+            RECIPE_URL, {'tags': tag.id, 'ingredients': ingredient.id})
+
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [r1.id])
+
+    def test_filter_invalid_ids_error(self):
+        """Test non-numeric filter ids return an error."""
+        res = self.client.get(RECIPE_URL, {'tags': '1,abc'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_by_price_range(self):
+        """Test filtering recipes by price bounds."""
+        cheap = create_recipe(user=self.user, price=Decimal('2.00'))
+        create_recipe(user=self.user, price=Decimal('12.00'))
+
+        res = self.client.get(RECIPE_URL, {'price__lte': '5'})
+
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [cheap.id])
+
+    def test_filter_by_time_range(self):
+        """Test filtering recipes by a time_minutes range."""
+        create_recipe(user=self.user, time_minutes=5)
+        r2 = create_recipe(user=self.user, time_minutes=20)
+        r3 = create_recipe(user=self.user, time_minutes=30)
+        create_recipe(user=self.user, time_minutes=45)
+
+        res = self.client.get(RECIPE_URL, {'time_minutes__range': '10,30'})
+
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [r3.id, r2.id])
+
+    def test_filter_range_invalid_value_error(self):
+        """Test invalid range values return an error."""
+        for params in [
+            {'price__gte': 'cheap'},
+            {'time_minutes__range': '10'},
+        ]:
+            res = self.client.get(RECIPE_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ordering_by_indexed_fields(self):
+        """Test ordering recipes by price, then time descending."""
+        r1 = create_recipe(
+            user=self.user, price=Decimal('3.00'), time_minutes=10)
+        r2 = create_recipe(
+            user=self.user, price=Decimal('1.00'), time_minutes=10)
+        r3 = create_recipe(
+            user=self.user, price=Decimal('3.00'), time_minutes=40)
+
+        res = self.client.get(
+            RECIPE_URL, {'ordering': 'price,-time_minutes'})
+
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [r2.id, r3.id, r1.id])
+
+    def test_ordering_paginates_with_cursor(self):
+        """Test paging through recipes ordered by price."""
+        prices = ['4.00', '1.00', '3.00', '1.00', '2.00']
+        for price in prices:
+            create_recipe(user=self.user, price=Decimal(price))
+
+        res = self.client.get(
+            RECIPE_URL, {'ordering': 'price', 'page_size': 2})
+        seen = [r['price'] for r in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            seen += [r['price'] for r in res.data['results']]
+
+        self.assertEqual(seen, ['1.00', '1.00', '2.00', '3.00', '4.00'])
+
+    def _walk_pages(self, params):
+        """Return the ids of every page, following next then previous."""
+        res = self.client.get(RECIPE_URL, params)
+        pages = [[r['id'] for r in res.data['results']]]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            pages.append([r['id'] for r in res.data['results']])
+        backwards = []
+        while res.data['previous']:
+            res = self.client.get(res.data['previous'])
+            backwards.insert(0, [r['id'] for r in res.data['results']])
+
+        return pages, backwards
+
+    def test_ordering_pages_through_ties(self):
+        """Test pages of equal prices are walked once, without OFFSET."""
+        recipes = [
+            create_recipe(user=self.user, price=Decimal('5.00'))
+            for _ in range(7)
+        ]
+        expected = [recipe.id for recipe in reversed(recipes)]
+        params = {'ordering': 'price', 'page_size': 2}
+        for fast in (True, False):
+            cache.clear()
+            with self.subTest(fast=fast), \
+                    override_settings(RECIPE_FAST_SERIALIZATION=fast), \
+                    CaptureQueriesContext(connection) as ctx:
+                pages, backwards = self._walk_pages(params)
+
+                self.assertEqual(sum(pages, []), expected)
+                self.assertEqual(backwards, pages[:-1])
+                for query in ctx.captured_queries:
+                    self.assertNotIn('OFFSET', query['sql'].upper())
+
+    def test_invalid_cursor(self):
+        """Test a cursor not matching the ordering is refused."""
+        create_recipe(user=self.user)
+        create_recipe(user=self.user)
+        res = self.client.get(RECIPE_URL, {'page_size': 1})
+
+        res = self.client.get(res.data['next'] + '&ordering=price')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_ordering_with_sparse_fields(self):
+        """Test ordering by a field left out of ?fields= still pages."""
+        create_recipe(user=self.user, price=Decimal('2.00'))
+        create_recipe(user=self.user, price=Decimal('1.00'))
+        create_recipe(user=self.user, price=Decimal('3.00'))
+
+        res = self.client.get(
+            RECIPE_URL,
+            {'ordering': '-price', 'fields': 'title', 'page_size': 2},
+        )
+        res = self.client.get(res.data['next'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(set(res.data['results'][0]), {'title'})
+
+    def test_ordering_by_unindexed_field_ignored(self):
+        """Test ordering by a field without a user index is ignored."""
+        r1 = create_recipe(user=self.user, description='A')
+        r2 = create_recipe(user=self.user, description='B')
+
+        for ordering in ('description', 'description,price'):
+            with self.subTest(ordering=ordering):
+                res = self.client.get(RECIPE_URL, {'ordering': ordering})
+
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                ids = [recipe['id'] for recipe in res.data['results']]
+                self.assertEqual(ids, [r2.id, r1.id])
+
+    def test_ordering_fields(self):
+        """Test exactly the fields with a (user, field) index order."""
+        self.assertEqual(
+            set(RecipeOrderingFilter.ordering_fields),
+            {'id', 'updated_at', 'price', 'time_minutes', 'title'},
+        )
+
 
 class ImageUploadTests(TestCase):
     """Tests for image upload API"""
@@ -413,3 +763,69 @@ class ImageUploadTests(TestCase):
         res = self.client.post(url, payload, format='multipart')
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def _upload(self, size=(10, 10), image_format='JPEG'):
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.img') as image_file:
+            Image.new('RGB', size).save(image_file, format=image_format)
+            image_file.seek(0)
+            return self.client.post(
+                url, {'image': image_file}, format='multipart')
+
+    def test_upload_replaces_old_file(self):
+        """Test a replaced image is deleted once garbage collected."""
+        self._upload()
+        self.recipe.refresh_from_db()
+        old_path = self.recipe.image.path
+
+        with patch('recipe.images.schedule_variants') as schedule, \
+                self.captureOnCommitCallbacks(execute=True):
+            res = self._upload(size=(20, 20))
+        images.collect_garbage(0)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertNotEqual(self.recipe.image.path, old_path)
+        self.assertFalse(os.path.exists(old_path))
+        self.assertTrue(os.path.exists(self.recipe.image.path))
+        schedule.assert_called_once_with(
+            self.recipe.id, self.recipe.image.name)
+
+    def test_upload_validates_header_only(self):
+        """Test uploads are validated without decoding the pixels."""
+        with patch.object(
+                ImageFile, 'load', side_effect=AssertionError('decoded')):
+            res = self._upload()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_upload_unsupported_format(self):
+        """Test images in other formats are rejected."""
+        res = self._upload(image_format='BMP')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(RECIPE_IMAGE_MAX_PIXELS=50)
+    def test_upload_too_many_pixels(self):
+        """Test images over the pixel limit are rejected."""
+        res = self._upload()
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(RECIPE_IMAGE_MAX_UPLOAD_SIZE=1000)
+    def test_upload_too_large(self):
+        """Test files over the size limit are refused while streaming."""
+        res = self._upload(size=(100, 100), image_format='BMP')
+
+        self.assertEqual(
+            res.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    @override_settings(RECIPE_IMAGE_MAX_UPLOAD_SIZE=10)
+    def test_upload_too_large_announced(self):
+        """Test bodies announced as too large are refused unread."""
+        res = self._upload(size=(1000, 1000), image_format='BMP')
+
+        self.assertEqual(
+            res.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
@@ -0,0 +1,142 @@
+"""
+Tests for recipe full-text search.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, RecipeSearchTerm
+from recipe import search
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe."""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RecipeSearchTests(TestCase):
+    """Test searching recipes with ?search=."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'password123')
+        self.client.force_authenticate(self.user)
+
+    def _search(self, text, **params):
+        res = self.client.get(RECIPE_URL, {'search': text, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['id'] for recipe in res.data['results']]
+
+    def test_search_title_and_description(self):
+        """Test words are found in titles and descriptions."""
+        r1 = create_recipe(self.user, title='Paneer tikka')
+        r2 = create_recipe(
+            self.user, title='Curry', description='Mild paneer curry')
+        create_recipe(self.user, title='Fish and chips')
+
+        self.assertEqual(set(self._search('paneer')), {r1.id, r2.id})
+
+    def test_search_requires_all_words(self):
+        """Test every searched word must match."""
+        r1 = create_recipe(self.user, title='Chicken tikka masala')
+        create_recipe(self.user, title='Chicken soup')
+
+        self.assertEqual(self._search('chicken masala'), [r1.id])
+
+    def test_search_ranks_title_matches_first(self):
+        """Test title matches rank above description matches."""
+        in_description = create_recipe(
+            self.user, title='Stew', description='Hearty lentil stew')
+        in_title = create_recipe(self.user, title='Lentil soup')
+
+        self.assertEqual(
+            self._search('lentil'), [in_title.id, in_description.id])
+
+    def test_search_limited_to_user(self):
+        """Test other users' recipes are never returned."""
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'password123')
+        create_recipe(other, title='Paneer tikka')
+
+        self.assertEqual(self._search('paneer'), [])
+
+    def test_search_follows_updates(self):
+        """Test the index follows title changes."""
+        recipe = create_recipe(self.user, title='Apple pie')
+        recipe.title = 'Cherry pie'
+        recipe.save()
+
+        self.assertEqual(self._search('apple'), [])
+        self.assertEqual(self._search('cherry'), [recipe.id])
+
+    def test_search_pages_by_rank(self):
+        """Test cursor pages walk the ranked results."""
+        ids = [
+            create_recipe(
+                self.user,
+                title='Soup' if i % 2 else 'Tomato soup',
+                description='tomato ' * (i % 2),
+            ).id
+            for i in range(5)
+        ]
+
+        res = self.client.get(
+            RECIPE_URL, {'search': 'tomato', 'page_size': 2})
+        seen = [r['id'] for r in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            seen += [r['id'] for r in res.data['results']]
+
+        self.assertEqual(sorted(seen), sorted(ids))
+        self.assertEqual(set(seen[:3]), set(ids[0::2]))
+
+    def test_search_pages_through_equal_ranks(self):
+        """Test results ranked equally are each listed once."""
+        ids = [create_recipe(self.user, title='Tomato soup').id
+               for _ in range(7)]
+
+        res = self.client.get(
+            RECIPE_URL, {'search': 'tomato', 'page_size': 2})
+        seen = [r['id'] for r in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            seen += [r['id'] for r in res.data['results']]
+
+        self.assertEqual(seen, sorted(ids, reverse=True))
+
+    def test_blank_search_ignored(self):
+        """Test a blank search lists every recipe."""
+        recipe = create_recipe(self.user)
+
+        self.assertEqual(self._search('  '), [recipe.id])
+
+    def test_inverted_index_maintained(self):
+        """Test the fallback index is kept in sync off PostgreSQL."""
+        if search.uses_vector():
+            self.skipTest('PostgreSQL uses the tsvector column')
+        recipe = create_recipe(
+            self.user, title='Tomato soup', description='tomato')
+
+        terms = dict(
+            RecipeSearchTerm.objects.filter(
+                recipe=recipe).values_list('term', 'weight')
+        )
+        self.assertEqual(terms, {'tomato': 3, 'soup': 2})
+
+        recipe.delete()
+        self.assertFalse(RecipeSearchTerm.objects.exists())
@@ -0,0 +1,167 @@
+"""
+Tests for offloading recipe images to an object store.
+"""
+import io
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from recipe.storage import MemoryObjectStore, OffloadedStorage
+
+NAME = 'uploads/recipe/ab/abcdef.jpg'
+STORE = {'BACKEND': 'recipe.storage.MemoryObjectStore'}
+
+
+@override_settings(RECIPE_IMAGE_STORE_RETRIES=0)
+class OffloadedStorageTests(TestCase):
+    """Test storing files locally, then in the object store."""
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location)
+        self.store = MemoryObjectStore()
+        self.storage = OffloadedStorage(
+            store=self.store, location=self.location)
+
+    def _save(self, content=b'image'):
+        name = self.storage.save(NAME, ContentFile(content))
+        self.storage.offloader.join()
+        return name
+
+    def test_save_offloads_in_background(self):
+        """Test saved files move to the object store."""
+        name = self._save()
+
+        self.assertIn(name, self.store.objects)
+        self.assertFalse(os.path.exists(self.storage.path(name)))
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(self.storage.size(name), 5)
+        with self.storage.open(name) as file:
+            self.assertEqual(file.read(), b'image')
+
+    @override_settings(RECIPE_IMAGE_STORE_KEEP_LOCAL=True)
+    def test_keep_local_copy(self):
+        """Test the local copy can be kept as a cache."""
+        name = self._save()
+
+        self.assertIn(name, self.store.objects)
+        with open(self.storage.path(name), 'rb') as file:
+            self.assertEqual(file.read(), b'image')
+
+    def test_listdir_and_delete(self):
+        """Test listing and deleting cover local and offloaded files."""
+        name = self._save()
+        with override_settings(RECIPE_IMAGE_STORE_WORKERS=0):
+            del self.storage.offloader
+            with patch.object(self.store, 'put', side_effect=OSError), \
+                    self.assertLogs('recipe.storage', 'ERROR'):
+                local = self.storage.save(
+                    'uploads/recipe/ab/local.jpg', ContentFile(b'x'))
+
+        self.assertEqual(
+            self.storage.listdir('uploads/recipe/ab'),
+            ([], ['abcdef.jpg', 'local.jpg']),
+        )
+        self.assertEqual(self.storage.listdir('uploads/recipe'), (['ab'], []))
+
+        self.storage.delete(name)
+        self.storage.delete(local)
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(self.storage.exists(local))
+
+    @override_settings(
+        RECIPE_IMAGE_STORE_WORKERS=0, RECIPE_IMAGE_STORE_RETRIES=2)
+    def test_upload_retried(self):
+        """Test failed uploads are retried with backoff."""
+        put = self.store.put
+        calls = []
+
+        def flaky(name, file):
+            calls.append(name)
+            if len(calls) < 3:
+                raise OSError('unavailable')
+            put(name, file)
+
+        with patch.object(self.store, 'put', side_effect=flaky), \
+                patch('recipe.storage.time.sleep') as sleep:
+            name = self._save()
+
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(
+            [call.args[0] for call in sleep.call_args_list], [1.0, 2.0])
+        self.assertIn(name, self.store.objects)
+
+
+@override_settings(
+    DEFAULT_FILE_STORAGE='recipe.storage.OffloadedStorage',
+    RECIPE_IMAGE_STORE=STORE,
+    RECIPE_IMAGE_STORE_WORKERS=0,
+    RECIPE_IMAGE_STORE_RETRIES=0,
+)
+class OffloadedImageTests(TestCase):
+    """Test recipe images with an offloading default storage."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'password123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5,
+            price=Decimal('1.00'))
+
+    def _upload(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (10, 10)).save(buffer, format='JPEG')
+        return self.client.post(
+            reverse('recipe:recipe-upload-image', args=[self.recipe.id]),
+            {'image': ContentFile(buffer.getvalue(), name='photo.jpg')},
+            format='multipart',
+        )
+
+    def test_upload_served_by_redirect(self):
+        """Test offloaded images are redirected to a presigned URL."""
+        res = self._upload()
+        self.recipe.refresh_from_db()
+        name = self.recipe.image.name
+
+        self.assertIn(name, default_storage.store.objects)
+        self.assertTrue(res.data['image'].endswith(f'/static/media/{name}'))
+        image = self.client.get(reverse('media', args=[name]))
+        self.assertEqual(image.status_code, 302)
+        self.assertTrue(image['Location'].startswith(
+            f'https://objects.invalid/{name}?token='))
+        self.assertIn('max-age=1800', image['Cache-Control'])
+
+    def test_offload_command(self):
+        """Test files whose upload failed are offloaded by the command."""
+        with patch.object(
+                MemoryObjectStore, 'put', side_effect=OSError('down')), \
+                self.assertLogs('recipe.storage', 'ERROR'):
+            self._upload()
+        self.recipe.refresh_from_db()
+        name = self.recipe.image.name
+        self.assertEqual(default_storage.store.objects, {})
+
+        call_command('offload_images', stdout=io.StringIO())
+
+        self.assertIn(name, default_storage.store.objects)
+        self.assertFalse(os.path.exists(default_storage.path(name)))
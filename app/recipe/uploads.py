@@ -0,0 +1,132 @@
+"""
+Streaming, size-limited image uploads for Recipe APIs.
+
+Uploads are written to a temporary file chunk by chunk, hashed on the
+way for content-addressed storage, and abandoned as soon as they grow
+past `RECIPE_IMAGE_MAX_UPLOAD_SIZE`. Images are
+validated from their header alone (format and dimensions), without
+decoding the pixel data.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.files.uploadhandler import (
+    StopUpload,
+    TemporaryFileUploadHandler,
+)
+from django.utils.translation import gettext_lazy as _
+from PIL import Image, UnidentifiedImageError, features
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from core.models import IMAGE_EXTENSIONS
+
+# Room for the multipart boundaries and part headers around the file.
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadTooLarge(APIException):
+    """Raised when an upload exceeds the configured size."""
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = _('The uploaded file is too large.')
+    default_code = 'upload_too_large'
+
+
+def get_max_upload_size():
+    """Return the largest accepted image upload in bytes."""
+    return getattr(settings, 'RECIPE_IMAGE_MAX_UPLOAD_SIZE', 10 * 1024 ** 2)
+
+
+class SizeLimitedUploadHandler(TemporaryFileUploadHandler):
+    """Stream each file to disk, stopping once it passes `max_size`.
+
+    Completed files carry the SHA-256 of their content as `sha256`.
+    """
+
+    def __init__(self, request=None, max_size=None):
+        super().__init__(request)
+        self.max_size = max_size or get_max_upload_size()
+        self.exceeded = False
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_size:
+            self.exceeded = True
+            self.file.close()
+            raise StopUpload(connection_reset=True)
+        self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.sha256 = self.hasher.hexdigest()
+        return file
+
+
+def limit_upload_size(request):
+    """Make `request` stream uploads to disk with a size cap.
+
+    Must run before the body is read; requests announcing a larger body
+    are refused without reading it. Returns the installed handler.
+    """
+    max_size = get_max_upload_size()
+    try:
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        length = 0
+    if length > max_size + MULTIPART_OVERHEAD:
+        raise UploadTooLarge()
+
+    handler = SizeLimitedUploadHandler(request, max_size)
+    request.upload_handlers = [handler]
+
+    return handler
+
+
+def get_image_formats():
+    """Return the Pillow formats accepted for uploads.
+
+    Only formats recipes can store (see `core.models.IMAGE_EXTENSIONS`)
+    are accepted; WebP is left out when Pillow was built without it.
+    """
+    formats = getattr(
+        settings, 'RECIPE_IMAGE_FORMATS', ['JPEG', 'PNG', 'GIF', 'WEBP'])
+
+    return [image_format for image_format in formats
+            if image_format in IMAGE_EXTENSIONS
+            and (image_format != 'WEBP' or features.check('webp'))]
+
+
+def validate_image_header(file):
+    """Check an uploaded image's format and size from its header.
+
+    Raises `ValidationError` for unreadable, unsupported or oversized
+    images. Pillow only parses the header here; pixels stay undecoded.
+    The detected format is kept on the file as `image_format`.
+    """
+    formats = get_image_formats()
+    max_pixels = getattr(settings, 'RECIPE_IMAGE_MAX_PIXELS', 40_000_000)
+    try:
+        with Image.open(file) as image:
+            image_format, (width, height) = image.format, image.size
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise ValidationError(_('Upload a valid image.'), code='invalid_image')
+    finally:
+        file.seek(0)
+
+    if image_format not in formats:
+        raise ValidationError(
+            _('Unsupported image format %(format)s.') % {
+                'format': image_format},
+            code='invalid_image_format',
+        )
+    if width * height > max_pixels:
+        raise ValidationError(
+            _('Images may have at most %(pixels)d pixels.') % {
+                'pixels': max_pixels},
+            code='image_too_large',
+        )
+    file.image_format = image_format
@@ -3,7 +3,12 @@ URL mapping for Recipe APIs
 """
 
 from django.urls import path, include
-from recipe.views import RecipeViewSet, TagViewSet, IngredientViewSet
+from recipe.views import (
+    RecipeViewSet,
+    TagViewSet,
+    IngredientViewSet,
+    CacheStatsView,
+)
 from rest_framework.routers import DefaultRouter
 
 router = DefaultRouter()
@@ -15,4 +20,5 @@ app_name = 'recipe'
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('cache-stats/', CacheStatsView.as_view(), name='cache-stats'),
 ]
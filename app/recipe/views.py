@@ -1,28 +1,156 @@
 """
 Views for Recipe APIs
 """
+import json
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from drf_spectacular.utils import (
+    extend_schema_view,
+    extend_schema,
+    OpenApiParameter,
+    OpenApiTypes,
+)
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import (
+    IsAuthenticated,
+    IsAdminUser,
+    SAFE_METHODS,
+)
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.views import APIView
 
+from core.authentication import CachedTokenAuthentication
 from core.models import Recipe, Tag, Ingredient
-from recipe import serializers
+from recipe import serializers, bulk, fastpath, images, pgjson, uploads
+from recipe.cache import ResponseCacheMixin, cache_response, get_stats
+from recipe.conditional import (
+    condition_response,
+    list_validators,
+    detail_validators,
+)
+from recipe.filters import (
+    RecipeRelationFilter,
+    RecipeRangeFilter,
+    RecipeSearchFilter,
+    RecipeOrderingFilter,
+)
+from recipe.pagination import (
+    RecipeCursorPagination,
+    RecipeAttrCursorPagination,
+)
+from recipe.parsers import NDJSONParser
+from recipe.renderers import CSVRenderer, NDJSONRenderer
+
+MAX_BULK_BATCH_SIZE = 1000
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+@extend_schema_view(
+    list=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'tags',
+                OpenApiTypes.STR,
+                description='Comma separated list of tag IDs to filter',
+            ),
+            OpenApiParameter(
+                'ingredients',
+                OpenApiTypes.STR,
+                description='Comma separated list of ingredient IDs to '
+                            'filter',
+            ),
+        ]
+    )
+)
+class RecipeViewSet(ResponseCacheMixin, viewsets.ModelViewSet):
     """View to manage (CRUD) reciepe APIs"""
     serializer_class = serializers.RecipeDetailSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipeCursorPagination
+    filter_backends = [
+        RecipeRelationFilter,
+        RecipeRangeFilter,
+        RecipeSearchFilter,
+        RecipeOrderingFilter,
+    ]
+    ordering = '-id'
 
     def get_queryset(self):
         """Retrive recipes for authenticated users"""
-        return self.queryset.filter(user=self.request.user).order_by('-id')
+        queryset = self.queryset.filter(
+            user=self.request.user
+        ).order_by('-id')
+        output_fields = self._get_output_fields()
+
+        if self.request.method in SAFE_METHODS:
+            columns = {
+                field.attname for field in Recipe._meta.concrete_fields
+                if field.name in output_fields
+            }
+            queryset = queryset.only('id', *columns)
+
+        if 'tags' in output_fields:
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    'tags',
+                    queryset=Tag.objects.only('id', 'name').order_by('id'),
+                )
+            )
+        if 'ingredients' in output_fields:
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    'ingredients',
+                    queryset=Ingredient.objects.only(
+                        'id', 'name'
+                    ).order_by('id'),
+                )
+            )
+
+        return queryset
+
+    def _get_sparse_fields(self):
+        """Return the `fields`/`omit` query params as serializer kwargs."""
+        available = self.get_serializer_class().Meta.fields
+        sparse = {}
+        for param in ('fields', 'omit'):
+            value = self.request.query_params.get(param)
+            if value is None:
+                continue
+            names = [name for name in value.split(',') if name]
+            unknown = set(names) - set(available)
+            if unknown:
+                raise ValidationError({
+                    param: f'Unknown field(s): {", ".join(sorted(unknown))}'
+                })
+            sparse[param] = names
+
+        return sparse
+
+    def _get_output_fields(self):
+        """Return the serializer field names included in the response."""
+        fields = self.get_serializer_class().Meta.fields
+        sparse = self._get_sparse_fields()
+
+        return [
+            name for name in sparse.get('fields', fields)
+            if name not in sparse.get('omit', [])
+        ]
 
-    def get_serilizer_class(self):
+    def get_serializer(self, *args, **kwargs):
+        """Return the serializer limited to the requested fields."""
+        if self.request is not None:
+            kwargs.update(self._get_sparse_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def get_serializer_class(self):
         """return the serializer class for requests."""
         if self.action == 'list':
             return serializers.RecipeSerializer
@@ -31,35 +159,231 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         return self.serializer_class
 
+    def _use_fast_path(self):
+        """Return whether reads may skip the serializer machinery."""
+        return getattr(settings, 'RECIPE_FAST_SERIALIZATION', False)
+
+    def _use_db_json(self):
+        """Return whether the database may assemble the list JSON."""
+        return (
+            getattr(settings, 'RECIPE_DB_JSON_RENDERING', False)
+            and pgjson.is_supported(self.queryset.db)
+            and isinstance(self.request.accepted_renderer, JSONRenderer)
+        )
+
+    def _list_db_json(self, request):
+        """List recipes with the JSON built by the database."""
+        serializer = self.get_serializer()
+        queryset = self.filter_queryset(self.get_queryset())
+        ordering = self.paginator.get_ordering(request, queryset, self)
+        keys = queryset.prefetch_related(None).values(
+            'id', *{field.lstrip('-') for field in ordering}
+        )
+        page = self.paginate_queryset(keys)
+        results = pgjson.render(
+            [row['id'] for row in page], serializer, using=queryset.db
+        )
+        body = '{"next":%s,"previous":%s,"results":%s}' % (
+            json.dumps(self.paginator.get_next_link()),
+            json.dumps(self.paginator.get_previous_link()),
+            results,
+        )
+
+        return HttpResponse(body, content_type='application/json')
+
+    @cache_response
+    @condition_response(list_validators)
+    def list(self, request, *args, **kwargs):
+        """List recipes, via the fastest backend enabled."""
+        if self._use_db_json():
+            return self._list_db_json(request)
+        if not self._use_fast_path():
+            return super().list(request, *args, **kwargs)
+
+        serializer = self.get_serializer()
+        queryset = self.filter_queryset(self.get_queryset())
+        ordering = self.paginator.get_ordering(request, queryset, self)
+        rows = fastpath.get_values(
+            queryset, serializer, [field.lstrip('-') for field in ordering]
+        )
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(
+                fastpath.serialize(page, serializer)
+            )
+
+        return Response(fastpath.serialize(list(rows), serializer))
+
+    @cache_response
+    @condition_response(detail_validators)
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve a recipe, via the fast path when enabled."""
+        if not self._use_fast_path():
+            return super().retrieve(request, *args, **kwargs)
+
+        serializer = self.get_serializer()
+        queryset = self.filter_queryset(self.get_queryset())
+        try:
+            rows = list(fastpath.get_values(
+                queryset.filter(pk=self.kwargs['pk']), serializer
+            ))
+        except (TypeError, ValueError):
+            rows = []
+        if not rows:
+            raise Http404
+
+        return Response(fastpath.serialize(rows, serializer)[0])
+
+    @extend_schema(
+        responses={
+            (200, NDJSONRenderer.media_type): OpenApiTypes.STR,
+            (200, CSVRenderer.media_type): OpenApiTypes.STR,
+        },
+    )
+    @action(
+        methods=['GET'],
+        detail=False,
+        renderer_classes=[NDJSONRenderer, CSVRenderer],
+    )
+    def export(self, request):
+        """Stream all matching recipes as NDJSON or CSV."""
+        serializer = self.get_serializer()
+        queryset = self.filter_queryset(self.get_queryset())
+        items = fastpath.iter_serialized(
+            queryset, serializer, settings.RECIPE_EXPORT_CHUNK_SIZE)
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(items, list(serializer.fields)),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="recipes.{renderer.format}"')
+
+        return response
+
     def perform_create(self, serializer):
         """Create a new recipe"""
         serializer.save(user=self.request.user)
 
+    def _get_bulk_batch_size(self):
+        """Return the `batch_size` query param, or the configured one."""
+        value = self.request.query_params.get('batch_size')
+        if value is None:
+            return settings.RECIPE_BULK_BATCH_SIZE
+        try:
+            batch_size = int(value)
+        except ValueError:
+            batch_size = 0
+        if not 0 < batch_size <= MAX_BULK_BATCH_SIZE:
+            raise ValidationError({
+                'batch_size': 'Must be an integer between 1 and '
+                              f'{MAX_BULK_BATCH_SIZE}.'
+            })
+
+        return batch_size
+
+    @extend_schema(
+        request=serializers.BulkOperationSerializer(many=True),
+        responses=OpenApiTypes.OBJECT,
+        parameters=[
+            OpenApiParameter(
+                'mode',
+                OpenApiTypes.STR,
+                enum=bulk.MODES,
+                description='atomic (default) applies all operations or '
+                            'none; best-effort applies every valid one',
+            ),
+            OpenApiParameter(
+                'batch_size',
+                OpenApiTypes.INT,
+                description='Rows written per statement',
+            ),
+        ],
+    )
+    @action(
+        methods=['POST'],
+        detail=False,
+        parser_classes=[JSONParser, NDJSONParser],
+    )
+    def bulk(self, request):
+        """Create, update and delete recipes from a list of operations."""
+        mode = request.query_params.get('mode', bulk.ATOMIC)
+        if mode not in bulk.MODES:
+            raise ValidationError(
+                {'mode': f'Must be one of: {", ".join(bulk.MODES)}.'})
+        batch_size = self._get_bulk_batch_size()
+        if not isinstance(request.data, list):
+            raise ValidationError('Expected a list of operations.')
+        if len(request.data) > settings.RECIPE_BULK_MAX_OPERATIONS:
+            raise ValidationError(
+                'At most {} operations are allowed per request.'.format(
+                    settings.RECIPE_BULK_MAX_OPERATIONS))
+
+        operations = bulk.validate(
+            request.user, request.data, self.get_serializer_context())
+        if mode == bulk.ATOMIC and any(
+                operation.status is not None for operation in operations):
+            bulk.reject(operations)
+            return Response(
+                {'results': [op.to_result() for op in operations]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        bulk.write(request.user, operations, mode, batch_size)
+        return Response({'results': [op.to_result() for op in operations]})
+
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
-        """Upload an image to recipe"""
+        """Upload an image to recipe.
+
+        Its resized variants are rendered in the background once the
+        upload is committed.
+        """
         recipe = self.get_object()
-        serializer = self.get_serializer(recipe, data=request.data)
+        upload = uploads.limit_upload_size(request._request)
+        data = request.data
+        if upload.exceeded:
+            raise uploads.UploadTooLarge()
+        serializer = self.get_serializer(recipe, data=data)
 
         if serializer.is_valid():
-            serializer.save()
+            recipe = serializer.save()
+            name = recipe.image.name
+            transaction.on_commit(
+                lambda: images.schedule_variants(recipe.pk, name))
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class BaseRecipeAttrViewSet(mixins.DestroyModelMixin,
+class BaseRecipeAttrViewSet(ResponseCacheMixin,
+                            mixins.DestroyModelMixin,
                             mixins.UpdateModelMixin,
                             mixins.ListModelMixin,
                             viewsets.GenericViewSet):
     """Base view set for recipe attribute"""
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipeAttrCursorPagination
 
     def get_queryset(self):
         """Filter queryset for authenticated users"""
         return self.queryset.filter(user=self.request.user).order_by('-name')
 
+    def perform_update(self, serializer):
+        """Update the attribute, rejecting a name already in use."""
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise ValidationError({'name': 'This name is already in use.'})
+
+    @cache_response
+    @condition_response(list_validators)
+    def list(self, request, *args, **kwargs):
+        """List recipe attributes of the authenticated user."""
+        return super().list(request, *args, **kwargs)
+
 
 class TagViewSet(BaseRecipeAttrViewSet):
     """Manage Tags in database."""
@@ -71,3 +395,14 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
     """Manage ingredient in database"""
     serializer_class = serializers.IngredientSerializer
     queryset = Ingredient.objects.all()
+
+
+class CacheStatsView(APIView):
+    """Report response cache hit and miss counters."""
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(responses=OpenApiTypes.OBJECT)
+    def get(self, request):
+        """Return the cache counters."""
+        return Response(get_stats())
@@ -11,4 +11,9 @@ urlpatterns = [
     path('create/', views.CreateUserView.as_view(), name='create'),
     path('token/', views.CreateTokenView.as_view(), name='token'),
     path('me/', views.ManagerUserView.as_view(), name='me'),
+    path(
+        'hashing-stats/',
+        views.HashingStatsView.as_view(),
+        name='hashing-stats',
+    ),
 ]
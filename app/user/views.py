@@ -1,10 +1,18 @@
 """
 Views for User API
 """
+from django.contrib.auth import get_user_model
+from drf_spectacular.utils import extend_schema, OpenApiTypes
 from user.serializers import UserSerailzier, AuthTokenSerailizer
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from core.authentication import CachedTokenAuthentication
+from core.hashing import get_pool
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -21,9 +29,26 @@ class CreateTokenView(ObtainAuthToken):
 class ManagerUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerailzier
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permissions_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        """Retrieve and return the authenticated user"""
-        return self.request.user
+        """Retrieve and return the authenticated user.
+
+        Updates start from the database row: the cached user may be
+        missing changes made since, which saving it would undo.
+        """
+        if self.request.method in SAFE_METHODS:
+            return self.request.user
+        return get_user_model().objects.get(pk=self.request.user.pk)
+
+
+class HashingStatsView(APIView):
+    """Report password hashing queue depth and latency."""
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    @extend_schema(responses=OpenApiTypes.OBJECT)
+    def get(self, request):
+        """Return the hashing pool figures of this process."""
+        return Response(get_pool().get_stats())